@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the image registry scan.
+
+Times a cold scan of the whole repository (every candidate file read and matched) against a warm
+scan that reuses the mtime cache, and shows how many references each one found.
+
+Usage:
+    python benchmark_image_scan.py [--rounds 5]
+"""
+
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+import image_registry
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the image registry scan.")
+    parser.add_argument("--rounds", type=int, default=5, help="Number of scans to time for each mode.")
+    args = parser.parse_args()
+
+    repo_root = Path(__file__).resolve().parent.parent.parent
+    candidates = sum(1 for _ in image_registry.iter_candidate_files(repo_root))
+
+    # Keep the benchmark away from the real cache file.
+    with tempfile.TemporaryDirectory(prefix="image-scan-") as temp_dir:
+        cache_path = Path(temp_dir) / image_registry.CACHE_FILE_NAME
+
+        cold = []
+        for _ in range(args.rounds):
+            start = time.perf_counter()
+            registry = image_registry.ImageRegistry.scan(repo_root, use_cache=False)
+            cold.append(time.perf_counter() - start)
+
+        image_registry.ImageRegistry.scan(repo_root, cache_path=cache_path)
+        warm = []
+        for _ in range(args.rounds):
+            start = time.perf_counter()
+            cached_registry = image_registry.ImageRegistry.scan(repo_root, cache_path=cache_path)
+            warm.append(time.perf_counter() - start)
+
+    print(f"Candidate files: {candidates}")
+    print(f"References:      {len(registry.references)} cold, {len(cached_registry.references)} cached")
+    print(f"Cold scan:       {min(cold) * 1000:.1f}ms")
+    print(f"Cached scan:     {min(warm) * 1000:.1f}ms ({min(cold) / min(warm):.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
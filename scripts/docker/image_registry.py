@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+StackAI Image Registry
+
+Maps each StackAI service to every file location that references its image: docker compose files,
+Dockerfiles, and the Kubernetes manifests in k8s/ and components/kustomizations/.
+
+The registry is built by scanning the repository once. The references found in each file are cached
+in .image-registry-cache.json together with the file's mtime and size, so later scans only re-read
+files that changed.
+
+Usage:
+    python image_registry.py [--no-cache]
+"""
+
+import os
+import re
+import sys
+import json
+import argparse
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+REGISTRY = "stackai.azurecr.io/stackai"
+
+# Service key in stackai-versions.json -> image repositories built from it.
+SERVICE_IMAGES: Dict[str, List[str]] = {
+    "stackend": [f"{REGISTRY}/stackend-backend", f"{REGISTRY}/stackend-celery-worker"],
+    "stackweb": [f"{REGISTRY}/stackweb"],
+    "stackrepl": [f"{REGISTRY}/stackrepl/stack-repl"],
+}
+
+IMAGE_SERVICES: Dict[str, str] = {image: service for service, images in SERVICE_IMAGES.items() for image in images}
+
+# Directories that are never deployment targets. updates/ holds dated snapshots of past migrations.
+SCAN_EXCLUDED_DIRS = {
+    ".git", "node_modules", "__pycache__", "updates", "volumes",
+    ".puller-cache", ".puller_venv", ".venv", "venv",
+}
+
+CACHE_FILE_NAME = ".image-registry-cache.json"
+CACHE_VERSION = 1
+
+IMAGE_REFERENCE_RE = re.compile(
+    r"^(?P<prefix>[ \t]*(?:-[ \t]+)?image:[ \t]*[\"']?|FROM[ \t]+)"
+    r"(?P<image>" + "|".join(re.escape(image) for image in sorted(IMAGE_SERVICES, key=len, reverse=True)) + r")"
+    r":(?P<tag>[^\s\"']+)",
+    re.MULTILINE,
+)
+
+
+@dataclass(frozen=True)
+class ImageReference:
+    """One image reference: the file (relative to the repository root), its line, and the tag in use."""
+    path: str
+    line: int
+    kind: str
+    service: str
+    image: str
+    tag: str
+
+
+def file_kind(name: str) -> Optional[str]:
+    """Classify a file as a deployment target, or return None if it cannot reference images."""
+    if name.startswith("Dockerfile"):
+        return "dockerfile"
+    if not name.endswith((".yml", ".yaml")):
+        return None
+    if name.startswith(("docker-compose", "compose")):
+        return "compose"
+    return "k8s"
+
+
+def iter_candidate_files(repo_root: Path) -> Iterator[Tuple[str, str, os.stat_result]]:
+    """Yield (relative path, kind, stat) for every file that may reference a StackAI image."""
+    stack = [repo_root]
+    while stack:
+        directory = stack.pop()
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in SCAN_EXCLUDED_DIRS:
+                        stack.append(Path(entry.path))
+                    continue
+                kind = file_kind(entry.name)
+                if kind is not None and entry.is_file():
+                    yield Path(entry.path).relative_to(repo_root).as_posix(), kind, entry.stat()
+
+
+def scan_content(relative_path: str, kind: str, content: str) -> List[ImageReference]:
+    """Return the StackAI image references in a file's content."""
+    if REGISTRY not in content:
+        return []
+    references = []
+    for match in IMAGE_REFERENCE_RE.finditer(content):
+        image = match.group("image")
+        references.append(ImageReference(
+            path=relative_path,
+            line=content.count("\n", 0, match.start()) + 1,
+            kind=kind,
+            service=IMAGE_SERVICES[image],
+            image=image,
+            tag=match.group("tag"),
+        ))
+    return references
+
+
+class ImageRegistry:
+    """Every StackAI image reference in the repository, grouped by service and by file."""
+
+    def __init__(self, repo_root: Path, references: List[ImageReference]):
+        self.repo_root = repo_root
+        self.references = sorted(references, key=lambda r: (r.service, r.path, r.line))
+
+    @classmethod
+    def scan(cls, repo_root: Path, use_cache: bool = True, cache_path: Optional[Path] = None) -> "ImageRegistry":
+        """Scan the repository, re-reading only files whose mtime or size changed since the last scan."""
+        cache_path = cache_path or Path(__file__).parent / CACHE_FILE_NAME
+        cached = load_cache(cache_path) if use_cache else {}
+        entries = {}
+        references = []
+        for relative_path, kind, stat in iter_candidate_files(repo_root):
+            entry = cached.get(relative_path)
+            if entry is None or entry["mtime_ns"] != stat.st_mtime_ns or entry["size"] != stat.st_size:
+                try:
+                    content = (repo_root / relative_path).read_text(errors="replace")
+                except OSError as e:
+                    print(f"⚠️  Warning: Could not read {relative_path}: {e}")
+                    continue
+                entry = {
+                    "mtime_ns": stat.st_mtime_ns,
+                    "size": stat.st_size,
+                    "references": [asdict(r) for r in scan_content(relative_path, kind, content)],
+                }
+            entries[relative_path] = entry
+            references.extend(ImageReference(**r) for r in entry["references"])
+        if use_cache and entries != cached:
+            save_cache(cache_path, entries)
+        return cls(repo_root, references)
+
+    def for_service(self, service: str) -> List[ImageReference]:
+        return [r for r in self.references if r.service == service]
+
+    def by_file(self) -> Dict[str, List[ImageReference]]:
+        files: Dict[str, List[ImageReference]] = {}
+        for reference in self.references:
+            files.setdefault(reference.path, []).append(reference)
+        return files
+
+    def current_tags(self) -> Dict[str, List[str]]:
+        """Return the distinct tags referenced for each service."""
+        tags: Dict[str, List[str]] = {}
+        for reference in self.references:
+            service_tags = tags.setdefault(reference.service, [])
+            if reference.tag not in service_tags:
+                service_tags.append(reference.tag)
+        return tags
+
+    def plan_retag(self, service_tags: Dict[str, str]) -> Dict[str, Tuple[str, List[ImageReference]]]:
+        """Plan retagging every reference of the given services.
+
+        Returns {relative path: (new content, references that change)} for the files that need
+        writing. Each file is read once and rewritten with a single substitution pass.
+        """
+        plan = {}
+        for relative_path, references in self.by_file().items():
+            changed = [r for r in references if r.service in service_tags and r.tag != service_tags[r.service]]
+            if not changed:
+                continue
+
+            def replace(match: re.Match) -> str:
+                service = IMAGE_SERVICES[match.group("image")]
+                tag = service_tags.get(service, match.group("tag"))
+                return f"{match.group('prefix')}{match.group('image')}:{tag}"
+
+            content = (self.repo_root / relative_path).read_text()
+            plan[relative_path] = (IMAGE_REFERENCE_RE.sub(replace, content), changed)
+        return plan
+
+
+def load_cache(cache_path: Path) -> Dict:
+    try:
+        with open(cache_path, "r") as f:
+            data = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+    if data.get("version") != CACHE_VERSION:
+        return {}
+    return data.get("files", {})
+
+
+def save_cache(cache_path: Path, entries: Dict) -> None:
+    tmp_path = cache_path.with_name(cache_path.name + ".tmp")
+    try:
+        with open(tmp_path, "w") as f:
+            json.dump({"version": CACHE_VERSION, "files": entries}, f)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"⚠️  Warning: Could not write the image registry cache: {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="List every StackAI image reference in the repository.")
+    parser.add_argument("--no-cache", action="store_true", help="Ignore the scan cache.")
+    args = parser.parse_args()
+
+    repo_root = Path(__file__).resolve().parent.parent.parent
+    registry = ImageRegistry.scan(repo_root, use_cache=not args.no_cache)
+    if not registry.references:
+        print("No StackAI image references found.")
+        sys.exit(1)
+
+    for service in SERVICE_IMAGES:
+        references = registry.for_service(service)
+        print(f"📦 {service} ({len(references)} references)")
+        for reference in references:
+            print(f"  - {reference.path}:{reference.line} [{reference.kind}] {reference.image}:{reference.tag}")
+
+
+if __name__ == "__main__":
+    main()
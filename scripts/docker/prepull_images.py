@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+StackAI Image Pre-pull
+
+Pulls the images of the StackAI services before the running stack is stopped, so an upgrade only
+costs the restart instead of the download.
+
+Each image tag is first resolved to a content digest against its registry (Docker Registry HTTP API v2).
+All images are then pulled concurrently by digest and tagged locally with the tag the compose files
+reference, so `docker compose up` starts exactly the content that was resolved, even if the tag is
+moved in the registry meanwhile. The digests are recorded in .image-digests.json.
+
+Images are taken from `docker compose config` for the given services. For services that are built
+locally (stackweb), the base images in the FROM lines of their Dockerfile are pulled instead.
+
+Usage:
+    python prepull_images.py [--services stackweb stackend ...] [--workers 4] [--resolve-only]
+    python prepull_images.py --images localhost:5000/stackai/stackweb:v1.0.4 --resolve-only
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import base64
+import hashlib
+import argparse
+import subprocess
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+STACKAI_SERVICES = ["stackweb", "stackend", "celery_worker", "stackrepl", "storage"]
+
+DEFAULT_WORKERS = 4
+DIGESTS_FILE_NAME = ".image-digests.json"
+
+DOCKER_HUB = "docker.io"
+DOCKER_HUB_API = "registry-1.docker.io"
+
+MANIFEST_MEDIA_TYPES = ", ".join([
+    "application/vnd.oci.image.index.v1+json",
+    "application/vnd.docker.distribution.manifest.list.v2+json",
+    "application/vnd.oci.image.manifest.v1+json",
+    "application/vnd.docker.distribution.manifest.v2+json",
+])
+
+FROM_RE = re.compile(r"^\s*FROM\s+(?:--platform=\S+\s+)?(\S+)", re.IGNORECASE | re.MULTILINE)
+
+
+@dataclass
+class ImageRef:
+    """A parsed image reference, normalized the way docker does it."""
+    original: str
+    registry: str
+    repository: str
+    tag: str
+    digest: Optional[str] = None
+
+    @classmethod
+    def parse(cls, image: str) -> "ImageRef":
+        name, digest = image.split("@", 1) if "@" in image else (image, None)
+        tag = "latest"
+        last_part = name.rsplit("/", 1)[-1]
+        if ":" in last_part:
+            name, tag = name.rsplit(":", 1)
+        first, _, rest = name.partition("/")
+        if rest and ("." in first or ":" in first or first == "localhost"):
+            registry, repository = first, rest
+        else:
+            registry, repository = DOCKER_HUB, name
+            if "/" not in repository:
+                repository = f"library/{repository}"
+        return cls(original=image, registry=registry, repository=repository, tag=tag, digest=digest)
+
+    @property
+    def name(self) -> str:
+        """The repository as docker names it locally (without the implicit docker.io/library/)."""
+        if self.registry == DOCKER_HUB:
+            return self.repository[len("library/"):] if self.repository.startswith("library/") else self.repository
+        return f"{self.registry}/{self.repository}"
+
+    @property
+    def tagged(self) -> str:
+        return f"{self.name}:{self.tag}"
+
+    @property
+    def pinned(self) -> str:
+        return f"{self.name}@{self.digest}"
+
+
+class RegistryClient:
+    """Minimal Registry HTTP API v2 client that resolves tags to digests."""
+
+    def __init__(self, insecure_registries: Tuple[str, ...] = (), timeout: float = 30):
+        self.insecure_registries = set(insecure_registries)
+        self.timeout = timeout
+        self.credentials = load_docker_credentials()
+        self.tokens: Dict[Tuple[str, str], str] = {}
+
+    def base_url(self, registry: str) -> str:
+        host = DOCKER_HUB_API if registry == DOCKER_HUB else registry
+        insecure = registry in self.insecure_registries or host.split(":")[0] in ("localhost", "127.0.0.1")
+        return f"{'http' if insecure else 'https'}://{host}"
+
+    def resolve_digest(self, ref: ImageRef) -> str:
+        """Return the digest the registry currently serves for ref's tag."""
+        url = f"{self.base_url(ref.registry)}/v2/{ref.repository}/manifests/{ref.tag}"
+        for method in ("HEAD", "GET"):
+            response_headers, body = self._request(method, url, ref)
+            digest = response_headers.get("Docker-Content-Digest")
+            if digest:
+                return digest
+            if method == "GET":
+                return "sha256:" + hashlib.sha256(body).hexdigest()
+        raise RuntimeError(f"Could not resolve {ref.original}")
+
+    def _request(self, method: str, url: str, ref: ImageRef):
+        headers = {"Accept": MANIFEST_MEDIA_TYPES}
+        token = self.tokens.get((ref.registry, ref.repository))
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        try:
+            with urllib.request.urlopen(urllib.request.Request(url, headers=headers, method=method), timeout=self.timeout) as response:
+                return response.headers, response.read()
+        except urllib.error.HTTPError as e:
+            if e.code != 401 or token:
+                raise
+            challenge = e.headers.get("WWW-Authenticate", "")
+        self.tokens[(ref.registry, ref.repository)] = self._fetch_token(challenge, ref)
+        return self._request(method, url, ref)
+
+    def _fetch_token(self, challenge: str, ref: ImageRef) -> str:
+        """Answer a `Bearer realm=...,service=...,scope=...` challenge."""
+        scheme, _, params = challenge.partition(" ")
+        if scheme.lower() != "bearer":
+            raise RuntimeError(f"Unsupported authentication challenge from {ref.registry}: {challenge!r}")
+        fields = dict(re.findall(r'(\w+)="([^"]*)"', params))
+        query = {"service": fields.get("service", "")}
+        query["scope"] = fields.get("scope") or f"repository:{ref.repository}:pull"
+        request = urllib.request.Request(f"{fields['realm']}?{urllib.parse.urlencode(query)}")
+        auth = self.credentials.get(ref.registry)
+        if auth:
+            request.add_header("Authorization", f"Basic {auth}")
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            data = json.load(response)
+        return data.get("token") or data["access_token"]
+
+
+def load_docker_credentials() -> Dict[str, str]:
+    """Return {registry: base64 user:password} from ~/.docker/config.json (credential helpers are not queried)."""
+    config_path = Path(os.environ.get("DOCKER_CONFIG", Path.home() / ".docker")) / "config.json"
+    try:
+        with open(config_path, "r") as f:
+            auths = json.load(f).get("auths", {})
+    except (OSError, json.JSONDecodeError):
+        return {}
+    credentials = {}
+    for registry, entry in auths.items():
+        auth = entry.get("auth")
+        if not auth and entry.get("username"):
+            auth = base64.b64encode(f"{entry['username']}:{entry.get('password', '')}".encode()).decode()
+        if auth:
+            host = urllib.parse.urlparse(registry).netloc or registry
+            credentials["docker.io" if "index.docker.io" in host else host] = auth
+    return credentials
+
+
+def compose_images(repo_root: Path, services: List[str]) -> List[str]:
+    """Return the images to pull for the given compose services."""
+    result = subprocess.run(
+        ["docker", "compose", "config", "--format", "json", *services],
+        cwd=repo_root, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"docker compose config failed: {result.stderr.strip()}")
+    config = json.loads(result.stdout)
+
+    images = []
+    for name in services:
+        service = config.get("services", {}).get(name)
+        if service is None:
+            print(f"⚠️  Warning: Service {name} not found in the compose configuration")
+            continue
+        build = service.get("build")
+        if build:
+            dockerfile = Path(build.get("context", repo_root)) / build.get("dockerfile", "Dockerfile")
+            try:
+                images.extend(m for m in FROM_RE.findall(dockerfile.read_text()) if "$" not in m)
+            except OSError as e:
+                print(f"⚠️  Warning: Could not read {dockerfile}: {e}")
+        elif service.get("image"):
+            images.append(service["image"])
+    return list(dict.fromkeys(images))
+
+
+def run_docker(*args: str) -> subprocess.CompletedProcess:
+    return subprocess.run(["docker", *args], capture_output=True, text=True)
+
+
+def pull_image(ref: ImageRef) -> ImageRef:
+    """Pull ref by digest and tag it locally; without a digest, pull the tag and record its digest."""
+    if ref.digest:
+        result = run_docker("pull", "--quiet", ref.pinned)
+        if result.returncode == 0:
+            result = run_docker("tag", ref.pinned, ref.tagged)
+    else:
+        result = run_docker("pull", "--quiet", ref.tagged)
+        if result.returncode == 0:
+            inspect = run_docker("image", "inspect", "--format", "{{json .RepoDigests}}", ref.tagged)
+            repo_digests = json.loads(inspect.stdout or "[]") if inspect.returncode == 0 else []
+            ref.digest = next((d.split("@", 1)[1] for d in repo_digests if d.startswith(ref.name + "@")), None)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip() or f"docker exited with status {result.returncode}")
+    return ref
+
+
+def resolve_all(client: RegistryClient, refs: List[ImageRef], workers: int) -> None:
+    """Resolve the digests of refs in place. Unresolvable refs keep digest None and are pulled by tag."""
+    def resolve(ref: ImageRef):
+        if not ref.digest:
+            ref.digest = client.resolve_digest(ref)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(resolve, ref): ref for ref in refs}
+        for future in as_completed(futures):
+            ref = futures[future]
+            try:
+                future.result()
+                print(f"🔎 {ref.tagged} -> {ref.digest}")
+            except Exception as e:
+                print(f"⚠️  Warning: Could not resolve {ref.tagged} ({e}), it will be pulled by tag")
+
+
+def pull_all(refs: List[ImageRef], workers: int) -> bool:
+    """Pull every ref concurrently. Returns False if any pull failed."""
+    success = True
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(pull_image, ref): ref for ref in refs}
+        for future in as_completed(futures):
+            ref = futures[future]
+            try:
+                future.result()
+                print(f"✅ Pulled {ref.tagged}" + (f" ({ref.digest})" if ref.digest else ""))
+            except Exception as e:
+                print(f"❌ Error pulling {ref.tagged}: {e}")
+                success = False
+    return success
+
+
+def save_digests(digests_path: Path, refs: List[ImageRef]) -> None:
+    data = {"updated_at": int(time.time()), "images": {ref.tagged: ref.digest for ref in refs if ref.digest}}
+    tmp_path = digests_path.with_name(digests_path.name + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, digests_path)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Resolve and pull the StackAI images before restarting the stack.")
+    parser.add_argument("--services", nargs="+", default=STACKAI_SERVICES, help="Compose services whose images are pulled.")
+    parser.add_argument("--images", nargs="+", help="Pull these images instead of the ones from the compose configuration.")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Number of concurrent resolutions and pulls.")
+    parser.add_argument("--insecure-registry", action="append", default=[], help="Registry to reach over plain HTTP (localhost is always).")
+    parser.add_argument("--resolve-only", action="store_true", help="Resolve and print the digests without pulling.")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    repo_root = Path(__file__).resolve().parent.parent.parent
+
+    if args.images:
+        images = list(dict.fromkeys(args.images))
+    else:
+        try:
+            images = compose_images(repo_root, args.services)
+        except (OSError, RuntimeError, json.JSONDecodeError) as e:
+            print(f"❌ Error: Could not read the compose configuration: {e}")
+            sys.exit(1)
+    if not images:
+        print("Nothing to pull.")
+        return
+
+    refs = [ImageRef.parse(image) for image in images]
+    print(f"🔄 Resolving {len(refs)} images...")
+    resolve_all(RegistryClient(tuple(args.insecure_registry)), refs, args.workers)
+
+    if args.resolve_only:
+        return
+
+    print(f"⬇️  Pulling {len(refs)} images with {args.workers} workers...")
+    start = time.perf_counter()
+    success = pull_all(refs, args.workers)
+    save_digests(Path(__file__).parent / DIGESTS_FILE_NAME, refs)
+
+    if not success:
+        print("")
+        print("❌ Some images could not be pulled. The running stack was left untouched.")
+        sys.exit(1)
+    print(f"🎉 All images pulled in {time.perf_counter() - start:.1f}s, the stack can now be restarted")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""Tests for prepull_images.py, run with: python -m pytest scripts/docker"""
+
+import base64
+import hashlib
+import json
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pytest
+
+from prepull_images import ImageRef, RegistryClient, resolve_all
+
+MANIFEST = json.dumps({"schemaVersion": 2, "mediaType": "application/vnd.oci.image.manifest.v1+json"}).encode()
+DIGEST = "sha256:" + hashlib.sha256(MANIFEST).hexdigest()
+TOKEN = "registry-token"
+
+
+class FakeRegistry(ThreadingHTTPServer):
+    """A Registry HTTP API v2 stand-in with token authentication.
+
+    Manifests of `tags` are served only with a bearer token, which /token hands out (to
+    `credentials` only, when set) after a 401 challenge. `send_digest` controls whether the
+    Docker-Content-Digest header is sent.
+    """
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), RegistryHandler)
+        self.tags = {"stackai/stackweb": {"v1.0.4"}}
+        self.credentials: Optional[str] = None
+        self.send_digest = True
+        self.requests: List[str] = []
+        self.token_queries: List[Dict[str, List[str]]] = []
+
+    @property
+    def host(self) -> str:
+        return f"127.0.0.1:{self.server_address[1]}"
+
+
+class RegistryHandler(BaseHTTPRequestHandler):
+    server: FakeRegistry
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_HEAD(self):
+        self.serve(with_body=False)
+
+    def do_GET(self):
+        self.serve(with_body=True)
+
+    def respond(self, status: int, headers: Dict[str, str], body: bytes = b"", with_body: bool = True):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if with_body:
+            self.wfile.write(body)
+
+    def serve(self, with_body: bool):
+        server = self.server
+        url = urllib.parse.urlparse(self.path)
+        server.requests.append(f"{self.command} {url.path}")
+
+        if url.path == "/token":
+            if server.credentials and self.headers.get("Authorization") != f"Basic {server.credentials}":
+                self.respond(401, {})
+                return
+            server.token_queries.append(urllib.parse.parse_qs(url.query))
+            self.respond(200, {"Content-Type": "application/json"}, json.dumps({"token": TOKEN}).encode())
+            return
+
+        repository, _, tag = url.path.removeprefix("/v2/").rpartition("/manifests/")
+        if self.headers.get("Authorization") != f"Bearer {TOKEN}":
+            challenge = (
+                f'Bearer realm="http://{server.host}/token",service="fake-registry",'
+                f'scope="repository:{repository}:pull"'
+            )
+            self.respond(401, {"WWW-Authenticate": challenge})
+            return
+        if tag not in server.tags.get(repository, set()):
+            self.respond(404, {})
+            return
+        headers = {"Content-Type": "application/vnd.oci.image.manifest.v1+json"}
+        if server.send_digest:
+            headers["Docker-Content-Digest"] = DIGEST
+        self.respond(200, headers, MANIFEST, with_body)
+
+
+@pytest.fixture
+def registry():
+    server = FakeRegistry()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def docker_config(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    monkeypatch.setenv("DOCKER_CONFIG", str(tmp_path))
+    return tmp_path / "config.json"
+
+
+def test_image_ref_parse():
+    ref = ImageRef.parse("redis")
+    assert (ref.registry, ref.repository, ref.tag, ref.name) == ("docker.io", "library/redis", "latest", "redis")
+    ref = ImageRef.parse("localhost:5000/stackai/stackweb:v1.0.4")
+    assert (ref.registry, ref.repository, ref.tag) == ("localhost:5000", "stackai/stackweb", "v1.0.4")
+    ref = ImageRef.parse(f"stackai.azurecr.io/stackai/stackend-backend:v1@{DIGEST}")
+    assert (ref.tagged, ref.pinned) == ("stackai.azurecr.io/stackai/stackend-backend:v1", f"stackai.azurecr.io/stackai/stackend-backend@{DIGEST}")
+
+
+def test_resolves_digest_with_token(registry: FakeRegistry):
+    client = RegistryClient()
+    ref = ImageRef.parse(f"{registry.host}/stackai/stackweb:v1.0.4")
+
+    assert client.resolve_digest(ref) == DIGEST
+    assert registry.token_queries == [{"service": ["fake-registry"], "scope": ["repository:stackai/stackweb:pull"]}]
+
+    registry.requests.clear()
+    assert client.resolve_digest(ref) == DIGEST
+    assert registry.requests == ["HEAD /v2/stackai/stackweb/manifests/v1.0.4"]
+
+
+def test_digest_from_manifest_body(registry: FakeRegistry):
+    registry.send_digest = False
+    ref = ImageRef.parse(f"{registry.host}/stackai/stackweb:v1.0.4")
+    assert RegistryClient().resolve_digest(ref) == DIGEST
+
+
+def test_token_request_uses_docker_credentials(registry: FakeRegistry, docker_config: Path):
+    registry.credentials = base64.b64encode(b"user:secret").decode()
+    docker_config.write_text(json.dumps({"auths": {registry.host: {"username": "user", "password": "secret"}}}))
+    ref = ImageRef.parse(f"{registry.host}/stackai/stackweb:v1.0.4")
+    assert RegistryClient().resolve_digest(ref) == DIGEST
+
+
+def test_unresolvable_refs_keep_no_digest(registry: FakeRegistry):
+    refs = [
+        ImageRef.parse(f"{registry.host}/stackai/stackweb:v1.0.4"),
+        ImageRef.parse(f"{registry.host}/stackai/stackweb:missing"),
+    ]
+    resolve_all(RegistryClient(), refs, workers=2)
+    assert [ref.digest for ref in refs] == [DIGEST, None]
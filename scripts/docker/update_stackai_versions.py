@@ -3,14 +3,20 @@
 StackAI Version Manager
 
 This script updates the Docker image versions for StackAI services based on a JSON configuration file.
-It updates the following files:
+It updates every reference found by image_registry.py, including:
 - stackend/docker-compose.yml (stackend-backend and stackend-celery-worker images)
 - stackweb/Dockerfile (stackweb image)
 - stackrepl/docker-compose.yml (stackrepl image)
+- k8s/*-deployment.yaml and components/kustomizations/* (all of the above)
+
+The configuration is loaded once into an index ordered by semantic version. For a target version
+the script plans the minimal set of edits, applies them with a single pass over each file, and
+leaves the tree untouched (exit code 0) when it is already at that version.
 
 Usage:
-    python update_stackai_versions.py <version>
-    
+    python update_stackai_versions.py <version|latest> [--dry-run]
+    python update_stackai_versions.py --list
+
 Example:
     python update_stackai_versions.py 1.0.2
 """
@@ -18,8 +24,58 @@ Example:
 import json
 import sys
 import os
-import re
+import argparse
+from dataclasses import dataclass, field
 from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from image_registry import ImageRegistry, ImageReference
+
+
+def version_key(version: str) -> Tuple:
+    """Sort key for semantic versions: 1.0.10 > 1.0.9, and 1.1.0-rc1 < 1.1.0."""
+    core, _, prerelease = version.lstrip("v").split("+", 1)[0].partition("-")
+    numbers = tuple(int(part) if part.isdigit() else 0 for part in core.split("."))
+    return numbers, prerelease == "", prerelease
+
+
+class VersionIndex:
+    """The entries of stackai-versions.json, indexed by release version in semver order."""
+
+    def __init__(self, versions_config: List[Dict[str, Dict[str, str]]]):
+        self.by_version: Dict[str, Dict[str, str]] = {}
+        for version_obj in versions_config:
+            self.by_version.update(version_obj)
+        self.ordered = sorted(self.by_version, key=version_key)
+
+    @property
+    def latest(self) -> Optional[str]:
+        return self.ordered[-1] if self.ordered else None
+
+    def resolve(self, target_version: str) -> Optional[str]:
+        """Return the release version for a target ("latest" is accepted), or None if unknown."""
+        if target_version == "latest":
+            return self.latest
+        return target_version if target_version in self.by_version else None
+
+    def get(self, version: str) -> Dict[str, str]:
+        return self.by_version[version]
+
+    def matching(self, service_versions: Dict[str, str]) -> List[str]:
+        """Return the release versions whose services all match the given service versions."""
+        return [
+            version for version in self.ordered
+            if all(service_versions.get(service) == tag for service, tag in self.by_version[version].items())
+        ]
+
+
+@dataclass
+class FileEdit:
+    """The planned rewrite of one file."""
+    path: Path
+    content: str
+    changes: List[ImageReference] = field(default_factory=list)
+
 
 def load_versions_config(config_path):
     """Load the versions configuration from JSON file."""
@@ -33,166 +89,126 @@ def load_versions_config(config_path):
         print(f"❌ Error: Invalid JSON in configuration file: {e}")
         sys.exit(1)
 
-def find_version_config(versions_config, target_version):
-    """Find the version configuration for the target version."""
-    for version_obj in versions_config:
-        if target_version in version_obj:
-            return version_obj[target_version]
-    return None
-
-def update_stackend_compose(stackend_version):
-    """Update stackend/docker-compose.yml with new versions."""
-    file_path = Path("stackend/docker-compose.yml")
-    
-    if not file_path.exists():
-        print(f"❌ Error: File not found: {file_path}")
-        return False
-    
-    try:
-        with open(file_path, 'r') as f:
-            content = f.read()
-        
-        # Update stackend-celery-worker image
-        content = re.sub(
-            r'image: stackai\.azurecr\.io/stackai/stackend-celery-worker:[^\s]+',
-            f'image: stackai.azurecr.io/stackai/stackend-celery-worker:{stackend_version}',
-            content
-        )
-        
-        # Update stackend-backend image
-        content = re.sub(
-            r'image: stackai\.azurecr\.io/stackai/stackend-backend:[^\s]+',
-            f'image: stackai.azurecr.io/stackai/stackend-backend:{stackend_version}',
-            content
-        )
-        
-        with open(file_path, 'w') as f:
-            f.write(content)
-        
-        print(f"✅ Updated {file_path} with stackend version {stackend_version}")
-        return True
-        
-    except Exception as e:
-        print(f"❌ Error updating {file_path}: {e}")
-        return False
-
-def update_stackweb_dockerfile(stackweb_version):
-    """Update stackweb/Dockerfile with new version."""
-    file_path = Path("stackweb/Dockerfile")
-    
-    if not file_path.exists():
-        print(f"❌ Error: File not found: {file_path}")
-        return False
-    
-    try:
-        with open(file_path, 'r') as f:
-            content = f.read()
-        
-        # Update FROM line with new stackweb version
-        content = re.sub(
-            r'FROM stackai\.azurecr\.io/stackai/stackweb:[^\s]+',
-            f'FROM stackai.azurecr.io/stackai/stackweb:{stackweb_version}',
-            content
-        )
-        
-        with open(file_path, 'w') as f:
-            f.write(content)
-        
-        print(f"✅ Updated {file_path} with stackweb version {stackweb_version}")
-        return True
-        
-    except Exception as e:
-        print(f"❌ Error updating {file_path}: {e}")
-        return False
-
-def update_stackrepl_compose(stackrepl_version):
-    """Update stackrepl/docker-compose.yml with new version."""
-    file_path = Path("stackrepl/docker-compose.yml")
-    
-    if not file_path.exists():
-        print(f"❌ Error: File not found: {file_path}")
-        return False
-    
-    try:
-        with open(file_path, 'r') as f:
-            content = f.read()
-        
-        # Update stackrepl image
-        content = re.sub(
-            r'image: stackai\.azurecr\.io/stackai/stackrepl/stack-repl:[^\s]+',
-            f'image: stackai.azurecr.io/stackai/stackrepl/stack-repl:{stackrepl_version}',
-            content
-        )
-        
-        with open(file_path, 'w') as f:
-            f.write(content)
-        
-        print(f"✅ Updated {file_path} with stackrepl version {stackrepl_version}")
-        return True
-        
-    except Exception as e:
-        print(f"❌ Error updating {file_path}: {e}")
-        return False
+
+def current_versions(registry: ImageRegistry) -> Dict[str, str]:
+    """Return the tag of each service, for services whose references all agree on one tag."""
+    return {service: tags[0] for service, tags in registry.current_tags().items() if len(tags) == 1}
+
+
+def plan_version_update(registry: ImageRegistry, version_config: Dict[str, str]) -> List[FileEdit]:
+    """Plan the edits needed to bring every reference in the registry to version_config.
+
+    Files that already reference the right tags are not part of the plan.
+    """
+    return [
+        FileEdit(path=Path(relative_path), content=content, changes=changes)
+        for relative_path, (content, changes) in registry.plan_retag(version_config).items()
+    ]
+
+
+def apply_edits(edits: List[FileEdit]) -> bool:
+    """Write each planned file once, atomically. Returns False if any write failed."""
+    success = True
+    for edit in edits:
+        tmp_path = edit.path.with_name(edit.path.name + ".tmp")
+        try:
+            tmp_path.write_text(edit.content)
+            os.replace(tmp_path, edit.path)
+            print(f"✅ Updated {edit.path}")
+        except OSError as e:
+            print(f"❌ Error updating {edit.path}: {e}")
+            tmp_path.unlink(missing_ok=True)
+            success = False
+    return success
+
+
+def print_available_versions(index: VersionIndex, current: Optional[Dict[str, str]] = None):
+    current_versions = set(index.matching(current)) if current else set()
+    for version in index.ordered:
+        marker = " (current)" if version in current_versions else ""
+        print(f"  - {version}{marker}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Update the StackAI service image versions.")
+    parser.add_argument("version", nargs="?", help="Release version from stackai-versions.json, or 'latest'.")
+    parser.add_argument("--dry-run", action="store_true", help="Show the planned edits without writing them.")
+    parser.add_argument("--list", action="store_true", help="List the available versions and exit.")
+    return parser.parse_args()
+
 
 def main():
-    if len(sys.argv) != 2:
+    args = parse_args()
+
+    # Get the script directory and config file path
+    script_dir = Path(__file__).resolve().parent
+    config_path = script_dir / "stackai-versions.json"
+
+    # Change to the repository root directory
+    repo_root = script_dir.parent.parent
+    os.chdir(repo_root)
+
+    index = VersionIndex(load_versions_config(config_path))
+
+    if args.list:
+        print("Available versions:")
+        print_available_versions(index, current_versions(ImageRegistry.scan(repo_root)))
+        return
+
+    if not args.version:
         print("❌ Error: Version argument is required")
         print("")
         print("Usage:")
-        print("  python update_stackai_versions.py <version>")
+        print("  python update_stackai_versions.py <version|latest> [--dry-run]")
+        print("  python update_stackai_versions.py --list")
         print("")
         print("Example:")
         print("  python update_stackai_versions.py 1.0.2")
         sys.exit(1)
-    
-    target_version = sys.argv[1]
-    
-    # Get the script directory and config file path
-    script_dir = Path(__file__).parent
-    config_path = script_dir / "stackai-versions.json"
-    
-    # Change to the repository root directory
-    repo_root = script_dir.parent.parent
-    os.chdir(repo_root)
-    
-    print(f"🔄 Updating StackAI services to version {target_version}...")
-    print(f"📁 Working directory: {os.getcwd()}")
-    print(f"📄 Config file: {config_path}")
-    
-    # Load versions configuration
-    versions_config = load_versions_config(config_path)
-    
-    # Find the version configuration
-    version_config = find_version_config(versions_config, target_version)
-    if not version_config:
-        print(f"❌ Error: Version {target_version} not found in configuration")
+
+    target_version = index.resolve(args.version)
+    if target_version is None:
+        print(f"❌ Error: Version {args.version} not found in configuration")
         print("")
         print("Available versions:")
-        for version_obj in versions_config:
-            for version in version_obj.keys():
-                print(f"  - {version}")
+        print_available_versions(index)
         sys.exit(1)
-    
+
+    print(f"🔄 Updating StackAI services to version {target_version}...")
+    print(f"📁 Working directory: {os.getcwd()}")
+    print(f"📄 Config file: {config_path}")
+
+    version_config = index.get(target_version)
     print(f"📋 Version configuration found:")
     for service, version in version_config.items():
         print(f"  - {service}: {version}")
     print("")
-    
-    # Update each service
-    success = True
-    
-    # Update stackend
-    if 'stackend' in version_config:
-        success &= update_stackend_compose(version_config['stackend'])
-    
-    # Update stackweb
-    if 'stackweb' in version_config:
-        success &= update_stackweb_dockerfile(version_config['stackweb'])
-    
-    # Update stackrepl
-    if 'stackrepl' in version_config:
-        success &= update_stackrepl_compose(version_config['stackrepl'])
-    
+
+    registry = ImageRegistry.scan(repo_root)
+    missing = [service for service in version_config if not registry.for_service(service)]
+    if missing:
+        for service in missing:
+            print(f"❌ Error: No image references found for {service}")
+        print("")
+        print("Check that the compose files, Dockerfiles and manifests of these services exist.")
+        sys.exit(1)
+
+    edits = plan_version_update(registry, version_config)
+    if not edits:
+        print(f"✅ Already at version {target_version}, nothing to update.")
+        return
+
+    for edit in edits:
+        for reference in edit.changes:
+            print(f"  {edit.path}:{reference.line}: {reference.image} {reference.tag} -> {version_config[reference.service]}")
+    print("")
+
+    if args.dry_run:
+        print(f"Dry run: {len(edits)} file(s) would be updated.")
+        return
+
+    success = apply_edits(edits)
+
     if success:
         print("")
         print(f"🎉 Successfully updated all StackAI services to version {target_version}")
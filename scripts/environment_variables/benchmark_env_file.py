@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for the cached .env lookups and bulk updates in env_file.py.
+
+Looks up the supabase/.env variables that create_env_variables.py reads, over and over, in a copy
+of templates/supabase.env.template with its placeholders filled in. Compares the original lookup,
+which re-read and re-scanned the file for every variable, against env_file.get_env_var, and
+reports how many times each one read the file.
+
+It also applies a batch of sets and references to a large generated .env file, comparing the
+original update_env_vars.py rewriter, which rescanned the file for every variable, against a single
+EnvTransaction.
+
+Usage:
+    python benchmark_env_file.py [--lookups 10000] [--lines 20000] [--updates 2000]
+"""
+
+import re
+import sys
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+import env_file  # noqa: E402
+
+KEYS = [
+    "JWT_SECRET", "ANON_KEY", "SERVICE_ROLE_KEY", "DASHBOARD_PASSWORD", "LOGFLARE_LOGGER_BACKEND_API_KEY",
+    "LOGFLARE_API_KEY", "SAML_ENABLED", "SAML_PRIVATE_KEY", "POSTGRES_PASSWORD", "API_EXTERNAL_URL",
+]
+
+
+def legacy_get_env_var_by_env_file(var_name: str, env_file_path: str) -> str | None:
+    """The original get_env_var_by_env_file implementation, kept here as the baseline."""
+    path = Path(env_file_path)
+    if not path.is_file():
+        return None
+
+    for line in path.read_text().splitlines():
+        if line.startswith(f"{var_name}="):
+            return line.partition("=")[2].strip()
+    return None
+
+
+def legacy_update_env_file_variable(content: str, key: str, value: str | None, reference_key: str | None) -> str:
+    """The original _update_env_file_variable of update_env_vars.py (set, or copy reference_key),
+    kept here as the baseline: every variable rescans the whole file."""
+    lines = content.splitlines(keepends=True)
+    if reference_key is not None:
+        value = None
+        for line in lines:
+            if line.startswith(f"{reference_key}="):
+                value = line.split('=', 1)[1].strip()
+                break
+        if value is None:
+            raise ValueError(f"Variable {reference_key} not found in content.")
+    for i, line in enumerate(lines):
+        if line.startswith(f"{key}="):
+            lines[i] = f"{key}={value}\n"
+            break
+    else:
+        if lines and not lines[-1].endswith('\n'):
+            lines[-1] += '\n'
+        lines.append(f"{key}={value}\n")
+    return ''.join(lines)
+
+
+def benchmark_lookups(temp_dir: Path, lookups: int) -> bool:
+    keys = [KEYS[i % len(KEYS)] for i in range(lookups)]
+    path = temp_dir / "supabase.env"
+    template = (Path(__file__).parent / "templates" / "supabase.env.template").read_text()
+    path.write_text(re.sub(r"\{\{.*?\}\}", lambda m: f"value-{m.start()}", template))
+
+    start = time.perf_counter()
+    legacy_values = [legacy_get_env_var_by_env_file(key, str(path)) for key in keys]
+    legacy_seconds = time.perf_counter() - start
+
+    env_file.clear_cache()
+    reads_before = env_file.file_reads
+    start = time.perf_counter()
+    cached_values = [env_file.get_env_var(path, key) for key in keys]
+    cached_seconds = time.perf_counter() - start
+    cached_reads = env_file.file_reads - reads_before
+
+    found = sum(1 for value in cached_values if value is not None)
+    print(f"Lookups: {len(keys)} ({found} found)")
+    print(f"  Legacy:  {legacy_seconds:.3f}s, {len(keys)} file reads")
+    print(f"  Cached:  {cached_seconds:.3f}s, {cached_reads} file read(s) ({legacy_seconds / cached_seconds:.1f}x faster)")
+    # The legacy lookup returned quoted values with their quotes; compare on the unquoted value.
+    mismatches = sum(
+        1 for a, b in zip(legacy_values, cached_values)
+        if (a.strip('"') if a is not None else None) != b
+    )
+    print(f"  Mismatches: {mismatches}")
+    return mismatches == 0 and cached_reads == 1
+
+
+def benchmark_updates(temp_dir: Path, lines: int, updates: int) -> bool:
+    """Apply sets (a tenth of them new keys) and references to a generated file of the given size."""
+    content = "".join(
+        f"# Section {i // 10}\n" if i % 10 == 0 else f"GENERATED_{i}=value-{i}\n" for i in range(lines)
+    )
+    step = max(1, lines // updates)
+    variables = []
+    for n in range(updates):
+        i = (n * step) % lines
+        if n % 10 == 9:
+            variables.append((f"NEW_{n}", f"new-{n}", None))
+        elif n % 5 == 4:
+            variables.append((f"GENERATED_{i | 1}", None, f"GENERATED_{(i + 7) | 1}"))
+        else:
+            variables.append((f"GENERATED_{i | 1}", f"updated-{n}", None))
+
+    legacy_path = temp_dir / "legacy.env"
+    legacy_path.write_text(content)
+    start = time.perf_counter()
+    legacy_content = legacy_path.read_text()
+    for key, value, reference_key in variables:
+        legacy_content = legacy_update_env_file_variable(legacy_content, key, value, reference_key)
+    legacy_path.write_text(legacy_content)
+    legacy_seconds = time.perf_counter() - start
+
+    bulk_path = temp_dir / "bulk.env"
+    bulk_path.write_text(content)
+    env_file.clear_cache()
+    start = time.perf_counter()
+    with env_file.EnvTransaction() as transaction:
+        parsed = transaction.file(bulk_path)
+        for key, value, reference_key in variables:
+            parsed.set(key, parsed.get(reference_key) if reference_key is not None else value)
+    bulk_seconds = time.perf_counter() - start
+
+    same = bulk_path.read_text() == legacy_path.read_text()
+    print(f"Updates: {len(variables)} variables into {lines} lines")
+    print(f"  Legacy:  {legacy_seconds:.3f}s")
+    print(f"  Bulk:    {bulk_seconds:.3f}s ({legacy_seconds / bulk_seconds:.1f}x faster)")
+    print(f"  Same output: {same}")
+    return same
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the cached .env lookups and bulk updates.")
+    parser.add_argument("--lookups", type=int, default=10_000, help="Number of variable lookups.")
+    parser.add_argument("--lines", type=int, default=20_000, help="Lines of the generated .env file to update.")
+    parser.add_argument("--updates", type=int, default=2_000, help="Number of variables to apply to it.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        ok = benchmark_lookups(Path(temp_dir), args.lookups)
+        ok = benchmark_updates(Path(temp_dir), args.lines, args.updates) and ok
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Benchmark the secrets generated when provisioning one instance, with and without the key pool.
+
+Each instance needs what create_env_variables.py generates for a fresh install: nine passwords, a
+JWT secret, the anon and service_role JWTs, and the SAML RSA key. The original code generated the
+passwords one secrets.choice() call per character and the RSA key synchronously. The pooled version
+uses secret_pool.py, with the key pool filled beforehand in a temporary directory (the fill time is
+reported separately: it is paid ahead of time, off the provisioning path).
+
+Usage:
+    python benchmark_secret_pool.py [--instances 20]
+"""
+
+import sys
+import time
+import string
+import secrets
+import argparse
+import tempfile
+from pathlib import Path
+
+import jwt
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+sys.path.insert(0, str(Path(__file__).parent))
+import secret_pool  # noqa: E402
+
+# Password lengths generated by create_env_variables.py for a fresh install.
+PASSWORD_LENGTHS = [32, 16, 32, 32, 32, 12, 12, 12, 12]
+
+
+def legacy_generate_password(length: int = 32) -> str:
+    """The original generate_password implementation, kept here as the baseline."""
+    alphabet = string.ascii_letters + string.digits + "-_"
+    return "".join(secrets.choice(alphabet) for _ in range(length))
+
+
+def sign_jwts(secret: str) -> None:
+    for role in ("anon", "service_role"):
+        jwt.encode({"role": role, "iss": "supabase"}, secret, algorithm="HS256")
+
+
+def provision_legacy() -> None:
+    for length in PASSWORD_LENGTHS:
+        legacy_generate_password(length)
+    sign_jwts(legacy_generate_password(40))
+    rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+def provision_pooled(pool: secret_pool.KeyPool) -> None:
+    for length in PASSWORD_LENGTHS:
+        secret_pool.generate_password(length)
+    sign_jwts(secret_pool.generate_jwt_secrets(1)[0])
+    pool.take_or_generate()
+
+
+def time_instances(provision, instances: int) -> float:
+    start = time.perf_counter()
+    for _ in range(instances):
+        provision()
+    return (time.perf_counter() - start) / instances
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark per-instance secret provisioning.")
+    parser.add_argument("--instances", type=int, default=20, help="Number of instances to provision.")
+    args = parser.parse_args()
+
+    legacy_seconds = time_instances(provision_legacy, args.instances)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pool = secret_pool.KeyPool(Path(temp_dir), size=args.instances, pool_key=b"benchmark")
+        start = time.perf_counter()
+        pool.refill()
+        fill_seconds = time.perf_counter() - start
+        pooled_seconds = time_instances(lambda: provision_pooled(pool), args.instances)
+        left = len(pool)
+
+    print(f"Instances: {args.instances}")
+    print(f"Legacy:    {legacy_seconds * 1000:.2f} ms per instance")
+    print(f"Pooled:    {pooled_seconds * 1000:.2f} ms per instance ({legacy_seconds / pooled_seconds:.1f}x faster)")
+    print(f"Pool fill: {fill_seconds:.2f}s for {args.instances} keys, ahead of time ({left} left after the run)")
+    if left:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,354 @@
+"""Read and edit the .env files of the deployment.
+
+Every script that reads or writes a .env file goes through this module, so they all agree on the
+format:
+
+    # comments and blank lines are kept as they are
+    KEY=value                     unquoted; surrounding whitespace and a " # comment" are dropped
+    KEY="value"                   double quoted; may span several lines, \\" and \\\\ are unescaped
+    KEY='value'                   single quoted; may span several lines, taken literally
+    export KEY=value              the export prefix is accepted and kept
+
+A parsed file keeps every line verbatim, so writing it back only changes the assignments that were
+set. Parsed files are cached by path and invalidated when the file's mtime or size changes, so
+looking up any number of variables costs a single read. Writes are atomic, and EnvTransaction
+writes several files as a unit.
+
+Usage:
+    from env_file import EnvTransaction, get_env_var, update_env_file
+
+    jwt_secret = get_env_var("supabase/.env", "JWT_SECRET")
+    update_env_file("supabase/.env", {"SAML_ENABLED": "true"})
+
+    with EnvTransaction() as transaction:
+        transaction.update("stackend/.env", {"STACKWEB_URL": app_url})
+        transaction.update("stackweb/.env", {"NEXT_PUBLIC_URL": app_url})
+"""
+
+import os
+import re
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+PathLike = Union[str, os.PathLike]
+
+ASSIGNMENT_RE = re.compile(r"[ \t]*(?P<export>export[ \t]+)?(?P<key>[A-Za-z_][A-Za-z0-9_.-]*)[ \t]*=[ \t]*")
+NEEDS_QUOTES_RE = re.compile(r"[\s#\"'\\]")
+
+
+@dataclass(frozen=True)
+class EnvLine:
+    """One logical line of a .env file: an assignment (possibly spanning several physical lines),
+    or a comment / blank / unparsable line (key is None). raw is the exact text, newline included."""
+    raw: str
+    key: Optional[str] = None
+    value: Optional[str] = None
+    quote: str = ""
+
+
+def _unescape(value: str) -> str:
+    return re.sub(r"\\([\"\\])", r"\1", value)
+
+
+def _find_closing_quote(text: str, start: int, quote: str) -> int:
+    """Return the index of the quote closing a value opened just before start, or -1."""
+    i = start
+    while True:
+        i = text.find(quote, i)
+        if i == -1 or quote == "'":
+            return i
+        backslashes = 0
+        while text[i - 1 - backslashes] == "\\":
+            backslashes += 1
+        if backslashes % 2 == 0:
+            return i
+        i += 1
+
+
+def parse_env(text: str) -> List[EnvLine]:
+    """Split the content of a .env file into logical lines."""
+    lines: List[EnvLine] = []
+    pos = 0
+    while pos < len(text):
+        end = text.find("\n", pos)
+        end = len(text) if end == -1 else end + 1
+        match = ASSIGNMENT_RE.match(text, pos, end)
+        if match is None:
+            lines.append(EnvLine(raw=text[pos:end]))
+            pos = end
+            continue
+
+        value_start = match.end()
+        quote = text[value_start] if value_start < len(text) and text[value_start] in "\"'" else ""
+        if quote:
+            closing = _find_closing_quote(text, value_start + 1, quote)
+            if closing != -1:
+                value = text[value_start + 1:closing]
+                if quote == '"':
+                    value = _unescape(value)
+                end = text.find("\n", closing)
+                end = len(text) if end == -1 else end + 1
+                lines.append(EnvLine(raw=text[pos:end], key=match.group("key"), value=value, quote=quote))
+                pos = end
+                continue
+            # An unterminated quote is read as an unquoted value, up to the end of the line.
+
+        value = text[value_start:end].rstrip("\r\n")
+        value = re.split(r"[ \t]+#", value, maxsplit=1)[0].strip()
+        lines.append(EnvLine(raw=text[pos:end], key=match.group("key"), value=value))
+        pos = end
+    return lines
+
+
+def format_assignment(key: str, value: str, quote: str = "", export: bool = False) -> str:
+    """Format KEY=value, quoting the value if asked to or if it could not be read back unquoted."""
+    value = str(value)
+    if quote == "'" and "'" in value:
+        quote = '"'
+    if not quote and NEEDS_QUOTES_RE.search(value):
+        quote = '"'
+    if quote == '"':
+        value = value.replace("\\", "\\\\").replace('"', '\\"')
+    return f"{'export ' if export else ''}{key}={quote}{value}{quote}\n"
+
+
+class EnvFile:
+    """A parsed .env file. Lookups use an index of the last assignment of each key; edits replace
+    that assignment in place (keeping its quoting) or append a new one, and leave every other line
+    untouched."""
+
+    def __init__(self, lines: List[EnvLine], path: Optional[Path] = None):
+        self.path = path
+        self.lines = list(lines)
+        self.index: Dict[str, int] = {line.key: i for i, line in enumerate(self.lines) if line.key is not None}
+        self.changed = False
+
+    @classmethod
+    def parse(cls, text: str, path: Optional[Path] = None) -> "EnvFile":
+        return cls(parse_env(text), path)
+
+    @classmethod
+    def load(cls, path: PathLike) -> "EnvFile":
+        """Read and parse a file, bypassing the cache."""
+        path = Path(path)
+        return cls.parse(path.read_text(), path)
+
+    def copy(self) -> "EnvFile":
+        return EnvFile(self.lines, self.path)
+
+    def get(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        i = self.index.get(key)
+        return self.lines[i].value if i is not None else default
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.index
+
+    def __getitem__(self, key: str) -> str:
+        return self.lines[self.index[key]].value
+
+    def keys(self) -> List[str]:
+        return list(self.index)
+
+    def items(self) -> Iterator[Tuple[str, str]]:
+        for key, i in self.index.items():
+            yield key, self.lines[i].value
+
+    def as_dict(self) -> Dict[str, str]:
+        return dict(self.items())
+
+    def set(self, key: str, value: str) -> bool:
+        """Set a variable. Returns False if it already had this value (nothing is changed)."""
+        value = str(value)
+        i = self.index.get(key)
+        if i is None:
+            last = self.lines[-1] if self.lines else None
+            if last is not None and not last.raw.endswith("\n"):
+                self.lines[-1] = EnvLine(last.raw + "\n", last.key, last.value, last.quote)
+            self.lines.append(parse_env(format_assignment(key, value))[0])
+            self.index[key] = len(self.lines) - 1
+            self.changed = True
+            return True
+
+        line = self.lines[i]
+        if line.value == value:
+            return False
+        export = ASSIGNMENT_RE.match(line.raw).group("export") is not None
+        self.lines[i] = parse_env(format_assignment(key, value, line.quote, export))[0]
+        self.changed = True
+        return True
+
+    def update(self, variables: Dict[str, str]) -> List[str]:
+        """Set several variables. Returns the keys that changed."""
+        return [key for key, value in variables.items() if self.set(key, value)]
+
+    def render(self) -> str:
+        return "".join(line.raw for line in self.lines)
+
+    def save(self, path: Optional[PathLike] = None) -> None:
+        """Write the file atomically (temporary file + rename) and refresh the cache."""
+        path = Path(path) if path is not None else self.path
+        if path is None:
+            raise ValueError("No path to save the .env file to")
+        tmp_path = _write_tmp(path, self.render())
+        try:
+            os.replace(tmp_path, path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+        self.path = path
+        self.changed = False
+        _cache_store(path, self.copy())
+
+
+def _write_tmp(path: Path, content: str) -> Path:
+    """Write content next to path, with path's permissions, and return the temporary file."""
+    tmp_path = path.with_name(path.name + ".tmp")
+    try:
+        tmp_path.write_text(content)
+        if path.exists():
+            os.chmod(tmp_path, path.stat().st_mode & 0o7777)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    return tmp_path
+
+
+class EnvTransaction:
+    """Edits to several .env files that are written together.
+
+    Each file is read (through the cache) and indexed once, however many variables are set in it.
+    commit() writes every changed file to a temporary file first and only then renames them into
+    place; if anything fails, the files already replaced are restored and none of the new content
+    is left behind. Used as a context manager, it commits when the block exits without an error.
+    """
+
+    def __init__(self):
+        self.files: Dict[Path, EnvFile] = {}
+
+    def file(self, path: PathLike) -> EnvFile:
+        """Return the editable copy of a file in this transaction."""
+        path = _cache_key(path)
+        if path not in self.files:
+            env_file = read_env_file(path)
+            if env_file is None:
+                raise FileNotFoundError(f"File {path} does not exist.")
+            self.files[path] = env_file.copy()
+        return self.files[path]
+
+    def set(self, path: PathLike, key: str, value: str) -> bool:
+        return self.file(path).set(key, value)
+
+    def update(self, path: PathLike, variables: Dict[str, str]) -> List[str]:
+        return self.file(path).update(variables)
+
+    def commit(self) -> List[Path]:
+        """Write every changed file. Returns the paths that were written."""
+        changed = [(path, env_file) for path, env_file in self.files.items() if env_file.changed]
+        staged: List[Tuple[Path, Path]] = []
+        originals: Dict[Path, bytes] = {}
+        replaced: List[Path] = []
+        try:
+            for path, env_file in changed:
+                staged.append((path, _write_tmp(path, env_file.render())))
+            for path, _ in staged:
+                originals[path] = path.read_bytes()
+            for path, tmp_path in staged:
+                os.replace(tmp_path, path)
+                replaced.append(path)
+        except BaseException:
+            for path in reversed(replaced):
+                _restore(path, originals[path])
+            raise
+        finally:
+            for _, tmp_path in staged:
+                tmp_path.unlink(missing_ok=True)
+
+        for path, env_file in changed:
+            env_file.changed = False
+            _cache_store(path, env_file.copy())
+        return [path for path, _ in changed]
+
+    def __enter__(self) -> "EnvTransaction":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.commit()
+
+
+def _restore(path: Path, content: bytes) -> None:
+    tmp_path = path.with_name(path.name + ".rollback")
+    tmp_path.write_bytes(content)
+    os.replace(tmp_path, path)
+
+
+# Parsed files by absolute path, with the (mtime_ns, size) they were parsed at.
+_cache: Dict[Path, Tuple[Tuple[int, int], EnvFile]] = {}
+_cache_lock = threading.Lock()
+# Number of times a file was actually read by read_env_file (see benchmark_env_file.py).
+file_reads = 0
+
+
+def _cache_key(path: PathLike) -> Path:
+    return Path(os.path.abspath(path))
+
+
+def _cache_store(path: PathLike, env_file: EnvFile) -> None:
+    key = _cache_key(path)
+    stat = key.stat()
+    with _cache_lock:
+        _cache[key] = ((stat.st_mtime_ns, stat.st_size), env_file)
+
+
+def read_env_file(path: PathLike) -> Optional[EnvFile]:
+    """Return the parsed file, or None if it does not exist. The file is only read again once its
+    mtime or size changed. The returned object is shared: copy() it before editing it."""
+    global file_reads
+    key = _cache_key(path)
+    try:
+        stat = key.stat()
+    except FileNotFoundError:
+        return None
+    signature = (stat.st_mtime_ns, stat.st_size)
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+    env_file = EnvFile.load(key)
+    file_reads += 1
+    with _cache_lock:
+        _cache[key] = (signature, env_file)
+    return env_file
+
+
+def clear_cache() -> None:
+    with _cache_lock:
+        _cache.clear()
+
+
+def get_env_var(path: PathLike, key: str, default: Optional[str] = None) -> Optional[str]:
+    """Return the value of a variable in a .env file, or default if the file or variable is missing."""
+    env_file = read_env_file(path)
+    return env_file.get(key, default) if env_file is not None else default
+
+
+def load_env_variables(path: PathLike) -> Dict[str, str]:
+    """Return every variable of a .env file ({} if the file does not exist)."""
+    env_file = read_env_file(path)
+    return env_file.as_dict() if env_file is not None else {}
+
+
+def update_env_file(path: PathLike, variables: Dict[str, str]) -> List[str]:
+    """Set variables in an existing .env file, keeping every other line as it is.
+
+    Returns the keys that changed; the file is only written if there are any.
+    """
+    env_file = read_env_file(path)
+    if env_file is None:
+        raise FileNotFoundError(f"File {path} does not exist.")
+    env_file = env_file.copy()
+    changed = env_file.update(variables)
+    if changed:
+        env_file.save(path)
+    return changed
@@ -10,4 +10,4 @@ source .venv/bin/activate
 # 2. Install dependencies and create credentials
 python3 -m pip install --upgrade pip
 python3 -m pip install -r requirements.txt
-python3 create_env_variables.py
\ No newline at end of file
+python3 create_env_variables.py "$@"
\ No newline at end of file
@@ -0,0 +1,246 @@
+"""Secrets for provisioning the .env files: passwords, JWT signing secrets and a pool of RSA keys.
+
+Generating an RSA-2048 key takes tens of milliseconds, more than everything else that provisioning
+an instance does. The key pool moves that cost off the provisioning path: keys are generated ahead
+of time by `fill` and stored one per file, as PKCS#8 DER encrypted with AES-256-GCM. Taking a key
+claims a file with an atomic rename, so any number of processes can share one pool. When the pool is
+empty a key is generated on the spot. Provisioning scripts top the pool up with refill_key_pool once
+their own work is done; refills hold a lock on the pool, so concurrent ones never overshoot its size.
+`fill --watch` keeps a pool full from a long-running process of its own.
+
+The encryption key is derived (HKDF-SHA256, a fresh salt per writer) from the pool key, a random
+secret such as the output of `openssl rand -base64 32`, read from $STACKAI_SECRET_POOL_KEY. Without
+it, a random pool key is created in <pool>.key next to the pool directory (mode 0600), so a copy of
+the key files alone cannot be decrypted. The pool key is not stretched, so it must not be a
+human-chosen password.
+
+Passwords are drawn from [A-Za-z0-9-_], the URL-safe base64 alphabet, so a batch of them is one read
+of the system RNG encoded with base64. The JWT secrets (HS256 signing material) are passwords too.
+
+Usage:
+    python secret_pool.py fill [--size 20] [--watch]
+    python secret_pool.py status
+"""
+
+import argparse
+import base64
+import fcntl
+import math
+import os
+import secrets
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+DEFAULT_POOL_PATH = Path(__file__).parent / ".secret-pool"
+DEFAULT_POOL_SIZE = 20
+RSA_KEY_SIZE = 2048
+RSA_PUBLIC_EXPONENT = 65537
+POOL_KEY_ENV_VAR = "STACKAI_SECRET_POOL_KEY"
+LEGACY_POOL_KEY_FILE_NAME = ".pool-key"  # Inside the pool directory, before the key file was moved out
+LOCK_FILE_NAME = ".fill.lock"
+SALT_SIZE = 16
+NONCE_SIZE = 12
+WATCH_INTERVAL_SECONDS = 5
+
+PathLike = Union[str, os.PathLike]
+
+
+def generate_passwords(count: int, length: int = 32) -> List[str]:
+    """Generate count random passwords of the given length, from a single read of the system RNG."""
+    # Every 3 bytes encode to 4 characters that are each uniform over the 64-character alphabet.
+    chunk = 3 * math.ceil(length / 4)
+    width = chunk // 3 * 4
+    encoded = base64.urlsafe_b64encode(secrets.token_bytes(chunk * count)).decode("ascii")
+    return [encoded[i * width:i * width + length] for i in range(count)]
+
+
+def generate_password(length: int = 32) -> str:
+    """Generate a random password of the given length."""
+    return generate_passwords(1, length)[0]
+
+
+def generate_jwt_secrets(count: int, length: int = 40) -> List[str]:
+    """Generate HS256 signing secrets, as used for the Supabase JWT_SECRET."""
+    return generate_passwords(count, length)
+
+
+def generate_rsa_private_key() -> rsa.RSAPrivateKey:
+    return rsa.generate_private_key(public_exponent=RSA_PUBLIC_EXPONENT, key_size=RSA_KEY_SIZE)
+
+
+class KeyPool:
+    """A directory of pregenerated, encrypted RSA private keys.
+
+    An entry is the HKDF salt, the GCM nonce and the encrypted key. The entry's file name is
+    authenticated with it, so entries cannot be swapped or renamed.
+    """
+
+    def __init__(self, path: PathLike = DEFAULT_POOL_PATH, size: int = DEFAULT_POOL_SIZE, pool_key: Optional[bytes] = None):
+        self.path = Path(path)
+        self.size = size
+        self._pool_key = pool_key
+        self._ciphers: Dict[bytes, AESGCM] = {}
+        self.salt = os.urandom(SALT_SIZE)
+
+    @property
+    def pool_key(self) -> bytes:
+        if self._pool_key is None:
+            self._pool_key = os.environ.get(POOL_KEY_ENV_VAR, "").encode() or self._pool_key_from_file()
+        return self._pool_key
+
+    def _pool_key_from_file(self) -> bytes:
+        """Read the pool key file (<pool>.key), creating it if needed. Creation is race-free: the file
+        is written under a unique name and linked into place, and whoever links first wins."""
+        pool_key_path = self.path.with_name(f"{self.path.name}.key")
+        legacy_path = self.path / LEGACY_POOL_KEY_FILE_NAME
+        if legacy_path.exists() and not pool_key_path.exists():
+            # Keep decrypting the keys of an existing pool
+            os.replace(legacy_path, pool_key_path)
+        if not pool_key_path.exists():
+            pool_key_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = pool_key_path.with_name(f"{pool_key_path.name}.{uuid.uuid4().hex}")
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+            with os.fdopen(fd, "w") as f:
+                f.write(secrets.token_urlsafe(32))
+            try:
+                os.link(tmp_path, pool_key_path)
+            except FileExistsError:
+                pass
+            finally:
+                tmp_path.unlink()
+        return pool_key_path.read_text().strip().encode()
+
+    def _cipher(self, salt: bytes) -> AESGCM:
+        if salt not in self._ciphers:
+            hkdf = HKDF(algorithm=hashes.SHA256(), length=32, salt=salt, info=b"stackai-secret-pool")
+            self._ciphers[salt] = AESGCM(hkdf.derive(self.pool_key))
+        return self._ciphers[salt]
+
+    def entries(self) -> List[Path]:
+        return sorted(self.path.glob(f"rsa{RSA_KEY_SIZE}-*.key"))
+
+    def __len__(self) -> int:
+        return len(self.entries())
+
+    def add(self, key: rsa.RSAPrivateKey) -> Path:
+        """Encrypt a key and add it to the pool. The entry only appears once it is complete."""
+        der = key.private_bytes(
+            encoding=serialization.Encoding.DER,
+            format=serialization.PrivateFormat.PKCS8,
+            encryption_algorithm=serialization.NoEncryption(),
+        )
+        self.path.mkdir(parents=True, exist_ok=True)
+        name = f"rsa{RSA_KEY_SIZE}-{uuid.uuid4().hex}"
+        nonce = os.urandom(NONCE_SIZE)
+        data = self.salt + nonce + self._cipher(self.salt).encrypt(nonce, der, name.encode())
+        tmp_path = self.path / f"{name}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        entry = self.path / f"{name}.key"
+        os.replace(tmp_path, entry)
+        return entry
+
+    def take(self) -> Optional[rsa.RSAPrivateKey]:
+        """Remove a key from the pool and return it, or None if the pool is empty."""
+        for entry in self.entries():
+            claimed = entry.with_name(f"{entry.name}.{os.getpid()}.{threading.get_ident()}.claimed")
+            try:
+                os.rename(entry, claimed)
+            except FileNotFoundError:
+                continue  # Taken by another process or thread
+            try:
+                data = claimed.read_bytes()
+            finally:
+                claimed.unlink()
+            salt, nonce, ciphertext = data[:SALT_SIZE], data[SALT_SIZE:SALT_SIZE + NONCE_SIZE], data[SALT_SIZE + NONCE_SIZE:]
+            try:
+                der = self._cipher(salt).decrypt(nonce, ciphertext, entry.stem.encode())
+            except InvalidTag:
+                print(f"⚠️  Warning: Discarding {entry.name}, it cannot be decrypted with the current pool key.")
+                continue
+            # The key was generated by cryptography and is authenticated by GCM: skip the costly checks.
+            return serialization.load_der_private_key(der, password=None, unsafe_skip_rsa_key_validation=True)
+        return None
+
+    def take_or_generate(self) -> rsa.RSAPrivateKey:
+        return self.take() or generate_rsa_private_key()
+
+    def refill(self, wait: bool = True) -> int:
+        """Generate keys until the pool holds size keys. Returns how many were added.
+
+        Refills take an exclusive lock on the pool directory (flock, so it is released if the process
+        dies), which serializes them across threads and processes. Without wait, a refill that finds
+        another one running returns 0 at once and leaves the pool to it.
+        """
+        self.path.mkdir(parents=True, exist_ok=True)
+        added = 0
+        with open(self.path / LOCK_FILE_NAME, "a") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | (0 if wait else fcntl.LOCK_NB))
+            except BlockingIOError:
+                return 0
+            while len(self) < self.size:
+                self.add(generate_rsa_private_key())
+                added += 1
+        return added
+
+
+def take_rsa_private_key(pool_path: PathLike = DEFAULT_POOL_PATH) -> rsa.RSAPrivateKey:
+    """Take a key from the pool, or generate one if the pool is empty or cannot be used."""
+    try:
+        return KeyPool(pool_path).take_or_generate()
+    except OSError as e:
+        print(f"⚠️  Warning: Could not use the key pool at {pool_path}: {e}")
+        return generate_rsa_private_key()
+
+
+def refill_key_pool(pool_path: PathLike = DEFAULT_POOL_PATH) -> None:
+    """Top the pool up in the foreground, for the next provisioning run. Meant to be called once a
+    script's own work is done; if another refill is already running, it is left to that one."""
+    try:
+        pool = KeyPool(pool_path)
+        missing = pool.size - len(pool)
+        if missing > 0:
+            print(f"Refilling the key pool ({missing} keys)...")
+            pool.refill(wait=False)
+    except OSError as e:
+        print(f"⚠️  Warning: Could not refill the key pool at {pool_path}: {e}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Manage the pool of pregenerated RSA keys.")
+    parser.add_argument("--pool", default=DEFAULT_POOL_PATH, help="The pool directory.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    fill_parser = subparsers.add_parser("fill", help="Generate keys until the pool is full.")
+    fill_parser.add_argument("--size", type=int, default=DEFAULT_POOL_SIZE, help="Number of keys to keep in the pool.")
+    fill_parser.add_argument("--watch", action="store_true", help="Keep refilling the pool as keys are taken.")
+    subparsers.add_parser("status", help="Show how many keys the pool holds.")
+    args = parser.parse_args()
+
+    if args.command == "status":
+        print(f"{len(KeyPool(args.pool))} keys in {args.pool}")
+        return
+
+    pool = KeyPool(args.pool, size=args.size)
+    while True:
+        start = time.perf_counter()
+        added = pool.refill()
+        if added:
+            print(f"Added {added} keys in {time.perf_counter() - start:.1f}s, {len(pool)} keys in {args.pool}")
+        if not args.watch:
+            break
+        time.sleep(WATCH_INTERVAL_SECONDS)
+
+
+if __name__ == "__main__":
+    main()
@@ -13,6 +13,8 @@
 from dataclasses import dataclass
 import pathlib
 
+from env_file import EnvFile, EnvTransaction
+
 # Get the workspace root (2 levels up from this script)
 SCRIPT_DIR = pathlib.Path(__file__).parent
 WORKSPACE_ROOT = SCRIPT_DIR.parent.parent
@@ -44,75 +46,44 @@ variables = {
     "stackend": stackend_variables,
 }
 
-def _update_env_file_variable(content: str, variable: EnvVar | EnvReference) -> str:
-    """Update an environment variable in a .env file."""
-    lines = content.splitlines(keepends=True)
-    
-    match variable:
-        case EnvVar():
-            # Update or create the variable
-            key_found = False
-            for i, line in enumerate(lines):
-                if line.startswith(f"{variable.key}="):
-                    # Replace this line
-                    lines[i] = f"{variable.key}={variable.value}\n"
-                    key_found = True
-                    break
-            
-            if not key_found:
-                # Add the variable at the end
-                if lines and not lines[-1].endswith('\n'):
-                    lines[-1] += '\n'
-                lines.append(f"{variable.key}={variable.value}\n")
-            
-        case EnvReference():
-            # Find the reference variable
-            reference_value = None
-            for line in lines:
-                if line.startswith(f"{variable.reference_key}="):
-                    reference_value = line.split('=', 1)[1].strip()
-                    break
-            
-            if reference_value is None:
-                raise ValueError(f"Variable {variable.reference_key} not found in content.")
-            
-            # Now update or create the key with the reference value
-            key_found = False
-            for i, line in enumerate(lines):
-                if line.startswith(f"{variable.key}="):
-                    lines[i] = f"{variable.key}={reference_value}\n"
-                    key_found = True
-                    break
-            
-            if not key_found:
-                if lines and not lines[-1].endswith('\n'):
-                    lines[-1] += '\n'
-                lines.append(f"{variable.key}={reference_value}\n")
-            
-    return ''.join(lines)
-
-
-def update_env_file_variables(path: pathlib.Path, variables: list[EnvVar | EnvReference]) -> None:
-    """Update or create environment variables in a .env file."""
-    if not path.is_file():
-        raise FileNotFoundError(f"File {path} does not exist.")
-
-    with open(path, "r") as f:
-        content = f.read()
+def apply_env_variables(env_file: EnvFile, variables: list[EnvVar | EnvReference]) -> list[str]:
+    """Apply variables to a parsed .env file, in order. Returns the keys that changed.
 
+    A reference is resolved against the file as it is at that point, so it sees earlier sets.
+    """
+    changed = []
     for variable in variables:
-        content = _update_env_file_variable(content, variable)
+        match variable:
+            case EnvVar():
+                value = variable.value
+            case EnvReference():
+                value = env_file.get(variable.reference_key)
+                if value is None:
+                    raise ValueError(f"Variable {variable.reference_key} not found in {env_file.path}.")
+        if env_file.set(variable.key, value) and variable.key not in changed:
+            changed.append(variable.key)
+    return changed
+
+
+def update_env_files(variables_by_path: dict[pathlib.Path, list[EnvVar | EnvReference]]) -> dict[pathlib.Path, list[str]]:
+    """Update or create environment variables in several .env files.
+
+    Every file is read and indexed once. If a file is missing, a reference cannot be resolved or a
+    write fails, none of the files is changed.
+    """
+    with EnvTransaction() as transaction:
+        return {
+            path: apply_env_variables(transaction.file(path), variables_list)
+            for path, variables_list in variables_by_path.items()
+        }
 
-    with open(path, "w") as f:
-        f.write(content)
 
 def main() -> None:
     print("Updating environment variables...")
+    changed = update_env_files({path: variables[key] for key, path in paths.items()})
     for key, path in paths.items():
-        variables_list = variables[key]
-        print(f"Updating {key} with {path}")
-        update_env_file_variables(path, variables_list)
+        print(f"Updated {key} ({path}): {', '.join(changed[path]) or 'no changes'}")
     print("Environment variables updated successfully.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
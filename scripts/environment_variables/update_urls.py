@@ -1,65 +1,9 @@
-import os
+import sys
 from pathlib import Path
-from typing import Dict, Optional
-
-def _get_key_value_from_env_line(line: str) -> tuple[str, str] | None:
-    """Helper to extract a key-value pair from a .env file line."""
-    stripped_line = line.strip()
-    if not stripped_line or stripped_line.startswith("#") or "=" not in stripped_line:
-        return None
-    key_part, value_part = stripped_line.split("=", 1)
-    key = key_part.strip()
-    value = value_part.strip()
-    if not key:  # Handle cases like "=value" or " =value"
-        return None
-    return key, value
-
-def get_env_var_by_env_file(var_name: str, env_file: str) -> str | None:
-    """Get the value of an environment variable from a given .env file."""
-    path = Path(env_file)
-    if not path.is_file():
-        return None # return None if the file does not exist
-
-    for line in path.read_text().splitlines():
-        if line.startswith(f"{var_name}="):
-            return line.partition("=")[2].strip()
-    return None
-
-def update_env_file_variables(env_file_path: Path, variables_to_update: Dict[str, str]) -> None:
-    """Update specific variables in a .env file while preserving other content."""
-    if not env_file_path.is_file():
-        print(f"Warning: {env_file_path} does not exist. Skipping update.")
-        return
-    
-    # Read all lines
-    lines = env_file_path.read_text().splitlines()
-    updated_lines = []
-    updated_vars = set()
-    
-    # Process each line
-    for line in lines:
-        key_value_pair = _get_key_value_from_env_line(line)
-        if key_value_pair:
-            key, current_value = key_value_pair
-            if key in variables_to_update:
-                # Update this variable
-                updated_lines.append(f"{key}={variables_to_update[key]}")
-                updated_vars.add(key)
-            else:
-                # Keep the original line
-                updated_lines.append(line)
-        else:
-            # Keep comments and empty lines
-            updated_lines.append(line)
-    
-    # Add any variables that weren't found in the file
-    for key, value in variables_to_update.items():
-        if key not in updated_vars:
-            updated_lines.append(f"{key}={value}")
-    
-    # Write back to file
-    with open(env_file_path, "w") as f:
-        f.write("\n".join(updated_lines) + "\n")
+from typing import Optional
+
+from env_file import EnvTransaction, get_env_var
+
 
 def get_url_input(prompt: str, current_value: Optional[str] = None) -> str:
     """Get URL input from user with optional default value and basic validation."""
@@ -116,23 +60,23 @@ If you don't provide a value, the existing value will be kept.
     if missing_files:
         print(f"Error: The following .env files are missing: {', '.join(missing_files)}")
         print("Please run the environment variable creation script first.")
-        return
+        sys.exit(1)
 
     # Get current values
     current_app_url = (
-        get_env_var_by_env_file("STACKWEB_URL", "stackend/.env") or
-        get_env_var_by_env_file("NEXT_PUBLIC_URL", "stackweb/.env") or
-        get_env_var_by_env_file("SITE_URL", "supabase/.env")
+        get_env_var(stackend_env_path, "STACKWEB_URL") or
+        get_env_var(stackweb_env_path, "NEXT_PUBLIC_URL") or
+        get_env_var(supabase_env_path, "SITE_URL")
     )
 
     current_api_url = (
-        get_env_var_by_env_file("STACKEND_API_URL", "stackend/.env") or
-        get_env_var_by_env_file("NEXT_PUBLIC_STACKEND_URL", "stackweb/.env")
+        get_env_var(stackend_env_path, "STACKEND_API_URL") or
+        get_env_var(stackweb_env_path, "NEXT_PUBLIC_STACKEND_URL")
     )
 
     current_supabase_url = (
-        get_env_var_by_env_file("NEXT_PUBLIC_SUPABASE_URL", "stackweb/.env") or
-        get_env_var_by_env_file("API_EXTERNAL_URL", "supabase/.env")
+        get_env_var(stackweb_env_path, "NEXT_PUBLIC_SUPABASE_URL") or
+        get_env_var(supabase_env_path, "API_EXTERNAL_URL")
     )
 
     print("\n" + "="*60)
@@ -161,6 +105,8 @@ If you don't provide a value, the existing value will be kept.
         print("Update cancelled.")
         return
 
+    transaction = EnvTransaction()
+
     # Update stackend/.env
     if app_url or api_url:
         stackend_updates = {}
@@ -170,9 +116,7 @@ If you don't provide a value, the existing value will be kept.
             stackend_updates["STACKEND_API_URL"] = api_url
             stackend_updates["INDEXING_API_URL"] = api_url
         
-        print(f"\nUpdating stackend/.env...")
-        update_env_file_variables(stackend_env_path, stackend_updates)
-        print("✓ stackend/.env updated")
+        transaction.update(stackend_env_path, stackend_updates)
 
     # Update stackweb/.env
     if app_url or api_url or supabase_url:
@@ -189,9 +133,7 @@ If you don't provide a value, the existing value will be kept.
         if supabase_url:
             stackweb_updates["NEXT_PUBLIC_SUPABASE_URL"] = supabase_url
         
-        print(f"\nUpdating stackweb/.env...")
-        update_env_file_variables(stackweb_env_path, stackweb_updates)
-        print("✓ stackweb/.env updated")
+        transaction.update(stackweb_env_path, stackweb_updates)
 
     # Update supabase/.env
     if app_url or supabase_url:
@@ -202,9 +144,19 @@ If you don't provide a value, the existing value will be kept.
             supabase_updates["API_EXTERNAL_URL"] = supabase_url
             supabase_updates["SUPABASE_PUBLIC_URL"] = supabase_url
         
-        print(f"\nUpdating supabase/.env...")
-        update_env_file_variables(supabase_env_path, supabase_updates)
-        print("✓ supabase/.env updated")
+        transaction.update(supabase_env_path, supabase_updates)
+
+    # Write the three files together: either all of them are updated or none is
+    print(f"\nUpdating .env files...")
+    try:
+        written = transaction.commit()
+    except OSError as e:
+        print(f"Error: could not update the .env files, no file was changed: {e}")
+        sys.exit(1)
+    for path in written:
+        print(f"✓ {path.relative_to(root_project_path)} updated")
+    if not written:
+        print("The .env files already had these URLs.")
 
     print(f"\n🎉 URL update completed successfully!")
     print("You can now restart your services to apply the new configuration.")
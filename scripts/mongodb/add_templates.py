@@ -1,99 +1,281 @@
 import os
-import pickle
-import tempfile
-import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
-from typing import List
+from typing import Dict, Iterable, Iterator, List, Optional, Union
 
+from bson import Decimal128, Int64, ObjectId
 from dotenv import dotenv_values
-from pymongo import MongoClient
+from pymongo import DeleteOne, MongoClient, ReplaceOne
+from pymongo.collection import Collection
 
+from template_bundle import (
+    BundleWriter,
+    TemplateBundle,
+    is_bundle,
+    iter_templates_from_pickle_zip,
+    template_hash,
+    write_bundle,
+)
 
-def download_templates(mongo_production_client: MongoClient) -> List:
-    """Download all templates from the production database
+TEMPLATES_DATABASE = "__models__"
+TEMPLATES_COLLECTION = "__templates__"
+SYNC_BATCH_SIZE = 500
+
+EXPORT_DEFAULT_WORKERS = 4
+EXPORT_DEFAULT_BATCH_SIZE = 100
+EXPORT_MAX_BATCH_SIZE = 1000
+EXPORT_TARGET_BATCH_BYTES = 4 * 1024 * 1024
+
+
+def tuned_batch_size(collection: Collection) -> int:
+    """Pick a cursor batch size that keeps each batch around EXPORT_TARGET_BATCH_BYTES
 
     Args:
-        mongo_production_client (MongoClient): A MongoClient object connected to the production database.
+        collection (Collection): The collection that will be read.
+
+    Returns:
+        int: The batch size, based on the average document size reported by collStats.
+    """
+    try:
+        average_size = collection.database.command("collStats", collection.name).get("avgObjSize")
+    except Exception:
+        average_size = None
+    if not average_size:
+        return EXPORT_DEFAULT_BATCH_SIZE
+    return max(1, min(EXPORT_MAX_BATCH_SIZE, EXPORT_TARGET_BATCH_BYTES // int(average_size)))
+
+
+def id_type_bracket(value) -> str:
+    """Return the comparison bracket of an _id: range queries only match values of the same bracket."""
+    if isinstance(value, (int, float, Int64, Decimal128)) and not isinstance(value, bool):
+        return "number"
+    return type(value).__name__
+
+
+def split_id_ranges(collection: Collection, parts: int) -> List[Dict]:
+    """Split a collection into _id ranges holding about the same number of documents
+
+    Range filters only match _ids of the same BSON type as their bounds. MongoDB sorts _ids by
+    type first, so when the smallest and largest _id have the same type, every _id does; otherwise
+    the collection is not split.
+
+    Args:
+        collection (Collection): The collection to split.
+        parts (int): The number of ranges wanted.
 
     Returns:
-        List: A list of all templates in the production database.
+        List[Dict]: One query filter per range. Together they cover the whole collection.
     """
+    first, last = (
+        next(iter(collection.find({}, {"_id": 1}).sort("_id", direction).limit(1)), None) for direction in (1, -1)
+    )
+    if first is None or id_type_bracket(first["_id"]) != id_type_bracket(last["_id"]):
+        return [{}]
+
+    count = collection.estimated_document_count()
+    bounds = []
+    for part in range(1, parts):
+        cursor = collection.find({}, {"_id": 1}).sort("_id", 1).skip(part * count // parts).limit(1)
+        document = next(iter(cursor), None)
+        if document is not None and (not bounds or document["_id"] > bounds[-1]):
+            bounds.append(document["_id"])
+
+    edges = [None] + bounds + [None]
+    filters = []
+    for lower, upper in zip(edges, edges[1:]):
+        condition = {}
+        if lower is not None:
+            condition["$gte"] = lower
+        if upper is not None:
+            condition["$lt"] = upper
+        filters.append({"_id": condition} if condition else {})
+    return filters
+
+
+def export_templates(
+    mongo_production_client: MongoClient,
+    target_path: str,
+    workers: int = EXPORT_DEFAULT_WORKERS,
+    projection: Optional[Dict] = None,
+    batch_size: Optional[int] = None,
+) -> int:
+    """Stream all templates from the production database into a template bundle
+
+    Documents are written to the bundle as they arrive, so memory is bounded by one cursor batch
+    per worker instead of the whole collection. With more than one worker, the collection is split
+    into _id ranges that are read over parallel cursors. The bundle is only written if it holds as
+    many templates as the collection.
 
-    # Get all templates from the database and store them in a variable
-    templates_cursor = mongo_production_client["__models__"]["__templates__"].find()
+    Args:
+        mongo_production_client (MongoClient): A MongoClient object connected to the production database.
+        target_path (str): The path to the bundle file to be created.
+        workers (int): The number of parallel cursors.
+        projection (Optional[Dict]): The fields to export, all of them by default.
+        batch_size (Optional[int]): The cursor batch size, tuned from the average document size by default.
 
-    # Convert the cursor to a list containing all templates
-    templates = list(templates_cursor)
+    Returns:
+        int: The number of templates exported.
 
-    return templates
+    Raises:
+        RuntimeError: If the number of templates exported differs from the number in the collection.
+    """
+    collection = mongo_production_client[TEMPLATES_DATABASE][TEMPLATES_COLLECTION]
+    batch_size = batch_size or tuned_batch_size(collection)
+    filters = split_id_ranges(collection, workers) if workers > 1 else [{}]
+
+    def export_range(query: Dict) -> int:
+        count = 0
+        for template in collection.find(query, projection, batch_size=batch_size):
+            writer.add(template)
+            count += 1
+        return count
+
+    with BundleWriter(target_path) as writer:
+        with ThreadPoolExecutor(max_workers=len(filters)) as executor:
+            exported_count = sum(executor.map(export_range, filters))
+        # Raising here discards the bundle: syncing from an incomplete one would delete templates.
+        expected_count = collection.count_documents({})
+        if exported_count != expected_count:
+            raise RuntimeError(
+                f"Exported {exported_count} templates but the collection holds {expected_count}, "
+                f"the bundle was not written"
+            )
+    return exported_count
 
 
-def generate_templates_zip_from_template_list(
+def generate_templates_bundle_from_template_list(
     templates: list, target_path: str
 ) -> None:
-    """Generate a zip file containing the templates from a list of templates
+    """Generate a template bundle from a list of templates
 
     Args:
-        templates (list): A list of all templates to store in the zip file.
-        target_path (str): The path to the zip file to be created.
+        templates (list): A list of all templates to store in the bundle.
+        target_path (str): The path to the bundle file to be created.
 
     """
 
-    with tempfile.TemporaryDirectory() as temp_dir:
-        for template in templates:
-            with open(f"{temp_dir}/{template['key']}.pickle", "wb") as f:
-                pickle.dump(template, f)
+    write_bundle(templates, target_path)
 
-        with zipfile.ZipFile(target_path, "w") as zip_ref:
-            for root, dirs, files in os.walk(temp_dir):
-                for file in files:
-                    zip_ref.write(os.path.join(root, file), file)
 
+def load_templates_from_zip_file(file_path: str) -> Iterator[Dict]:
+    """Lazily load templates from a legacy zip file of pickled templates
 
-def load_templates_from_zip_file(file_path: str) -> List:
-    """Load templates from a zip file
+    Each member is streamed with ZipFile.open, so nothing is extracted to disk and only one
+    template is held in memory at a time.
 
     Args:
         file_path (str): The path to the zip file containing the templates.
 
-    Returns:
-        list: A list of all templates in the zip file.
+    Yields:
+        dict: The templates in the zip file, one at a time.
     """
 
-    with zipfile.ZipFile(file_path, "r") as zip_ref:
-        # extract the zip file to a temporary directory
-        with tempfile.TemporaryDirectory() as temp_dir:
-            zip_ref.extractall(temp_dir)
-
-            # load the templates from the temporary directory
-            templates = []
-            for root, dirs, files in os.walk(temp_dir):
-                for file in files:
-                    with open(os.path.join(root, file), "rb") as f:
-                        templates.append(pickle.load(f))
-
-    return templates
+    yield from iter_templates_from_pickle_zip(file_path)
 
 
-def upload_templates_from_list(mongo_local_client: MongoClient, templates: List):
-    """Upload all templates to the new database
+def load_templates_from_file(file_path: str) -> Iterator[Dict]:
+    """Lazily load templates from a template bundle, or from a legacy zip file of pickled templates
 
     Args:
-        mongo_local_client (MongoClient): A MongoClient object connected to the new database.
-        templates (List): A list of all templates to upload to the new database.
+        file_path (str): The path to the bundle or zip file containing the templates.
+
+    Yields:
+        dict: The templates in the file, one at a time.
     """
-    print("Uploading templates...")
-    mongo_local_client["__models__"]["__templates__"].insert_many(templates)
+
+    if is_bundle(file_path):
+        with TemplateBundle(file_path) as bundle:
+            yield from bundle
+    else:
+        yield from load_templates_from_zip_file(file_path)
 
 
-def remove_existing_templates(mongodb_client: MongoClient):
-    """Remove all templates from the new database
+def sync_templates(
+    mongodb_client: MongoClient,
+    templates: Union[TemplateBundle, Iterable[Dict]],
+    batch_size: int = SYNC_BATCH_SIZE,
+) -> Dict[str, int]:
+    """Make the templates collection match the given templates, writing only what changed
+
+    Templates are matched on their key and compared by content hash. New and changed templates are
+    upserted with unordered bulk writes, and documents that are no longer needed are deleted last,
+    so the collection is never empty while the sync runs. A document is only deleted if no template
+    was upserted under its _id, so a template whose key was renamed is updated in place. Re-running
+    with the same templates performs no writes. When syncing from a bundle, the hashes come from
+    its index, so unchanged templates are never decoded.
 
     Args:
-        mongodb_client (MongoClient): A MongoClient object connected to the new database.
+        mongodb_client (MongoClient): A MongoClient object connected to the target database.
+        templates (Union[TemplateBundle, Iterable[Dict]]): The templates that should be in the database,
+            as an open bundle, a list or a generator.
+        batch_size (int): The number of operations sent per bulk write.
+
+    Returns:
+        Dict[str, int]: The number of templates inserted, updated, deleted and left unchanged.
     """
-    print("Removing existing templates...")
-    mongodb_client["__models__"]["__templates__"].drop()
+    collection = mongodb_client[TEMPLATES_DATABASE][TEMPLATES_COLLECTION]
+    counts = {"inserted": 0, "updated": 0, "deleted": 0, "unchanged": 0}
+
+    # Index what is already there: key -> (_id, content hash). Duplicated keys are deleted below.
+    existing = {}
+    stale_ids = []
+    for document in collection.find({}, batch_size=batch_size):
+        if document.get("key") in existing:
+            stale_ids.append(document["_id"])
+        else:
+            existing[document.get("key")] = (document["_id"], template_hash(document))
+
+    operations = []
+    upserted_ids = set()
+
+    def flush():
+        if operations:
+            result = collection.bulk_write(operations, ordered=False)
+            counts["inserted"] += result.upserted_count
+            counts["updated"] += result.modified_count
+            operations.clear()
+
+    if isinstance(templates, TemplateBundle):
+        candidates = (
+            (key, templates.content_hash(key), partial(templates.load, key))
+            for key in (entry["key"] for entry in templates.index_entries())
+        )
+    else:
+        candidates = ((template["key"], None, lambda template=template: template) for template in templates)
+
+    for key, indexed_hash, load_template in candidates:
+        current = existing.pop(key, None)
+        if current is not None and indexed_hash == current[1]:
+            counts["unchanged"] += 1
+            continue
+        template = load_template()
+        if "_id" not in template:
+            # MongoDB stores _id as the first field, so it goes first here too for the hashes to match.
+            template = {"_id": current[0] if current is not None else ObjectId(), **template}
+        if current is not None:
+            current_id, current_hash = current
+            if template_hash(template) == current_hash:
+                counts["unchanged"] += 1
+                continue
+            if template["_id"] != current_id:
+                # _id is immutable, so the template is inserted with its own _id and the old document deleted last.
+                stale_ids.append(current_id)
+        upserted_ids.add(template["_id"])
+        operations.append(ReplaceOne({"_id": template["_id"]}, template, upsert=True))
+        if len(operations) >= batch_size:
+            flush()
+    flush()
+
+    stale_ids.extend(document_id for document_id, _ in existing.values())
+    stale_ids = [document_id for document_id in stale_ids if document_id not in upserted_ids]
+    for start in range(0, len(stale_ids), batch_size):
+        result = collection.bulk_write(
+            [DeleteOne({"_id": document_id}) for document_id in stale_ids[start:start + batch_size]],
+            ordered=False,
+        )
+        counts["deleted"] += result.deleted_count
+    return counts
 
 
 def get_mongodb_uris_from_user():
@@ -159,38 +341,53 @@ if __name__ == "__main__":
 
     while True:
         print(
-            "Please, input 1 (or leave blank) if you wish to sync the flow templates from a local zip file (default), input 2 if you wish to sync the flow templates from a remote production database: "
+            "Please, input 1 (or leave blank) if you wish to sync the flow templates from a local template bundle (default), input 2 if you wish to sync the flow templates from a remote production database: "
         )
 
-        choice = input("Choice (leave blank for local zip, recommended): ")
+        choice = input("Choice (leave blank for local bundle, recommended): ")
         if choice == "":
             choice = "1"
 
         if choice == "1":
             path = input(
-                "Please provide the path to the zip file containing the templates (empty for default): "
+                "Please provide the path to the bundle or zip file containing the templates (empty for default): "
             )
             if path == "":
-                path = "templates.zip"
-            templates = load_templates_from_zip_file(path)
+                path = "templates.bundle"
             break
         elif choice == "2":
             mongo_production_client = get_mongodb_client_from_user(
                 "Please provide the connection string to the reference MongoDB database: "
             )
-            templates = download_templates(mongo_production_client)
+            path = input(
+                "Please provide the path where the exported templates will be saved (empty for default): "
+            )
+            if path == "":
+                path = "templates-export.bundle"
+            print("Exporting templates...")
+            try:
+                exported_count = export_templates(mongo_production_client, path)
+            except RuntimeError as e:
+                print(f"Error: {e}")
+                exit(1)
+            print(f"Exported {exported_count} templates to {path}")
             break
         else:
             print("Invalid choice, please try again.")
 
     target_mongodb_client = MongoClient(on_premise_mongodb_connection_string)
+
+    print("Synchronizing templates...")
+    if is_bundle(path):
+        with TemplateBundle(path) as bundle:
+            counts = sync_templates(target_mongodb_client, bundle)
+    else:
+        counts = sync_templates(target_mongodb_client, load_templates_from_zip_file(path))
     print(
-        f"\n\nA total of {len(templates)} templates will be uploaded to the target database..."
+        f"\n\nTemplates synchronized: {counts['inserted']} inserted, {counts['updated']} updated, "
+        f"{counts['deleted']} deleted, {counts['unchanged']} unchanged."
     )
 
-    remove_existing_templates(target_mongodb_client)
-    upload_templates_from_list(target_mongodb_client, templates)
-
     print("*" * 80)
     print("Success! Happy Stacking :)")
     print("*" * 80)
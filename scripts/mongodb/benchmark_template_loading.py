@@ -0,0 +1,90 @@
+"""Benchmark template loading: legacy zip of pickles vs. template bundle.
+
+The legacy zip is rebuilt from the bundle in a temporary directory, so both loaders read the same
+templates. Reports wall time and peak Python memory (tracemalloc) for loading every template into a
+list, for streaming them one at a time, and for loading a single template by key.
+
+Usage:
+    python benchmark_template_loading.py [--bundle templates.bundle] [--rounds 5]
+"""
+
+import argparse
+import os
+import pickle
+import tempfile
+import time
+import tracemalloc
+import zipfile
+
+from add_templates import load_templates_from_zip_file
+from template_bundle import TemplateBundle, load_templates_from_bundle
+
+
+def write_legacy_zip(templates, target_path):
+    with zipfile.ZipFile(target_path, "w", zipfile.ZIP_DEFLATED) as zip_ref:
+        for template in templates:
+            zip_ref.writestr(f"templates/{template['key']}.pickle", pickle.dumps(template))
+
+
+def measure(function, rounds):
+    """Return (best wall time, peak traced memory) of function over rounds."""
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak
+
+
+def consume(iterable):
+    """Touch every template without keeping it, like a streaming uploader would."""
+    count = 0
+    for _ in iterable:
+        count += 1
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark template loading.")
+    parser.add_argument("--bundle", default=os.path.join(os.path.dirname(__file__), "templates.bundle"))
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    templates = load_templates_from_bundle(args.bundle)
+    key = templates[len(templates) // 2]["key"]
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        zip_path = os.path.join(temp_dir, "templates.zip")
+        write_legacy_zip(templates, zip_path)
+
+        def load_one_from_zip():
+            return next(t for t in load_templates_from_zip_file(zip_path) if t["key"] == key)
+
+        def load_one_from_bundle():
+            with TemplateBundle(args.bundle) as bundle:
+                return bundle.load(key)
+
+        def stream_bundle():
+            with TemplateBundle(args.bundle) as bundle:
+                return consume(bundle)
+
+        results = [
+            ("zip, load all", measure(lambda: list(load_templates_from_zip_file(zip_path)), args.rounds)),
+            ("zip, stream all", measure(lambda: consume(load_templates_from_zip_file(zip_path)), args.rounds)),
+            ("bundle, load all", measure(lambda: load_templates_from_bundle(args.bundle), args.rounds)),
+            ("bundle, stream all", measure(stream_bundle, args.rounds)),
+            ("zip, load one key", measure(load_one_from_zip, args.rounds)),
+            ("bundle, load one key", measure(load_one_from_bundle, args.rounds)),
+        ]
+
+    print(f"{len(templates)} templates")
+    for name, (seconds, peak) in results:
+        print(f"  {name:<22} {seconds * 1000:8.1f} ms   peak {peak / (1024 * 1024):6.2f} MiB")
+
+
+if __name__ == "__main__":
+    main()
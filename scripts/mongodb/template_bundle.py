@@ -0,0 +1,280 @@
+"""Template bundle: a single-file, indexed stream of BSON template documents.
+
+A bundle replaces the zip of per-template pickle files. Its layout is:
+
+    magic           8 bytes, b"STKTPLB" followed by the format version
+    index length    uint32, little endian
+    index           BSON document: {"compression": "zlib", "created": datetime, "entries": [...]}
+    entries         zlib-compressed BSON documents, back to back
+
+Each index entry holds the template key, the offset and length of its compressed entry (offsets are
+relative to the end of the index), the size of its BSON encoding, its content hash (see template_hash)
+and the time its content last changed. The modified time is carried over from the previous bundle at
+the same path when a template's hash did not change.
+
+Listing, comparing and checking templates is answered from the index alone, a single template is read
+with one seek, and the whole bundle can be streamed one template at a time. Loading a bundle only
+decodes BSON, so unlike unpickling it cannot execute code.
+
+Usage:
+    python template_bundle.py list [bundle]
+    python template_bundle.py show <key> [--bundle bundle]
+    python template_bundle.py diff <bundle_a> <bundle_b>
+    python template_bundle.py convert <templates.zip> <templates.bundle>
+"""
+
+import argparse
+import datetime
+import hashlib
+import os
+import pickle
+import shutil
+import struct
+import tempfile
+import threading
+import zipfile
+import zlib
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Union
+
+import bson
+from bson import json_util
+
+MAGIC = b"STKTPLB"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<7sBI")
+COMPRESSION_LEVEL = 6
+DEFAULT_BUNDLE_PATH = Path(__file__).parent / "templates.bundle"
+
+PathLike = Union[str, os.PathLike]
+
+
+def template_hash(template: Dict) -> str:
+    """Return the content hash of a template: the SHA-256 of its BSON encoding, _id included."""
+    return hashlib.sha256(bson.encode(template)).hexdigest()
+
+
+def is_bundle(file_path: PathLike) -> bool:
+    """Check whether a file is a template bundle (as opposed to a zip of pickles)."""
+    with open(file_path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+class BundleWriter:
+    """Write a template bundle one template at a time.
+
+    Compressed entries are spooled to a temporary file while the index is built, then written after
+    the index header on close(). The target file is replaced atomically. add() may be called from
+    several threads; entries are encoded and compressed outside the lock.
+    """
+
+    def __init__(self, target_path: PathLike):
+        self.target_path = Path(target_path)
+        self.entries: List[Dict] = []
+        self.keys = set()
+        self.body = tempfile.TemporaryFile()
+        self.offset = 0
+        self.lock = threading.Lock()
+
+    def add(self, template: Dict) -> None:
+        key = template["key"]
+        encoded = bson.encode(template)
+        data = zlib.compress(encoded, COMPRESSION_LEVEL)
+        entry = {"key": key, "length": len(data), "size": len(encoded), "sha256": hashlib.sha256(encoded).hexdigest()}
+        with self.lock:
+            if key in self.keys:
+                raise ValueError(f"Duplicate template key: {key}")
+            self.body.write(data)
+            entry["offset"] = self.offset
+            self.entries.append(entry)
+            self.keys.add(key)
+            self.offset += len(data)
+
+    def _previous_entries(self) -> Dict[str, Dict]:
+        """Return the index entries of the bundle currently at the target path, if there is one."""
+        try:
+            with TemplateBundle(self.target_path) as previous:
+                return previous.entries
+        except (OSError, ValueError):
+            return {}
+
+    def close(self) -> None:
+        now = datetime.datetime.now(datetime.timezone.utc)
+        previous_entries = self._previous_entries()
+        for entry in self.entries:
+            previous = previous_entries.get(entry["key"])
+            unchanged = previous is not None and previous.get("sha256") == entry["sha256"]
+            entry["modified"] = previous.get("modified", now) if unchanged else now
+        index = bson.encode({"compression": "zlib", "created": now, "entries": self.entries})
+        tmp_path = self.target_path.with_name(self.target_path.name + ".tmp")
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(index)))
+                f.write(index)
+                self.body.seek(0)
+                shutil.copyfileobj(self.body, f)
+            os.replace(tmp_path, self.target_path)
+        finally:
+            self.body.close()
+            if tmp_path.exists():
+                tmp_path.unlink()
+
+    def __enter__(self) -> "BundleWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.body.close()
+
+
+class TemplateBundle:
+    """Read access to a template bundle. Only the index is read when the bundle is opened."""
+
+    def __init__(self, file_path: PathLike):
+        self.file_path = Path(file_path)
+        self.file = open(self.file_path, "rb")
+        try:
+            magic, version, index_length = HEADER.unpack(self.file.read(HEADER.size))
+            if magic != MAGIC:
+                raise ValueError(f"{self.file_path} is not a template bundle")
+            if version != FORMAT_VERSION:
+                raise ValueError(f"Unsupported template bundle version {version} in {self.file_path}")
+            index = bson.decode(self.file.read(index_length))
+        except Exception:
+            self.file.close()
+            raise
+        self.data_offset = HEADER.size + index_length
+        self.entries = {entry["key"]: entry for entry in index["entries"]}
+
+    def keys(self) -> List[str]:
+        return list(self.entries)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.entries
+
+    def entry(self, key: str) -> Dict:
+        """Return the index entry of a template (key, offset, length, size, sha256, modified)."""
+        return self.entries[key]
+
+    def index_entries(self) -> List[Dict]:
+        """Return the index entries in bundle order."""
+        return sorted(self.entries.values(), key=lambda e: e["offset"])
+
+    def content_hash(self, key: str) -> str:
+        """Return the content hash of a template, decoding it only if the index does not carry one."""
+        entry = self.entries[key]
+        return entry.get("sha256") or template_hash(self._read_entry(entry))
+
+    def _read_entry(self, entry: Dict) -> Dict:
+        self.file.seek(self.data_offset + entry["offset"])
+        return bson.decode(zlib.decompress(self.file.read(entry["length"])))
+
+    def load(self, key: str) -> Dict:
+        """Load a single template by key."""
+        if key not in self.entries:
+            raise KeyError(key)
+        return self._read_entry(self.entries[key])
+
+    def __iter__(self) -> Iterator[Dict]:
+        """Yield every template in bundle order, decoding one entry at a time."""
+        for entry in self.index_entries():
+            yield self._read_entry(entry)
+
+    def close(self) -> None:
+        self.file.close()
+
+    def __enter__(self) -> "TemplateBundle":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+
+def write_bundle(templates: Iterable[Dict], target_path: PathLike) -> int:
+    """Write templates to a bundle and return how many were written."""
+    with BundleWriter(target_path) as writer:
+        for template in templates:
+            writer.add(template)
+    return len(writer.entries)
+
+
+def load_templates_from_bundle(file_path: PathLike) -> List[Dict]:
+    """Load every template of a bundle."""
+    with TemplateBundle(file_path) as bundle:
+        return list(bundle)
+
+
+def iter_templates_from_pickle_zip(file_path: PathLike) -> Iterator[Dict]:
+    """Yield the templates of a legacy zip of pickle files. Only use this on trusted files."""
+    with zipfile.ZipFile(file_path, "r") as zip_ref:
+        for info in zip_ref.infolist():
+            if info.is_dir() or not info.filename.endswith(".pickle"):
+                continue
+            with zip_ref.open(info) as f:
+                yield pickle.load(f)
+
+
+def convert_zip_to_bundle(zip_path: PathLike, bundle_path: PathLike) -> int:
+    """Convert a legacy zip of pickle files into a bundle and return the number of templates."""
+    return write_bundle(iter_templates_from_pickle_zip(zip_path), bundle_path)
+
+
+def diff_bundles(bundle_a: TemplateBundle, bundle_b: TemplateBundle) -> Dict[str, List[str]]:
+    """Compare two bundles by their indexes. Returns the added, removed and changed keys (a -> b)."""
+    return {
+        "added": sorted(key for key in bundle_b.entries if key not in bundle_a),
+        "removed": sorted(key for key in bundle_a.entries if key not in bundle_b),
+        "changed": sorted(
+            key for key in bundle_a.entries
+            if key in bundle_b and bundle_a.content_hash(key) != bundle_b.content_hash(key)
+        ),
+    }
+
+
+def format_modified(entry: Dict) -> str:
+    modified = entry.get("modified")
+    return modified.strftime("%Y-%m-%d %H:%M:%S") if modified else "-"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Template bundle tools.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    list_parser = subparsers.add_parser("list", help="List the templates of a bundle.")
+    list_parser.add_argument("bundle_path", nargs="?", default=DEFAULT_BUNDLE_PATH, help="The bundle file.")
+    show_parser = subparsers.add_parser("show", help="Print one template as JSON.")
+    show_parser.add_argument("key", help="The template key.")
+    show_parser.add_argument("--bundle", dest="bundle_path", default=DEFAULT_BUNDLE_PATH, help="The bundle file.")
+    diff_parser = subparsers.add_parser("diff", help="Show the templates added, removed and changed between two bundles.")
+    diff_parser.add_argument("bundle_a", help="The old bundle file.")
+    diff_parser.add_argument("bundle_b", help="The new bundle file.")
+    convert_parser = subparsers.add_parser("convert", help="Convert a zip of pickle files into a bundle.")
+    convert_parser.add_argument("zip_path", help="The zip file containing the pickled templates.")
+    convert_parser.add_argument("bundle_path", help="The bundle file to create.")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        with TemplateBundle(args.bundle_path) as bundle:
+            for entry in bundle.index_entries():
+                print(f"{entry['key']:<60} {entry.get('size', 0):>9}  {entry.get('sha256', '-')[:12]}  {format_modified(entry)}")
+            print(f"{len(bundle)} templates")
+    elif args.command == "show":
+        with TemplateBundle(args.bundle_path) as bundle:
+            if args.key not in bundle:
+                print(f"Template not found: {args.key}")
+                raise SystemExit(1)
+            print(json_util.dumps(bundle.load(args.key), indent=2))
+    elif args.command == "diff":
+        with TemplateBundle(args.bundle_a) as bundle_a, TemplateBundle(args.bundle_b) as bundle_b:
+            changes = diff_bundles(bundle_a, bundle_b)
+        for marker, name in (("+", "added"), ("-", "removed"), ("~", "changed")):
+            for key in changes[name]:
+                print(f"{marker} {key}")
+        print(", ".join(f"{len(changes[name])} {name}" for name in ("added", "removed", "changed")))
+    elif args.command == "convert":
+        count = convert_zip_to_bundle(args.zip_path, args.bundle_path)
+        print(f"Converted {count} templates from {args.zip_path} into {args.bundle_path}")
@@ -0,0 +1,111 @@
+"""Tests for add_templates.py, run with: python -m pytest scripts/mongodb"""
+
+from pathlib import Path
+
+import mongomock
+import pytest
+from bson import ObjectId
+
+from add_templates import TEMPLATES_COLLECTION, TEMPLATES_DATABASE, export_templates, sync_templates
+from template_bundle import TemplateBundle, write_bundle
+
+
+def make_templates(count: int):
+    return [
+        {"_id": ObjectId(), "key": f"template-{index}", "name": f"Template {index}", "nodes": [index]}
+        for index in range(count)
+    ]
+
+
+@pytest.fixture
+def client() -> mongomock.MongoClient:
+    return mongomock.MongoClient()
+
+
+def stored(client: mongomock.MongoClient):
+    return {document["key"]: document for document in client[TEMPLATES_DATABASE][TEMPLATES_COLLECTION].find()}
+
+
+def test_rerun_performs_no_writes(client: mongomock.MongoClient, tmp_path: Path):
+    templates = make_templates(10)
+    path = tmp_path / "templates.bundle"
+    write_bundle(templates, path)
+
+    with TemplateBundle(path) as bundle:
+        assert sync_templates(client, bundle, batch_size=3) == {
+            "inserted": 10, "updated": 0, "deleted": 0, "unchanged": 0
+        }
+    with TemplateBundle(path) as bundle:
+        assert sync_templates(client, bundle, batch_size=3) == {
+            "inserted": 0, "updated": 0, "deleted": 0, "unchanged": 10
+        }
+    assert sync_templates(client, templates) == {"inserted": 0, "updated": 0, "deleted": 0, "unchanged": 10}
+
+
+def test_templates_without_id_are_not_rewritten(client: mongomock.MongoClient):
+    templates = [{"key": "a", "name": "A"}, {"key": "b", "name": "B"}]
+    assert sync_templates(client, [dict(template) for template in templates])["inserted"] == 2
+    assert sync_templates(client, [dict(template) for template in templates]) == {
+        "inserted": 0, "updated": 0, "deleted": 0, "unchanged": 2
+    }
+
+
+def test_renamed_key_is_updated_in_place(client: mongomock.MongoClient):
+    templates = make_templates(98)
+    sync_templates(client, templates)
+
+    templates[0] = dict(templates[0], key="template-renamed")
+    assert sync_templates(client, templates) == {"inserted": 0, "updated": 1, "deleted": 0, "unchanged": 97}
+
+    documents = stored(client)
+    assert len(documents) == 98
+    assert "template-0" not in documents
+    assert documents["template-renamed"]["_id"] == templates[0]["_id"]
+
+
+def test_changed_and_removed_templates(client: mongomock.MongoClient):
+    templates = make_templates(5)
+    sync_templates(client, templates)
+
+    templates[1]["name"] = "Changed"
+    new_id = ObjectId()
+    templates[2] = dict(templates[2], _id=new_id)
+    del templates[4]
+    assert sync_templates(client, templates) == {"inserted": 1, "updated": 1, "deleted": 2, "unchanged": 2}
+
+    documents = stored(client)
+    assert sorted(documents) == ["template-0", "template-1", "template-2", "template-3"]
+    assert documents["template-1"]["name"] == "Changed"
+    assert documents["template-2"]["_id"] == new_id
+
+
+def test_export_covers_mixed_id_types(client: mongomock.MongoClient, tmp_path: Path):
+    templates = make_templates(6) + [
+        {"_id": index, "key": f"int-{index}", "name": "int"} for index in range(3)
+    ] + [{"_id": f"id-{index}", "key": f"str-{index}", "name": "str"} for index in range(3)]
+    client[TEMPLATES_DATABASE][TEMPLATES_COLLECTION].insert_many(templates)
+
+    path = tmp_path / "templates.bundle"
+    assert export_templates(client, str(path), workers=4) == 12
+    with TemplateBundle(path) as bundle:
+        assert sorted(bundle.keys()) == sorted(template["key"] for template in templates)
+
+
+def test_export_splits_single_id_type(client: mongomock.MongoClient, tmp_path: Path):
+    client[TEMPLATES_DATABASE][TEMPLATES_COLLECTION].insert_many(make_templates(40))
+
+    path = tmp_path / "templates.bundle"
+    assert export_templates(client, str(path), workers=4) == 40
+    with TemplateBundle(path) as bundle:
+        assert len(bundle) == 40
+
+
+def test_incomplete_export_is_not_written(client: mongomock.MongoClient, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    templates = make_templates(4)
+    client[TEMPLATES_DATABASE][TEMPLATES_COLLECTION].insert_many(templates)
+    monkeypatch.setattr("add_templates.split_id_ranges", lambda collection, parts: [{"_id": templates[0]["_id"]}])
+
+    path = tmp_path / "templates.bundle"
+    with pytest.raises(RuntimeError, match="Exported 1 templates but the collection holds 4"):
+        export_templates(client, str(path), workers=4)
+    assert not path.exists()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for the puller exclusion matcher.
+
+Compares the compiled matcher in puller.py against the original per-pattern loop
+over a synthetic tree of 100k entries shaped like a GitHub archive of the repo
+(service directories plus node_modules/, .git/, __pycache__/ and log files).
+
+Usage:
+    python benchmark_exclusions.py [--entries 100000]
+"""
+
+import sys
+import time
+import random
+import argparse
+from pathlib import Path, PurePosixPath
+
+sys.path.insert(0, str(Path(__file__).parent))
+import puller  # noqa: E402
+
+
+def legacy_is_excluded(path: PurePosixPath, project_root_in_zip: PurePosixPath) -> bool:
+    """The original is_excluded implementation, kept here as the baseline."""
+    try:
+        relative_path_obj = path.relative_to(project_root_in_zip)
+    except ValueError:
+        return False
+    relative_path_str = str(relative_path_obj)
+    for pattern in puller.EXCLUDE_PATTERNS:
+        if relative_path_obj.name == pattern:
+            return True
+        if "*" in pattern and relative_path_obj.match(pattern):
+            return True
+        if pattern in relative_path_obj.parts:
+            return True
+        if relative_path_str.startswith(pattern + "/") or relative_path_str == pattern:
+            return True
+    return False
+
+
+def build_synthetic_tree(entries: int, root: PurePosixPath) -> list:
+    """Build a list of archive paths below root, roughly a third of them in excluded subtrees."""
+    rng = random.Random(42)
+    top_dirs = ["stackend", "stackweb", "supabase/volumes/db", "k8s", "components/kustomizations/stackend/VERSION/base"]
+    excluded_dirs = ["stackweb/node_modules/pkg", ".git/objects", "scripts/pull/__pycache__"]
+    extensions = [".yml", ".yaml", ".py", ".toml", ".md", ".log", ".pyc"]
+    paths = []
+    for i in range(entries):
+        if rng.random() < 0.3:
+            directory = rng.choice(excluded_dirs) + f"/d{i % 97}"
+        else:
+            directory = rng.choice(top_dirs) + f"/d{i % 211}"
+        paths.append(root / directory / f"file{i}{rng.choice(extensions)}")
+    return paths
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the puller exclusion matcher.")
+    parser.add_argument("--entries", type=int, default=100_000, help="Number of synthetic archive entries.")
+    args = parser.parse_args()
+
+    root = PurePosixPath(f"{puller.REPO_NAME}-{puller.BRANCH}")
+    paths = build_synthetic_tree(args.entries, root)
+
+    start = time.perf_counter()
+    legacy_results = [legacy_is_excluded(p, root) for p in paths]
+    legacy_seconds = time.perf_counter() - start
+
+    puller.is_excluded_dir.cache_clear()
+    start = time.perf_counter()
+    compiled_results = [puller.is_excluded_parts(p.relative_to(root).parts) for p in paths]
+    compiled_seconds = time.perf_counter() - start
+
+    mismatches = sum(1 for a, b in zip(legacy_results, compiled_results) if a != b)
+    print(f"Entries:  {len(paths)} ({sum(compiled_results)} excluded)")
+    print(f"Legacy:   {legacy_seconds:.3f}s")
+    print(f"Compiled: {compiled_seconds:.3f}s ({legacy_seconds / compiled_seconds:.1f}x faster)")
+    print(f"Mismatches: {mismatches}")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the puller staged swap.
+
+Builds an archive from the files of the project root (a tree the size of the repo, optionally
+replicated with --copies) and synchronizes it into empty temporary directories twice: writing
+files directly into place, and staging them before switching them in with atomic renames.
+The switch itself is timed separately, since it is the only window in which the live tree is
+being modified.
+
+Usage:
+    python benchmark_staging.py [--copies 1] [--workers 8]
+"""
+
+import sys
+import time
+import zipfile
+import argparse
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+import puller  # noqa: E402
+
+
+def build_archive(project_root: Path, archive_path: Path, copies: int) -> int:
+    """Zip the project files below a GitHub-like top-level directory. Returns the file count."""
+    root_name = f"{puller.REPO_NAME}-{puller.BRANCH}"
+    count = 0
+    with zipfile.ZipFile(archive_path, "w", zipfile.ZIP_DEFLATED) as archive:
+        for path in sorted(project_root.rglob("*")):
+            relative_path = path.relative_to(project_root)
+            if not path.is_file() or puller.is_excluded_parts(relative_path.parts):
+                continue
+            if relative_path.parts[0] == puller.CACHE_DIR_NAME or relative_path.name == puller.MANIFEST_FILE_NAME:
+                continue
+            for copy in range(copies):
+                prefix = f"{root_name}/" if copy == 0 else f"{root_name}/copy{copy}/"
+                archive.write(path, prefix + relative_path.as_posix())
+                count += 1
+    return count
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the puller staged swap.")
+    parser.add_argument("--copies", type=int, default=1, help="Number of copies of the project tree in the archive.")
+    parser.add_argument("--workers", type=int, default=puller.DEFAULT_WRITE_WORKERS, help="Writer threads.")
+    args = parser.parse_args()
+
+    project_root = puller.find_project_root_auto()
+    if project_root is None:
+        print("Error: Could not find the project root.")
+        sys.exit(1)
+
+    commit_seconds = []
+    commit_staged_files = puller.commit_staged_files
+
+    def timed_commit(stage_dir, swaps, directories=()):
+        start = time.perf_counter()
+        committed = commit_staged_files(stage_dir, swaps, directories)
+        commit_seconds.append(time.perf_counter() - start)
+        return committed
+
+    puller.commit_staged_files = timed_commit
+
+    with tempfile.TemporaryDirectory(prefix="puller-bench-") as temp_dir_str:
+        temp_dir = Path(temp_dir_str)
+        archive_path = temp_dir / "repo.zip"
+        file_count = build_archive(project_root, archive_path, args.copies)
+        print(f"Archive: {file_count} files, {archive_path.stat().st_size / (1024 * 1024):.1f} MiB compressed")
+
+        results = {}
+        for mode in ("direct", "staged"):
+            dest_dir = temp_dir / mode
+            dest_dir.mkdir()
+            stage_dir = dest_dir / puller.CACHE_DIR_NAME / "stage" if mode == "staged" else None
+            with zipfile.ZipFile(archive_path) as archive:
+                plan = puller.plan_sync(archive, dest_dir)
+                start = time.perf_counter()
+                puller.execute_plan(archive, plan, workers=args.workers, stage_dir=stage_dir)
+                results[mode] = time.perf_counter() - start
+
+    print(f"Direct writes:  {results['direct']:.3f}s")
+    print(f"Staged + swap:  {results['staged']:.3f}s ({results['staged'] / results['direct']:.2f}x)")
+    print(f"Swap window:    {commit_seconds[0] * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
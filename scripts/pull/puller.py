@@ -1,17 +1,48 @@
 import os
+import re
 import sys
+import json
 import shutil
+import time
+import fnmatch
+import functools
+import zlib
+import hashlib
+import threading
 import zipfile
-import tempfile
+import argparse
 import requests # type: ignore
-from pathlib import Path
-from typing import Optional
+from pathlib import Path, PurePath, PurePosixPath
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, Iterable, List, Optional, Pattern, Set, Tuple
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 
 # Define the repository and branch
 REPO_OWNER = "stackai"
 REPO_NAME = "stackai-onprem"
 BRANCH = "main"
 ZIP_URL = f"https://github.com/{REPO_OWNER}/{REPO_NAME}/archive/refs/heads/{BRANCH}.zip"
+# Archive of a given commit, so the downloaded content is the revision it is recorded under
+COMMIT_ZIP_URL = f"https://github.com/{REPO_OWNER}/{REPO_NAME}/archive/{{revision}}.zip"
+# Returns just the commit SHA of the branch head when requested with the "sha" media type
+COMMIT_API_URL = f"https://api.github.com/repos/{REPO_OWNER}/{REPO_NAME}/commits/{BRANCH}"
+
+# Manifest with the revision and content hashes of the last synchronized tree.
+# It lives at the project root and lets delta mode skip unchanged files.
+MANIFEST_FILE_NAME = ".puller-manifest.json"
+
+# Release store and in-progress downloads, kept between runs so interrupted downloads can be
+# resumed and previously pulled revisions restored without downloading them again
+CACHE_DIR_NAME = ".puller-cache"
+DEFAULT_CACHE_MAX_MB = 512
+DOWNLOAD_MAX_ATTEMPTS = 5
+DOWNLOAD_BACKOFF_SECONDS = 1.0
+DOWNLOAD_MIN_CHUNK_SIZE = 64 * 1024
+DOWNLOAD_MAX_CHUNK_SIZE = 4 * 1024 * 1024
+
+# Number of threads writing files during synchronization. Per-file latency dominates on
+# network-backed volumes, so several writes are kept in flight at once.
+DEFAULT_WRITE_WORKERS = 8
 
 # Known service directories that might contain .env files to preserve
 # These paths are relative to the project root
@@ -19,6 +50,7 @@ SERVICE_DIRS_WITH_ENV = [
     Path("caddy"), Path("mongodb"), Path("stackend"), Path("stackrepl"),
     Path("stackweb"), Path("supabase"), Path("unstructured"), Path("weaviate")
 ]
+SERVICE_DIR_NAMES = frozenset(s.name for s in SERVICE_DIRS_WITH_ENV)
 
 # Patterns to exclude during synchronization from the extracted ZIP to the project root.
 # These are relative to the root of the extracted ZIP contents.
@@ -99,101 +131,905 @@ def get_project_root_interactively() -> Optional[Path]:
     print("Failed to obtain a valid project root path after 3 attempts. Aborting.")
     return None
 
-def is_excluded(path: Path, project_root_in_zip: Path) -> bool:
+def load_manifest(project_root: Path) -> dict:
+    """Load the manifest of the last synchronized revision, or an empty one if missing or unreadable."""
+    manifest_path = project_root / MANIFEST_FILE_NAME
+    try:
+        manifest = json.loads(manifest_path.read_text())
+        if isinstance(manifest.get("files"), dict):
+            manifest.setdefault("id", None)
+            manifest.setdefault("revision", None)
+            manifest.setdefault("etag", None)
+            return manifest
+    except (OSError, ValueError, AttributeError):
+        pass
+    return {"id": None, "revision": None, "etag": None, "files": {}}
+
+def save_manifest(
+    project_root: Path,
+    revision: Optional[str],
+    file_hashes: Dict[str, str],
+    etag: Optional[str] = None,
+    revision_id: Optional[str] = None,
+):
+    """Write the manifest for the revision that was just synchronized.
+
+    revision_id is the key of the revision in the release store, when it was stored there.
+    """
+    manifest_path = project_root / MANIFEST_FILE_NAME
+    tmp_path = manifest_path.with_name(manifest_path.name + ".tmp")
+    tmp_path.write_text(json.dumps(
+        {"id": revision_id, "revision": revision, "etag": etag, "files": file_hashes},
+        indent=2,
+        sort_keys=True,
+    ))
+    os.replace(tmp_path, manifest_path)
+
+def tree_id(file_hashes: Dict[str, str]) -> str:
+    """Identify a synchronized tree by the hash of its manifest, for pulls without a known revision."""
+    return hashlib.sha256(json.dumps(file_hashes, sort_keys=True).encode()).hexdigest()[:40]
+
+class ReleaseStore:
+    """Content-addressed store of pulled releases, kept under the project root.
+
+    File contents are stored once as blobs named after their SHA-256 (objects/ab/abcdef...)
+    and every pulled revision gets a manifest in revisions/<revision id>.json mapping its
+    files to blobs. Restoring a cached revision is then a local copy, without downloading.
+    """
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.objects_dir = root / "objects"
+        self.revisions_dir = root / "revisions"
+        # Files of an update are staged here before being switched into the project root
+        self.stage_dir = root / "stage"
+
+    def blob_path(self, content_hash: str) -> Path:
+        return self.objects_dir / content_hash[:2] / content_hash
+
+    def put_blob(self, content_hash: str, content: bytes):
+        """Add a blob to the store. Safe to call concurrently for the same content."""
+        path = self.blob_path(content_hash)
+        if path.is_file():
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{content_hash}.{threading.get_ident()}.tmp")
+        tmp_path.write_bytes(content)
+        os.replace(tmp_path, path)
+
+    def save_revision(self, revision_id: str, revision: Optional[str], etag: Optional[str], file_hashes: Dict[str, str]):
+        """Record the manifest of a pulled revision, marking it as the most recently used."""
+        self.revisions_dir.mkdir(parents=True, exist_ok=True)
+        now = time.time()
+        path = self.revisions_dir / f"{revision_id}.json"
+        tmp_path = path.with_name(path.name + ".tmp")
+        tmp_path.write_text(json.dumps({
+            "id": revision_id,
+            "revision": revision,
+            "etag": etag,
+            "pulled_at": now,
+            "last_used": now,
+            "files": file_hashes,
+        }, indent=2, sort_keys=True))
+        os.replace(tmp_path, path)
+
+    def list_revisions(self) -> List[dict]:
+        """Return all cached revisions, most recently used first."""
+        revisions = []
+        for path in self.revisions_dir.glob("*.json"):
+            try:
+                revisions.append(json.loads(path.read_text()))
+            except (OSError, ValueError):
+                print(f"Warning: Ignoring unreadable revision manifest {path}")
+        return sorted(revisions, key=lambda r: r.get("last_used", 0), reverse=True)
+
+    def find_revision(self, prefix: str) -> Optional[dict]:
+        """Find a cached revision by (a prefix of) its id or commit SHA."""
+        matches = [
+            r for r in self.list_revisions()
+            if r["id"].startswith(prefix) or (r.get("revision") or "").startswith(prefix)
+        ]
+        if len(matches) > 1:
+            print(f"Error: '{prefix}' matches {len(matches)} cached revisions. Please use a longer prefix.")
+            return None
+        return matches[0] if matches else None
+
+    def touch_revision(self, revision_id: str):
+        """Mark a cached revision as the most recently used one."""
+        path = self.revisions_dir / f"{revision_id}.json"
+        revision = json.loads(path.read_text())
+        revision["last_used"] = time.time()
+        path.write_text(json.dumps(revision, indent=2, sort_keys=True))
+
+    def gc(self, max_bytes: int, keep: Set[str]) -> Tuple[int, int]:
+        """Evict least recently used revisions until the blobs still referenced fit in max_bytes.
+
+        Revisions in `keep` (e.g. the one currently checked out) are never evicted. Blobs no
+        longer referenced by any revision are deleted. Returns the number of evicted revisions
+        and of freed bytes.
+        """
+        blob_sizes = {path.name: path.stat().st_size for path in self.objects_dir.glob("*/*") if path.is_file()}
+        revisions = self.list_revisions()
+
+        def referenced_size(kept_revisions: List[dict]) -> int:
+            referenced = set()
+            for revision in kept_revisions:
+                referenced.update(revision["files"].values())
+            return sum(blob_sizes.get(content_hash, 0) for content_hash in referenced)
+
+        evicted = 0
+        # Least recently used revisions are at the end of the list
+        while referenced_size(revisions) > max_bytes:
+            candidates = [r for r in revisions if r["id"] not in keep]
+            if not candidates:
+                break
+            victim = candidates[-1]
+            revisions.remove(victim)
+            (self.revisions_dir / f"{victim['id']}.json").unlink(missing_ok=True)
+            evicted += 1
+
+        referenced = set()
+        for revision in revisions:
+            referenced.update(revision["files"].values())
+        freed = 0
+        for content_hash, size in blob_sizes.items():
+            if content_hash not in referenced:
+                self.blob_path(content_hash).unlink(missing_ok=True)
+                freed += size
+        return evicted, freed
+
+def checkout_revision(store: ReleaseStore, project_root: Path, revision: dict) -> bool:
+    """Restore a cached revision into the project root from the release store.
+
+    Changed files are staged first and switched in with atomic renames, like a pull.
+    Files already matching the revision are left untouched and user .env files are preserved
+    with the same rules as a pull. Like a pull, files that are not part of the revision are
+    left in place. If any file cannot be staged, nothing is switched in.
+    """
+    current_hashes = load_manifest(project_root)["files"]
+    copied_count = 0
+    unchanged_count = 0
+    skipped_count = 0
+    restored_hashes: Dict[str, str] = {}
+    swaps: List[Tuple[Path, Path]] = []
+    shutil.rmtree(store.stage_dir, ignore_errors=True)
+    store.stage_dir.mkdir(parents=True)
+
+    for manifest_key, content_hash in sorted(revision["files"].items()):
+        relative_path = PurePosixPath(manifest_key)
+        dest_path = project_root / relative_path
+        if is_preserved(relative_path.parts, dest_path):
+            skipped_count += 1
+            continue
+        restored_hashes[manifest_key] = content_hash
+        if current_hashes.get(manifest_key) == content_hash and dest_path.is_file():
+            unchanged_count += 1
+            continue
+        blob_path = store.blob_path(content_hash)
+        if not blob_path.is_file():
+            print(f"Error: The release store is missing the content of {manifest_key}. Aborting.")
+            shutil.rmtree(store.stage_dir, ignore_errors=True)
+            return False
+        try:
+            dest_path.parent.mkdir(parents=True, exist_ok=True)
+            staged_path = store.stage_dir / str(len(swaps))
+            shutil.copyfile(blob_path, staged_path)
+            if dest_path.is_file():
+                shutil.copymode(dest_path, staged_path)
+            swaps.append((staged_path, dest_path))
+            copied_count += 1
+        except OSError as e:
+            print(f"  Error restoring {manifest_key}: {e}. Aborting, no file was changed.")
+            shutil.rmtree(store.stage_dir, ignore_errors=True)
+            return False
+
+    if not commit_staged_files(store.stage_dir, swaps):
+        print("Error: Some files could not be restored. The checkout was not recorded.")
+        return False
+    save_manifest(project_root, revision.get("revision"), restored_hashes, revision.get("etag"), revision["id"])
+    store.touch_revision(revision["id"])
+    print(f"Checkout: {copied_count} items restored, {unchanged_count} unchanged, {skipped_count} items skipped/preserved.")
+    return True
+
+def get_remote_revision(session: requests.Session) -> Optional[str]:
+    """Return the commit SHA at the head of BRANCH, or None if it cannot be determined."""
+    try:
+        response = session.get(COMMIT_API_URL, headers={"Accept": "application/vnd.github.sha"}, timeout=10)
+        response.raise_for_status()
+    except requests.RequestException as e:
+        print(f"Warning: Could not determine the remote revision ({e}). Falling back to the archive ETag.")
+        return None
+    revision = response.text.strip()
+    return revision if len(revision) == 40 else None
+
+def _is_retryable(error: requests.RequestException) -> bool:
+    """Connection problems, timeouts, rate limiting and server errors are worth retrying."""
+    response = getattr(error, "response", None)
+    return response is None or response.status_code == 429 or response.status_code >= 500
+
+def _is_strong_etag(etag: Optional[str]) -> bool:
+    """If-Range needs a strong validator: with none, or a weak one, a resume could splice two archives."""
+    return bool(etag) and not etag.startswith("W/")
+
+def _chunk_size_for(content_length: Optional[int]) -> int:
+    """Pick a chunk size of roughly 1% of the response, within the download chunk bounds."""
+    if not content_length:
+        return DOWNLOAD_MIN_CHUNK_SIZE
+    return max(DOWNLOAD_MIN_CHUNK_SIZE, min(DOWNLOAD_MAX_CHUNK_SIZE, content_length // 100))
+
+def download_archive(
+    session: requests.Session,
+    url: str,
+    dest_path: Path,
+    etag: Optional[str] = None,
+    max_attempts: int = DOWNLOAD_MAX_ATTEMPTS,
+    backoff_seconds: float = DOWNLOAD_BACKOFF_SECONDS,
+) -> Tuple[bool, Optional[str]]:
+    """Download url to dest_path, resuming interrupted downloads with HTTP Range requests.
+
+    Partial content is kept next to dest_path (".part") together with the URL and ETag it
+    belongs to, so a download interrupted by a dropped connection, or by a previous run, is
+    continued where it stopped. The If-Range header makes the server send the whole archive
+    again if it changed in the meantime; without a strong ETag to send in it, the download
+    starts over from byte 0 instead. Retryable failures are retried with exponential backoff.
+
+    When `etag` is given and the server answers 304 Not Modified, nothing is downloaded.
+    Returns whether a new archive was downloaded and its ETag.
+    """
+    part_path = dest_path.with_name(dest_path.name + ".part")
+    part_info_path = dest_path.with_name(dest_path.name + ".part.json")
+    try:
+        part_info = json.loads(part_info_path.read_text())
+    except (OSError, ValueError):
+        part_info = {}
+    if part_info.get("url") != url or not _is_strong_etag(part_info.get("etag")):
+        # Partial content can only be resumed safely when we know which version it belongs to
+        part_path.unlink(missing_ok=True)
+        part_info = {}
+
+    for attempt in range(1, max_attempts + 1):
+        offset = part_path.stat().st_size if part_path.exists() else 0
+        if offset and not _is_strong_etag(part_info.get("etag")):
+            # The server sent no strong ETag for this content, so start over from byte 0
+            part_path.unlink(missing_ok=True)
+            offset = 0
+        # Byte ranges refer to the encoded body, so ask for the archive as-is
+        headers = {"Accept-Encoding": "identity"}
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+            headers["If-Range"] = part_info["etag"]
+            print(f"Resuming download at {offset} bytes...")
+        elif etag:
+            headers["If-None-Match"] = etag
+
+        try:
+            with session.get(url, headers=headers, stream=True, timeout=60) as response:
+                if response.status_code == 304:
+                    return False, etag
+                if response.status_code == 416: # The partial file is not a prefix of the archive anymore
+                    part_path.unlink(missing_ok=True)
+                    continue
+                response.raise_for_status()
+
+                resuming = response.status_code == 206
+                response_etag = response.headers.get("ETag")
+                part_info = {"url": url, "etag": response_etag}
+                part_info_path.write_text(json.dumps(part_info))
+
+                content_length = response.headers.get("Content-Length")
+                remaining = int(content_length) if content_length and content_length.isdigit() else None
+                expected_size = (offset if resuming else 0) + remaining if remaining is not None else None
+                with open(part_path, "ab" if resuming else "wb") as f:
+                    for chunk in response.iter_content(chunk_size=_chunk_size_for(remaining)):
+                        f.write(chunk)
+
+            if expected_size is not None and part_path.stat().st_size != expected_size:
+                raise requests.ConnectionError(
+                    f"Connection closed after {part_path.stat().st_size} of {expected_size} bytes"
+                )
+            os.replace(part_path, dest_path)
+            part_info_path.unlink(missing_ok=True)
+            return True, response_etag
+        except requests.RequestException as e:
+            if not _is_retryable(e) or attempt == max_attempts:
+                raise
+            delay = backoff_seconds * 2 ** (attempt - 1)
+            print(f"Download interrupted ({e}). Retrying in {delay:.0f}s (attempt {attempt + 1}/{max_attempts})...")
+            time.sleep(delay)
+
+    raise requests.ConnectionError(f"Could not download {url} after {max_attempts} attempts")
+
+def _compile_exclude_patterns(patterns: List[str]) -> Tuple[FrozenSet[str], Optional[Pattern[str]]]:
+    """Split the exclusion patterns into a set of literal names and one combined glob regex."""
+    literal_names = frozenset(p for p in patterns if not any(c in p for c in "*?["))
+    glob_patterns = [fnmatch.translate(p) for p in patterns if p not in literal_names]
+    return literal_names, re.compile("|".join(glob_patterns)) if glob_patterns else None
+
+EXCLUDED_NAMES, EXCLUDED_GLOBS = _compile_exclude_patterns(EXCLUDE_PATTERNS)
+
+def is_excluded_name(name: str) -> bool:
+    """Check if a single path component matches one of the EXCLUDE_PATTERNS."""
+    return name in EXCLUDED_NAMES or (EXCLUDED_GLOBS is not None and EXCLUDED_GLOBS.match(name) is not None)
+
+@functools.lru_cache(maxsize=None)
+def is_excluded_dir(relative_dir_parts: Tuple[str, ...]) -> bool:
+    """Check if a directory, or any of its ancestors, is excluded.
+
+    The result is cached per directory, so every entry below an excluded directory
+    (e.g. node_modules/ or .git/) is pruned with a single lookup.
+    """
+    if not relative_dir_parts:
+        return False
+    return is_excluded_dir(relative_dir_parts[:-1]) or is_excluded_name(relative_dir_parts[-1])
+
+def is_excluded_parts(relative_parts: Tuple[str, ...]) -> bool:
+    """Check if a path, given as its parts relative to the zip content root, should be excluded."""
+    if not relative_parts:
+        return False
+    return is_excluded_dir(relative_parts[:-1]) or is_excluded_name(relative_parts[-1])
+
+def is_excluded(path: PurePath, project_root_in_zip: PurePath) -> bool:
     """Check if a path (relative to extracted zip root) should be excluded."""
     try:
         relative_path_obj = path.relative_to(project_root_in_zip)
     except ValueError:
         return False # Not under the zip root, so not excluded by these patterns
+    return is_excluded_parts(relative_path_obj.parts)
 
-    # Convert to string for easier matching, especially for directory parts
-    relative_path_str = str(relative_path_obj)
-
-    for pattern in EXCLUDE_PATTERNS:
-        # Direct match for files or top-level directories without trailing slash
-        if relative_path_obj.name == pattern:
-            return True
-        # Glob-like matching for files (e.g., *.log)
-        if "*" in pattern and relative_path_obj.match(pattern):
-            return True
-        # Directory name check (e.g., if "node_modules" is a part of the path)
-        if pattern in relative_path_obj.parts:
-            return True
-        # Starts with check for directories (e.g., exclude all under .git/)
-        if relative_path_str.startswith(pattern + "/") or relative_path_str == pattern:
-            return True
-            
+def is_preserved(relative_parts: Tuple[str, ...], dest_path: Path) -> bool:
+    """Check if the local file at dest_path must be kept instead of the upstream version.
+
+    - A .env file directly within one of the known top-level service directories
+      (e.g. stackweb/.env) is never overwritten once the user has one.
+    - A .env.example file is skipped when the user already has the corresponding .env.
+    """
+    name = relative_parts[-1]
+    if name == ".env" and len(relative_parts) == 2 and relative_parts[0] in SERVICE_DIR_NAMES:
+        return dest_path.exists()
+    if name.endswith(".env.example"):
+        return dest_path.with_name(".env").exists()
     return False
 
-def sync_files(source_dir: Path, dest_dir: Path):
-    """Synchronize files from source_dir to dest_dir, respecting exclusions."""
-    print(f"Starting synchronization from {source_dir} to {dest_dir}")
-    # GitHub ZIPs usually extract to a directory like reponame-branchname
-    # We need to find this directory first.
-    extracted_content_dirs = [d for d in source_dir.iterdir() if d.is_dir() and REPO_NAME in d.name]
-    if not extracted_content_dirs:
-        print(f"Error: Could not find the main content directory (e.g., '{REPO_NAME}-{BRANCH}') in {source_dir}.")
-        print(f"Contents of {source_dir}: {[item.name for item in source_dir.iterdir()]}")
+# Actions of a synchronization plan entry
+ADD = "add"              # The file does not exist locally
+CHANGE = "change"        # The local file differs from the archive
+UNCHANGED = "unchanged"  # The local file already matches the archive
+PRESERVE = "preserve"    # The user's .env (or the .env.example next to it) is kept
+SKIP = "skip"            # Excluded by EXCLUDE_PATTERNS
+
+@dataclass
+class PlannedFile:
+    """What synchronization will do with one file of the archive."""
+    relative_path: PurePosixPath
+    dest_path: Path
+    member: zipfile.ZipInfo
+    action: str
+    # Set for unchanged files whose timestamp differs from the archive, so it can be fixed
+    # and the next plan can rely on the size and mtime check alone
+    touch: bool = False
+
+@dataclass
+class SyncPlan:
+    """The precomputed result of comparing an archive with the destination directory."""
+    source_root: PurePosixPath
+    directories: List[Path] = field(default_factory=list)
+    files: List[PlannedFile] = field(default_factory=list)
+    hashed_count: int = 0
+
+    def with_action(self, action: str) -> List[PlannedFile]:
+        return [f for f in self.files if f.action == action]
+
+    @property
+    def bytes_to_write(self) -> int:
+        return sum(f.member.file_size for f in self.files if f.action in (ADD, CHANGE))
+
+def archive_mtime(member: zipfile.ZipInfo) -> float:
+    """The timestamp of an archive member, as set on the files written from it."""
+    return time.mktime(member.date_time + (0, 0, -1))
+
+def file_crc32(path: Path) -> int:
+    """Return the CRC-32 of a file's content, comparable to ZipInfo.CRC."""
+    crc = 0
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            crc = zlib.crc32(chunk, crc)
+    return crc
+
+def compare_with_local(member: zipfile.ZipInfo, dest_path: Path) -> Tuple[str, bool, bool]:
+    """Decide if dest_path has to be (re)written from the archive member.
+
+    Size and mtime are checked first. Only when the sizes match but the timestamps do not is
+    the local content hashed and compared with the CRC-32 recorded in the archive, so the
+    archive member itself is never decompressed. Returns the action, whether it needed
+    hashing and whether the local timestamp should be fixed.
+    """
+    try:
+        stat = dest_path.stat()
+    except FileNotFoundError:
+        return ADD, False, False
+    if not dest_path.is_file() or stat.st_size != member.file_size:
+        return CHANGE, False, False
+    # ZIP timestamps have a two second resolution
+    if abs(stat.st_mtime - archive_mtime(member)) < 2:
+        return UNCHANGED, False, False
+    if file_crc32(dest_path) != member.CRC:
+        return CHANGE, True, False
+    return UNCHANGED, True, True
+
+def find_content_root(archive: zipfile.ZipFile) -> Optional[PurePosixPath]:
+    """Find the top-level directory GitHub puts the repository content in (e.g. reponame-branchname)."""
+    top_level_names = sorted({PurePosixPath(info.filename).parts[0] for info in archive.infolist()})
+    content_root_names = [name for name in top_level_names if REPO_NAME in name]
+    if not content_root_names:
+        print(f"Error: Could not find the main content directory (e.g., '{REPO_NAME}-{BRANCH}') in {archive.filename}.")
+        print(f"Contents of {archive.filename}: {top_level_names}")
+        return None
+    if len(content_root_names) > 1:
+        print(f"Warning: Multiple potential content directories found in {archive.filename}. Using {content_root_names[0]}")
+    return PurePosixPath(content_root_names[0])
+
+def is_inside(path: Path, resolved_dir: Path) -> bool:
+    """Check if path, once ".." components and symlinks are resolved, is resolved_dir or below it."""
+    try:
+        path.resolve().relative_to(resolved_dir)
+    except ValueError:
         return False
-    actual_source_root = extracted_content_dirs[0]
-    if len(extracted_content_dirs) > 1:
-        print(f"Warning: Multiple potential content directories found in {source_dir}. Using {actual_source_root.name}")
+    return True
 
-    print(f"Identified source content root as: {actual_source_root}")
+def plan_sync(archive: zipfile.ZipFile, dest_dir: Path, force: bool = False) -> Optional[SyncPlan]:
+    """Compute what synchronizing the archive into dest_dir would do, without writing anything.
 
-    copied_count = 0
-    skipped_count = 0
+    With `force`, every existing file is planned as changed. Returns None if the archive does
+    not have the expected layout, or if any of its members would be written outside dest_dir
+    (e.g. a name with ".." components).
+    """
+    actual_source_root = find_content_root(archive)
+    if actual_source_root is None:
+        return None
+    plan = SyncPlan(source_root=actual_source_root)
+    resolved_dest_dir = dest_dir.resolve()
 
-    for item_in_source in actual_source_root.rglob("*"):
-        if not item_in_source.exists(): # Item might have been removed if its parent dir was excluded and deleted
+    for member in archive.infolist():
+        item_in_source = PurePosixPath(member.filename)
+        if item_in_source == actual_source_root or actual_source_root not in item_in_source.parents:
             continue
-        
-        relative_path_to_zip_content_root = item_in_source.relative_to(actual_source_root)
-        dest_path = dest_dir / relative_path_to_zip_content_root
 
-        if is_excluded(item_in_source, actual_source_root):
-            # print(f"  Skipping (excluded pattern): {relative_path_to_zip_content_root}")
-            skipped_count += 1
-            if item_in_source.is_dir() and dest_path.exists() and False: # Consider if we need to rm for excluded dirs
-                 # shutil.rmtree(dest_path) # Risky if dest_path is not what we expect.
-                 pass
+        relative_path = item_in_source.relative_to(actual_source_root)
+        dest_path = dest_dir / relative_path
+        if not is_inside(dest_path, resolved_dest_dir):
+            print(f"Error: Archive member {member.filename} would be written outside {dest_dir}. Aborting.")
+            return None
+        if member.is_dir():
+            if not is_excluded_parts(relative_path.parts):
+                plan.directories.append(dest_path)
             continue
 
-        is_service_env = False
-        if item_in_source.name == ".env":
-            # Check if this .env file is directly within one of the known service directories *in the source structure*
-            # e.g., .../stackai-onprem-main/stackweb/.env
-            if item_in_source.parent.name in [s.name for s in SERVICE_DIRS_WITH_ENV] and \
-               item_in_source.parent.parent == actual_source_root : # ensure it's a top-level service dir
-                is_service_env = True
-        
-        if is_service_env and dest_path.exists():
-            # print(f"  Skipping (preserving user's .env): {dest_path}")
-            skipped_count += 1
-            continue
-        
-        if item_in_source.name.endswith(".env.example"):
-            corresponding_env = dest_path.with_name(".env")
-            if corresponding_env.exists():
-                # print(f"  Skipping .env.example (user has .env): {relative_path_to_zip_content_root}")
-                skipped_count +=1
-                continue
+        if is_excluded_parts(relative_path.parts):
+            action, hashed, touch = SKIP, False, False
+        elif is_preserved(relative_path.parts, dest_path):
+            action, hashed, touch = PRESERVE, False, False
+        elif force:
+            action, hashed, touch = (CHANGE if dest_path.exists() else ADD), False, False
+        else:
+            action, hashed, touch = compare_with_local(member, dest_path)
+        plan.hashed_count += hashed
+        plan.files.append(PlannedFile(relative_path, dest_path, member, action, touch))
+
+    return plan
+
+def print_plan(plan: SyncPlan, verbose: bool = False):
+    """Print a summary of the plan, listing every file that is not unchanged when verbose."""
+    if verbose:
+        for action, label in ((ADD, "Add"), (CHANGE, "Change"), (PRESERVE, "Preserve"), (SKIP, "Skip")):
+            for planned in plan.with_action(action):
+                print(f"  {label:<9} {planned.relative_path} ({planned.member.file_size} bytes)")
+    print(
+        f"Plan: {len(plan.with_action(ADD))} to add, {len(plan.with_action(CHANGE))} to change, "
+        f"{len(plan.with_action(UNCHANGED))} unchanged, {len(plan.with_action(PRESERVE))} preserved, "
+        f"{len(plan.with_action(SKIP))} skipped; {plan.bytes_to_write} bytes to write "
+        f"({plan.hashed_count} files hashed to decide)."
+    )
+
+def apply_planned_file(
+    archive: zipfile.ZipFile,
+    planned: PlannedFile,
+    store: Optional["ReleaseStore"] = None,
+    staged_path: Optional[Path] = None,
+) -> str:
+    """Carry out the plan for one file and return the hash of its archive content.
+
+    Added and changed files are written, to staged_path when given (keeping the permissions of
+    the file they will replace) or else directly to their destination; unchanged ones only get
+    their timestamp fixed if needed. The content is also added to the release store, if one is
+    given. Runs on the writer pool, so the target directory must already exist.
+    """
+    content = archive.read(planned.member)
+    content_hash = hashlib.sha256(content).hexdigest()
+    if store is not None:
+        store.put_blob(content_hash, content)
+    target_path = planned.dest_path
+    if planned.action in (ADD, CHANGE):
+        if staged_path is not None:
+            target_path = staged_path
+        target_path.write_bytes(content)
+        if target_path != planned.dest_path and planned.dest_path.is_file():
+            shutil.copymode(planned.dest_path, target_path)
+    if planned.action in (ADD, CHANGE) or planned.touch:
+        # Use the archive timestamp, so the next plan can tell the file is unchanged from its
+        # size and mtime alone (see compare_with_local)
+        modified_at = archive_mtime(planned.member)
+        os.utime(target_path, (modified_at, modified_at))
+    return content_hash
 
+def fsync_path(path: Path) -> Optional[OSError]:
+    """Flush a written file or directory entry to disk, returning the error if it fails."""
+    try:
+        fd = os.open(path, os.O_RDONLY)
         try:
-            if item_in_source.is_dir():
-                dest_path.mkdir(parents=True, exist_ok=True)
-            else:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    except OSError as e:
+        return e
+    return None
+
+def swap_journal_path(stage_dir: Path) -> Path:
+    return stage_dir.with_name(stage_dir.name + ".journal.json")
+
+def _apply_swaps(swaps: List[Tuple[Path, Path]]) -> List[Path]:
+    """Rename staged files over their destinations, skipping the ones already moved.
+
+    A rename that fails (e.g. the destination became a directory) is reported and skipped, so
+    it cannot block every later run. Returns the destinations that could not be switched in.
+    """
+    failed_paths = []
+    for staged_path, dest_path in swaps:
+        if staged_path.exists():
+            try:
                 dest_path.parent.mkdir(parents=True, exist_ok=True)
-                shutil.copy2(item_in_source, dest_path)
+                os.replace(staged_path, dest_path)
+            except OSError as e:
+                print(f"  Error switching in {dest_path}: {e}")
+                failed_paths.append(dest_path)
+    if os.name == "posix":
+        for directory in sorted({dest_path.parent for _, dest_path in swaps}):
+            fsync_path(directory)
+    return failed_paths
+
+def commit_staged_files(stage_dir: Path, swaps: List[Tuple[Path, Path]], directories: Iterable[Path] = ()) -> bool:
+    """Switch staged files into the live tree with atomic renames.
+
+    The stage lives on the same filesystem as the live tree, so every rename is atomic and the
+    switch only costs a rename per file. `directories`, and the parents of the destinations, are
+    created just before the switch, so a discarded stage leaves no new directory behind. The list
+    of renames is journaled first: if the process dies halfway, recover_interrupted_swap rolls the
+    switch forward on the next run. Returns False if a directory could not be created (nothing is
+    switched in then) or some files could not be switched in; the stage is discarded either way,
+    so the caller must not record the revision and the next run synchronizes those files again.
+    """
+    try:
+        for directory in sorted(set(directories) | {dest_path.parent for _, dest_path in swaps}):
+            directory.mkdir(parents=True, exist_ok=True)
+    except OSError as e:
+        print(f"  Error creating directory {e.filename}: {e}")
+        shutil.rmtree(stage_dir, ignore_errors=True)
+        return False
+    journal_path = swap_journal_path(stage_dir)
+    tmp_path = journal_path.with_name(journal_path.name + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump([[str(staged), str(dest)] for staged, dest in swaps], f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, journal_path)
+    failed_paths = _apply_swaps(swaps)
+    journal_path.unlink()
+    shutil.rmtree(stage_dir, ignore_errors=True)
+    return not failed_paths
+
+def recover_interrupted_swap(stage_dir: Path):
+    """Finish a switch interrupted after it was journaled, and discard unfinished staging."""
+    journal_path = swap_journal_path(stage_dir)
+    if journal_path.exists():
+        swaps = [(Path(staged), Path(dest)) for staged, dest in json.loads(journal_path.read_text())]
+        print(f"Completing an interrupted update ({len(swaps)} files)...")
+        failed_paths = _apply_swaps(swaps)
+        journal_path.unlink()
+        if failed_paths:
+            print(f"Warning: {len(failed_paths)} files of the interrupted update could not be switched in. "
+                  "Their revision was not recorded, so the next pull synchronizes them again.")
+    if stage_dir.exists():
+        shutil.rmtree(stage_dir, ignore_errors=True)
+
+def execute_plan(
+    archive: zipfile.ZipFile,
+    plan: SyncPlan,
+    workers: int = DEFAULT_WRITE_WORKERS,
+    fsync: bool = True,
+    store: Optional["ReleaseStore"] = None,
+    stage_dir: Optional[Path] = None,
+) -> Optional[Dict[str, str]]:
+    """Apply a plan computed by plan_sync. Only added and changed files are written.
+
+    Directories are created in archive order on the calling thread (with a stage_dir, only when
+    the stage is switched in); files are handled by a bounded pool of `workers` threads, and
+    written files are flushed to disk in one batch at the end when `fsync` is set. With a
+    stage_dir (on the same filesystem as the plan's destination), files are written there first
+    and only switched into the live tree with commit_staged_files once all of them are ready, so
+    an interrupted pull never leaves a half-written tree behind; if any of them fails, the stage
+    is discarded and nothing is switched in. Every file of the archive that is not skipped or
+    preserved is added to `store` when given, so the revision can be restored later without
+    downloading it.
+    Returns the content hashes of the synchronized files, keyed by their POSIX path relative
+    to the project root, or None if any of them could not be written.
+    """
+    synced_hashes: Dict[str, str] = {}
+    copied_count = 0
+    unchanged_count = 0
+    failed_count = 0
+    skipped_count = len(plan.with_action(SKIP)) + len(plan.with_action(PRESERVE))
+
+    created_dirs: Set[Path] = set()
+    written_paths: List[Path] = []
+    pending: Dict[Future, PlannedFile] = {}
+    staged_paths: Dict[Path, Path] = {}
+    if stage_dir is not None:
+        shutil.rmtree(stage_dir, ignore_errors=True)
+        stage_dir.mkdir(parents=True)
+
+    def collect(done_futures):
+        nonlocal copied_count, unchanged_count, failed_count
+        for future in done_futures:
+            planned = pending.pop(future)
+            try:
+                content_hash = future.result()
+            except Exception as e:
+                print(f"  Error copying {planned.member.filename} to {planned.dest_path}: {e}")
+                failed_count +=1
+                continue
+            synced_hashes[planned.relative_path.as_posix()] = content_hash
+            if planned.action in (ADD, CHANGE):
+                written_paths.append(staged_paths.get(planned.dest_path, planned.dest_path))
                 copied_count +=1
-        except Exception as e:
-            print(f"  Error copying {item_in_source} to {dest_path}: {e}")
-            skipped_count +=1
+            else:
+                unchanged_count += 1
+
+    # With a stage, the live tree is left untouched until commit_staged_files creates the directories
+    for directory in plan.directories if stage_dir is None else []:
+        try:
+            directory.mkdir(parents=True, exist_ok=True)
+            created_dirs.add(directory)
+        except OSError as e:
+            print(f"  Error creating directory {directory}: {e}")
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="puller-writer") as pool:
+        for planned in plan.files:
+            if planned.action in (SKIP, PRESERVE):
+                continue
+            directory = planned.dest_path.parent
+            try:
+                if stage_dir is None and directory not in created_dirs:
+                    directory.mkdir(parents=True, exist_ok=True)
+                    created_dirs.add(directory)
+            except Exception as e:
+                print(f"  Error copying {planned.member.filename} to {planned.dest_path}: {e}")
+                failed_count +=1
+                continue
+
+            # Bound the number of in-flight files, each of which holds a member in memory
+            if len(pending) >= max(1, workers) * 4:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+            staged_path = None
+            if stage_dir is not None and planned.action in (ADD, CHANGE):
+                staged_path = stage_dir / str(len(staged_paths))
+                staged_paths[planned.dest_path] = staged_path
+            pending[pool.submit(apply_planned_file, archive, planned, store, staged_path)] = planned
+
+        collect(list(pending))
+
+        if fsync and written_paths:
+            # Flush everything in one batch once all writes are done, instead of after each file.
+            # Directory entries can only be flushed on POSIX systems.
+            paths_to_flush = written_paths + (sorted({p.parent for p in written_paths}) if os.name == "posix" else [])
+            for path, error in zip(paths_to_flush, pool.map(fsync_path, paths_to_flush)):
+                if error:
+                    print(f"  Warning: Could not flush {path} to disk: {error}")
+
+    if failed_count:
+        # Not recording the revision makes the next run synchronize again and retry these files
+        if stage_dir is not None:
+            # Switch nothing in, so the live tree stays entirely at its previous revision
+            shutil.rmtree(stage_dir, ignore_errors=True)
+            print(f"Error: {failed_count} items could not be written. The update was discarded, no file was changed.")
+        else:
+            print(f"Error: {failed_count} items could not be written.")
+        return None
+
+    if stage_dir is not None:
+        staged_written = set(written_paths)
+        committed = commit_staged_files(stage_dir, [
+            (staged_path, dest_path) for dest_path, staged_path in staged_paths.items() if staged_path in staged_written
+        ], plan.directories)
+        if not committed:
+            # As above, the revision is not recorded so that the next run retries these files
+            print("Error: Some items could not be switched in. See messages above.")
+            return None
+
+    print(f"Synchronization: {copied_count} items copied, {unchanged_count} unchanged, {skipped_count} items skipped/preserved.")
+    return synced_hashes
+
+def sync_files(
+    archive: zipfile.ZipFile,
+    dest_dir: Path,
+    force: bool = False,
+    workers: int = DEFAULT_WRITE_WORKERS,
+    fsync: bool = True,
+    store: Optional["ReleaseStore"] = None,
+    stage_dir: Optional[Path] = None,
+) -> Optional[Dict[str, str]]:
+    """Synchronize files from the downloaded archive to dest_dir, respecting exclusions.
+
+    Members are read straight from the ZIP central directory, without extracting the archive
+    to disk first. A plan is computed first (see plan_sync) and then executed, so files that
+    already match the archive are never rewritten. Returns the content hashes of the
+    synchronized files, or None on failure (including when any file could not be written).
 
-    print(f"Synchronization: {copied_count} items copied, {skipped_count} items skipped/preserved.")
+    With a stage_dir, changes are staged and switched in atomically (see execute_plan).
+    """
+    print(f"Starting synchronization from {archive.filename} to {dest_dir}")
+    plan = plan_sync(archive, dest_dir, force=force)
+    if plan is None:
+        return None
+    print(f"Identified source content root as: {plan.source_root}")
+    print_plan(plan)
+    return execute_plan(archive, plan, workers=workers, fsync=fsync, store=store, stage_dir=stage_dir)
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Pull the latest StackAI on-premise repository into the project root.")
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Ignore the manifest of the last sync and the local file state: download and rewrite every file.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=DEFAULT_WRITE_WORKERS,
+        help=f"Number of threads writing files (default: {DEFAULT_WRITE_WORKERS}).",
+    )
+    parser.add_argument(
+        "--no-fsync",
+        dest="fsync",
+        action="store_false",
+        help="Do not flush written files to disk at the end of the synchronization.",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Download the archive and print what would be added, changed, preserved or skipped, without writing anything.",
+    )
+    parser.add_argument(
+        "--cache-max-mb",
+        type=int,
+        default=DEFAULT_CACHE_MAX_MB,
+        help=f"Size cap of the release store in MiB, enforced after each pull and by gc (default: {DEFAULT_CACHE_MAX_MB}).",
+    )
+    subparsers = parser.add_subparsers(dest="command", metavar="command")
+    parser.set_defaults(command="pull")
+    subparsers.add_parser("pull", help="Pull the latest revision (default).")
+    subparsers.add_parser("list", help="List the revisions cached in the release store.")
+    checkout_parser = subparsers.add_parser("checkout", help="Switch to a cached revision without downloading it.")
+    checkout_parser.add_argument("revision", help="Commit SHA or revision id (or a unique prefix of either).")
+    subparsers.add_parser("gc", help="Evict least recently used revisions until the release store fits its size cap.")
+    return parser.parse_args()
+
+def gc_release_store(store: ReleaseStore, project_root: Path, max_mb: int):
+    """Run the release store garbage collection, never evicting the revision currently in use."""
+    keep = {load_manifest(project_root)["id"]}
+    evicted, freed = store.gc(max_mb * 1024 * 1024, keep)
+    if evicted or freed:
+        print(f"Release store: evicted {evicted} revisions, freed {freed / (1024 * 1024):.1f} MiB.")
+
+def list_releases(store: ReleaseStore, project_root: Path):
+    current_id = load_manifest(project_root)["id"]
+    revisions = store.list_revisions()
+    if not revisions:
+        print("No cached revisions.")
+        return
+    for revision in revisions:
+        marker = "*" if revision["id"] == current_id else " "
+        pulled_at = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(revision.get("pulled_at", 0)))
+        label = revision.get("revision") or f"(tree {revision['id'][:12]})"
+        print(f"{marker} {label}  pulled {pulled_at}  {len(revision['files'])} files")
+
+def pull(args: argparse.Namespace, project_root: Path, store: ReleaseStore) -> bool:
+    """Bring the project root up to date with BRANCH. Returns False if it already was."""
+    manifest = {"id": None, "revision": None, "etag": None, "files": {}} if args.full else load_manifest(project_root)
+    session = requests.Session()
+    remote_revision = get_remote_revision(session)
+    if remote_revision and remote_revision == manifest["revision"]:
+        print(f"Already up to date with {BRANCH} at revision {remote_revision[:12]}. Nothing to do.")
+        return False
+
+    # A full pull rewrites every file, which a checkout from the store does not do for unchanged ones
+    use_store = remote_revision and not args.dry_run and not args.full
+    cached_revision = store.find_revision(remote_revision) if use_store else None
+    if cached_revision and cached_revision.get("revision") == remote_revision:
+        print(f"Revision {remote_revision[:12]} is in the release store. Restoring it without downloading...")
+        if not checkout_revision(store, project_root, cached_revision):
+            sys.exit(1)
+        return True
+
+    zip_path = store.root / "repo.zip"
+    store.root.mkdir(exist_ok=True)
+
+    # Download the commit that was resolved rather than the branch head, which may have moved
+    # since. The ETag check is then only needed when the revision could not be resolved.
+    if remote_revision:
+        zip_url, known_etag = COMMIT_ZIP_URL.format(revision=remote_revision), None
+    else:
+        zip_url, known_etag = ZIP_URL, manifest["etag"]
+    print(f"Downloading {zip_url} to {zip_path}...")
+    try:
+        downloaded, etag = download_archive(session, zip_url, zip_path, etag=known_etag)
+    except requests.RequestException as e:
+        print(f"Error downloading repository: {e}")
+        print("Any partial download is kept and will be resumed on the next run.")
+        sys.exit(1)
+
+    if not downloaded:
+        print(f"Already up to date with {BRANCH} (archive not modified). Nothing to do.")
+        if not args.dry_run:
+            save_manifest(project_root, remote_revision, manifest["files"], etag, manifest["id"])
+        return False
+    print("Download complete.")
+
+    if args.dry_run:
+        try:
+            with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+                plan = plan_sync(zip_ref, project_root, force=args.full)
+        except zipfile.BadZipFile as e:
+            print(f"Error reading ZIP file: {e}")
+            sys.exit(1)
+        finally:
+            zip_path.unlink()
+        if plan is None:
+            sys.exit(1)
+        print(f"Dry run: planned synchronization of {project_root}:")
+        print_plan(plan, verbose=True)
+        return False
+
+    print(f"Synchronizing {zip_path} into {project_root}...")
+    try:
+        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+            synced_hashes = sync_files(
+                zip_ref,
+                project_root,
+                force=args.full,
+                workers=args.workers,
+                fsync=args.fsync,
+                store=store,
+                stage_dir=store.stage_dir,
+            )
+    except zipfile.BadZipFile as e:
+        print(f"Error reading ZIP file: {e}")
+        zip_path.unlink()
+        sys.exit(1)
+
+    if synced_hashes is None:
+        print("File synchronization failed. See messages above.")
+        sys.exit(1)
+
+    revision_id = remote_revision or tree_id(synced_hashes)
+    store.save_revision(revision_id, remote_revision, etag, synced_hashes)
+    save_manifest(project_root, remote_revision, synced_hashes, etag, revision_id)
+    zip_path.unlink()
+    gc_release_store(store, project_root, args.cache_max_mb)
     return True
 
 def main():
+    args = parse_args()
+
     project_root = find_project_root_auto()
     if not project_root:
         project_root = get_project_root_interactively()
@@ -203,39 +1039,31 @@ def main():
 
     # Change CWD to project root for consistency if needed by other parts, though Path objects are absolute
     # os.chdir(project_root) 
-    print(f"Updating project at: {project_root}")
+    store = ReleaseStore(project_root / CACHE_DIR_NAME)
+    if not args.dry_run:
+        recover_interrupted_swap(store.stage_dir)
+    elif swap_journal_path(store.stage_dir).exists():
+        # A dry run must not rename anything into the project tree
+        print("Dry run: an interrupted update is pending and will be completed by the next run.")
 
-    with tempfile.TemporaryDirectory(prefix="stackai-update-") as temp_dir_str:
-        temp_dir = Path(temp_dir_str)
-        zip_path = temp_dir / "repo.zip"
+    if args.command == "list":
+        list_releases(store, project_root)
+        return
+    if args.command == "gc":
+        gc_release_store(store, project_root, args.cache_max_mb)
+        return
 
-        print(f"Downloading {ZIP_URL} to {zip_path}...")
-        try:
-            response = requests.get(ZIP_URL, stream=True, timeout=60)
-            response.raise_for_status()
-            with open(zip_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
-            print("Download complete.")
-        except requests.RequestException as e:
-            print(f"Error downloading repository: {e}")
-            sys.exit(1)
-
-        extract_to_dir = temp_dir / "extracted_repo"
-        extract_to_dir.mkdir()
-
-        print(f"Extracting {zip_path} to {extract_to_dir}...")
-        try:
-            with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-                zip_ref.extractall(extract_to_dir)
-            print("Extraction complete.")
-        except zipfile.BadZipFile as e:
-            print(f"Error extracting ZIP file: {e}")
+    print(f"Updating project at: {project_root}")
+    if args.command == "checkout":
+        revision = store.find_revision(args.revision)
+        if revision is None:
+            print(f"Error: Revision '{args.revision}' is not in the release store. Use the 'list' command to see cached revisions.")
             sys.exit(1)
-
-        if not sync_files(extract_to_dir, project_root):
-            print("File synchronization failed. See messages above.")
+        print(f"Checking out cached revision {revision.get('revision') or revision['id']}...")
+        if not checkout_revision(store, project_root, revision):
             sys.exit(1)
+    elif not pull(args, project_root, store):
+        return
 
     print("Update process finished successfully.")
     print("Please review any .env.example files and update your .env configurations as needed.")
@@ -244,4 +1072,4 @@ def main():
 
 if __name__ == "__main__":
     # project_root_arg will no longer be passed from shell script
-    main() 
\ No newline at end of file
+    main()
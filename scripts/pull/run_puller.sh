@@ -10,7 +10,7 @@ SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" &>/dev/null && pwd)"
 PULLER_SCRIPT="$SCRIPT_DIR/puller.py"
 REQUIREMENTS_FILE="$SCRIPT_DIR/requirements.txt"
 
-# Define a temporary virtual environment directory within scripts/update
+# Define the virtual environment directory within scripts/pull
 VENV_DIR="$SCRIPT_DIR/.puller_venv"
 
 # Check for python3
@@ -25,39 +25,45 @@ if ! python3 -m pip --version &> /dev/null; then
     exit 1
 fi
 
-echo "Setting up temporary Python virtual environment at $VENV_DIR..."
-if [ -d "$VENV_DIR" ]; then
-  echo "Existing venv found. Removing and recreating."
-  rm -rf "$VENV_DIR"
-fi
-python3 -m venv "$VENV_DIR"
+# Reuse the virtual environment from a previous run when its requirements are unchanged.
+# Recreating it and reinstalling dependencies dominates the runtime of a no-op pull.
+if [ -d "$VENV_DIR" ] && cmp -s "$REQUIREMENTS_FILE" "$VENV_DIR/requirements.txt"; then
+  echo "Reusing Python virtual environment at $VENV_DIR..."
+  unset PYTHONHOME
+  unset PYTHONPATH
+  source "$VENV_DIR/bin/activate"
+else
+  echo "Setting up Python virtual environment at $VENV_DIR..."
+  if [ -d "$VENV_DIR" ]; then
+    echo "Existing venv found with outdated requirements. Removing and recreating."
+    rm -rf "$VENV_DIR"
+  fi
+  python3 -m venv "$VENV_DIR"
 
-# Activate the virtual environment
-unset PYTHONHOME
-unset PYTHONPATH
-source "$VENV_DIR/bin/activate"
+  # Activate the virtual environment
+  unset PYTHONHOME
+  unset PYTHONPATH
+  source "$VENV_DIR/bin/activate"
 
-echo "Installing dependencies from $REQUIREMENTS_FILE into the virtual environment..."
-if ! python3 -m pip install --quiet -r "$REQUIREMENTS_FILE"; then
-    echo "Error: Failed to install Python dependencies."
-    echo "Deactivating and removing temporary venv."
-    deactivate
-    rm -rf "$VENV_DIR"
-    exit 1
+  echo "Installing dependencies from $REQUIREMENTS_FILE into the virtual environment..."
+  if ! python3 -m pip install --quiet -r "$REQUIREMENTS_FILE"; then
+      echo "Error: Failed to install Python dependencies."
+      echo "Deactivating and removing temporary venv."
+      deactivate
+      rm -rf "$VENV_DIR"
+      exit 1
+  fi
+  cp "$REQUIREMENTS_FILE" "$VENV_DIR/requirements.txt"
+  echo "Dependencies installed."
 fi
-echo "Dependencies installed."
 
 echo "Running Python puller script: $PULLER_SCRIPT..."
-if ! python3 "$PULLER_SCRIPT"; then
+if ! python3 "$PULLER_SCRIPT" "$@"; then
     echo "Error: Python puller script failed."
     deactivate
-    rm -rf "$VENV_DIR"
     exit 1
 fi
 
-# Deactivate and remove the virtual environment
-echo "Update script finished. Cleaning up virtual environment..."
 deactivate
-rm -rf "$VENV_DIR"
 
-echo "--- Python ZIP Puller Finished Successfully ---" 
\ No newline at end of file
+echo "--- Python ZIP Puller Finished Successfully ---"
\ No newline at end of file
@@ -0,0 +1,211 @@
+"""Tests for puller.py, run with: python -m pytest scripts/pull"""
+
+import json
+import os
+import threading
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pytest
+import requests
+
+import puller
+from puller import (
+    REPO_NAME,
+    commit_staged_files,
+    download_archive,
+    execute_plan,
+    plan_sync,
+    recover_interrupted_swap,
+    swap_journal_path,
+)
+
+ARCHIVE = os.urandom(256 * 1024)
+
+
+class ArchiveServer(ThreadingHTTPServer):
+    """Serve `body` at any path, honouring Range and If-Range.
+
+    The first `drop_after` responses are cut after half of their bytes, with the full
+    Content-Length announced, as a dropped connection would. The headers of each request are
+    recorded in `requests`.
+    """
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), ArchiveHandler)
+        self.body = ARCHIVE
+        self.etag: Optional[str] = '"v1"'
+        self.drop_after = 0
+        self.requests: List[Dict[str, str]] = []
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/archive.zip"
+
+
+class ArchiveHandler(BaseHTTPRequestHandler):
+    server: ArchiveServer
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append(dict(self.headers))
+        if server.etag and self.headers.get("If-None-Match") == server.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        offset = 0
+        range_header = self.headers.get("Range")
+        if_range = self.headers.get("If-Range")
+        if range_header and (if_range is None or (server.etag and if_range == server.etag)):
+            offset = int(range_header.removeprefix("bytes=").rstrip("-"))
+        body = server.body[offset:]
+
+        self.send_response(206 if offset else 200)
+        if server.etag:
+            self.send_header("ETag", server.etag)
+        if offset:
+            self.send_header("Content-Range", f"bytes {offset}-{len(server.body) - 1}/{len(server.body)}")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if server.drop_after:
+            server.drop_after -= 1
+            self.wfile.write(body[:len(body) // 2])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def server():
+    server = ArchiveServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def download(server: ArchiveServer, dest_path: Path, etag: Optional[str] = None):
+    with requests.Session() as session:
+        return download_archive(session, server.url, dest_path, etag=etag, backoff_seconds=0)
+
+
+def test_resumes_after_dropped_connection(server: ArchiveServer, tmp_path: Path):
+    server.drop_after = 1
+    dest_path = tmp_path / "archive.zip"
+
+    assert download(server, dest_path) == (True, '"v1"')
+    assert dest_path.read_bytes() == ARCHIVE
+    assert [request.get("Range") for request in server.requests] == [None, f"bytes={len(ARCHIVE) // 2}-"]
+    assert server.requests[1]["If-Range"] == '"v1"'
+    assert not dest_path.with_name("archive.zip.part").exists()
+
+
+def test_restarts_from_zero_without_etag(server: ArchiveServer, tmp_path: Path):
+    server.etag = None
+    server.drop_after = 1
+    dest_path = tmp_path / "archive.zip"
+
+    assert download(server, dest_path) == (True, None)
+    assert dest_path.read_bytes() == ARCHIVE
+    assert [request.get("Range") for request in server.requests] == [None, None]
+
+
+def test_changed_archive_is_downloaded_again(server: ArchiveServer, tmp_path: Path):
+    server.drop_after = 1
+    dest_path = tmp_path / "archive.zip"
+    with pytest.raises(requests.RequestException):
+        with requests.Session() as session:
+            download_archive(session, server.url, dest_path, max_attempts=1)
+    assert dest_path.with_name("archive.zip.part").exists()
+
+    server.body = os.urandom(len(ARCHIVE))
+    server.etag = '"v2"'
+    assert download(server, dest_path) == (True, '"v2"')
+    assert dest_path.read_bytes() == server.body
+
+
+def test_not_modified(server: ArchiveServer, tmp_path: Path):
+    dest_path = tmp_path / "archive.zip"
+    assert download(server, dest_path, etag='"v1"') == (False, '"v1"')
+    assert not dest_path.exists()
+
+
+def make_archive(path: Path) -> zipfile.ZipFile:
+    root = f"{REPO_NAME}-main"
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr(f"{root}/", "")
+        archive.writestr(f"{root}/README.md", "readme")
+        archive.writestr(f"{root}/empty/", "")
+        archive.writestr(f"{root}/new/a.txt", "a")
+        archive.writestr(f"{root}/new/sub/b.txt", "b")
+    return zipfile.ZipFile(path)
+
+
+def test_discarded_stage_leaves_no_new_directory(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    project_root = tmp_path / "project"
+    project_root.mkdir()
+    stage_dir = project_root / ".puller-stage"
+    apply_planned_file = puller.apply_planned_file
+
+    def failing_apply(archive, planned, *args):
+        if planned.relative_path.name == "b.txt":
+            raise OSError("disk full")
+        return apply_planned_file(archive, planned, *args)
+
+    with make_archive(tmp_path / "archive.zip") as archive:
+        monkeypatch.setattr(puller, "apply_planned_file", failing_apply)
+        assert execute_plan(archive, plan_sync(archive, project_root), stage_dir=stage_dir) is None
+        assert list(project_root.iterdir()) == []
+
+        monkeypatch.setattr(puller, "apply_planned_file", apply_planned_file)
+        hashes = execute_plan(archive, plan_sync(archive, project_root), stage_dir=stage_dir)
+
+    assert sorted(hashes) == ["README.md", "new/a.txt", "new/sub/b.txt"]
+    assert (project_root / "empty").is_dir()
+    assert (project_root / "new" / "sub" / "b.txt").read_text() == "b"
+    assert not stage_dir.exists()
+
+
+def stage_files(stage_dir: Path, project_root: Path):
+    stage_dir.mkdir(parents=True)
+    (project_root / "blocked").mkdir(parents=True)
+    (project_root / "blocked" / "file").write_text("user data")
+    swaps = []
+    for index, name in enumerate(["a.txt", "blocked", "b.txt"]):
+        staged_path = stage_dir / str(index)
+        staged_path.write_text(name)
+        swaps.append((staged_path, project_root / name))
+    return swaps
+
+
+def test_failed_rename_is_reported_and_not_journaled(tmp_path: Path):
+    project_root = tmp_path / "project"
+    stage_dir = tmp_path / "stage"
+    swaps = stage_files(stage_dir, project_root)
+
+    assert not commit_staged_files(stage_dir, swaps)
+    assert (project_root / "a.txt").read_text() == "a.txt"
+    assert (project_root / "b.txt").read_text() == "b.txt"
+    assert (project_root / "blocked" / "file").read_text() == "user data"
+    assert not swap_journal_path(stage_dir).exists()
+    assert not stage_dir.exists()
+
+
+def test_recovery_skips_failing_renames(tmp_path: Path):
+    project_root = tmp_path / "project"
+    stage_dir = tmp_path / "stage"
+    swaps = stage_files(stage_dir, project_root)
+    swap_journal_path(stage_dir).write_text(json.dumps([[str(staged), str(dest)] for staged, dest in swaps]))
+
+    recover_interrupted_swap(stage_dir)
+    assert (project_root / "b.txt").read_text() == "b.txt"
+    assert not swap_journal_path(stage_dir).exists()
+    assert not stage_dir.exists()
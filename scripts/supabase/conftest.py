@@ -0,0 +1,98 @@
+"""Test fixtures for scripts/supabase: an in-memory stand-in for the GoTrue SSO admin API."""
+
+import json
+import uuid
+from typing import Dict, List, Optional
+
+import httpx
+import pytest
+
+from sso_client import SupabaseSSOClient
+
+API_URL = "http://gotrue.test"
+
+
+class FakeGoTrue:
+    """Serve /auth/v1/admin/sso/providers from memory, through an httpx.MockTransport.
+
+    Like GoTrue, a domain can belong to one provider only: a POST or PUT claiming a domain of
+    another provider is rejected with 400. `failures` lists status codes to answer the next
+    requests with, and `page_size` makes the provider list paginated.
+    """
+
+    def __init__(self, page_size: Optional[int] = None):
+        self.providers: Dict[str, Dict] = {}
+        self.requests: List[httpx.Request] = []
+        self.failures: List[int] = []
+        self.page_size = page_size
+
+    def add(self, metadata_url: str, domains: List[str], **saml) -> Dict:
+        provider = {
+            "id": str(uuid.uuid4()),
+            "saml": {"metadata_url": metadata_url, **saml},
+            "domains": [{"domain": domain} for domain in domains],
+        }
+        self.providers[provider["id"]] = provider
+        return provider
+
+    def domains(self) -> Dict[str, List[str]]:
+        """The domains of each provider, keyed by metadata URL."""
+        return {
+            provider["saml"]["metadata_url"]: sorted(d["domain"] for d in provider["domains"])
+            for provider in self.providers.values()
+        }
+
+    def _conflict(self, domains: List[str], provider_id: Optional[str] = None) -> Optional[str]:
+        for other in self.providers.values():
+            if other["id"] != provider_id and {d["domain"] for d in other["domains"]} & set(domains):
+                return other["id"]
+        return None
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        if self.failures:
+            return httpx.Response(self.failures.pop(0), headers={"Retry-After": "0"}, json={"msg": "unavailable"})
+
+        path = request.url.path.removeprefix("/auth/v1/admin/sso/providers").strip("/")
+        if request.method == "GET" and not path:
+            items = list(self.providers.values())
+            if self.page_size:
+                page = int(request.url.params.get("page", 1))
+                items = items[(page - 1) * self.page_size:page * self.page_size]
+            return httpx.Response(200, json={"items": items})
+        if request.method == "POST" and not path:
+            payload = json.loads(request.content)
+            if self._conflict(payload["domains"]):
+                return httpx.Response(400, json={"msg": "domain already assigned"})
+            provider = self.add(payload.get("metadata_url"), payload["domains"])
+            return httpx.Response(201, json=provider)
+
+        provider = self.providers.get(path)
+        if provider is None:
+            return httpx.Response(404, json={"msg": "not found"})
+        if request.method == "DELETE":
+            del self.providers[path]
+            return httpx.Response(200, json=provider)
+        if request.method == "PUT":
+            payload = json.loads(request.content)
+            if "domains" in payload:
+                if self._conflict(payload["domains"], path):
+                    return httpx.Response(400, json={"msg": "domain already assigned"})
+                provider["domains"] = [{"domain": domain} for domain in payload["domains"]]
+            for name in ("metadata_url", "metadata_xml", "attribute_mapping"):
+                if name in payload:
+                    provider["saml"][name] = payload[name]
+            return httpx.Response(200, json=provider)
+        return httpx.Response(405)
+
+
+@pytest.fixture
+def gotrue() -> FakeGoTrue:
+    return FakeGoTrue()
+
+
+@pytest.fixture
+def sso_client(gotrue: FakeGoTrue):
+    def make() -> SupabaseSSOClient:
+        return SupabaseSSOClient(API_URL, "service-role-key", transport=httpx.MockTransport(gotrue.handler))
+    return make
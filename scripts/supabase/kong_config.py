@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+"""
+Round-trip editor for Kong's declarative configuration, supabase/volumes/api/kong.yml.
+
+The file is edited as YAML with ruamel.yaml, which keeps comments, quoting and key order, so a file
+that is loaded and saved without changes is written back byte for byte. Services and routes are
+added, updated and removed by name, idempotently: applying the same change twice changes nothing
+the second time.
+
+The "## ..." headings that group the services are comments, which ruamel.yaml attaches to the end
+of the service before them. Adding or removing a service moves them along, so a heading stays
+above its group.
+
+Kong renders kong.yml when its container starts, so applying a new configuration means restarting
+the container. `reload` restarts it only if the SHA-256 of kong.yml differs from the one recorded
+the last time it was applied.
+
+Usage:
+    python kong_config.py status
+    python kong_config.py reload [--force]
+    python kong_config.py remove-service <name>
+    python kong_config.py remove-route <service> <route>
+"""
+
+import sys
+import argparse
+import hashlib
+import io
+import logging
+import os
+import subprocess
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from ruamel.yaml import YAML
+from ruamel.yaml.comments import CommentedMap, CommentedSeq
+from ruamel.yaml.error import CommentMark
+from ruamel.yaml.scalarstring import ScalarString
+from ruamel.yaml.tokens import CommentToken
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+KONG_YML_PATH = PROJECT_ROOT / "supabase" / "volumes" / "api" / "kong.yml"
+APPLIED_HASH_PATH = Path(__file__).resolve().parent / ".kong-applied.sha256"
+KONG_SERVICE = "kong"
+
+
+def _yaml() -> YAML:
+    """A round-trip YAML instance matching the layout of kong.yml."""
+    yaml = YAML()
+    yaml.preserve_quotes = True
+    yaml.indent(mapping=2, sequence=4, offset=2)
+    yaml.width = 4096
+    return yaml
+
+
+def _commented(value: Any) -> Any:
+    """Convert plain dicts and lists to their round-trip types, which can carry comments."""
+    if isinstance(value, dict):
+        return CommentedMap((key, _commented(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return CommentedSeq(_commented(item) for item in value)
+    return value
+
+
+def _tail(node: Any) -> Tuple[Dict, Any, int]:
+    """Locate the comment slot after the last scalar of node, which holds whatever comment follows
+    node in the file. Returns (comment items, key, slot) such that items[key][slot] is the slot."""
+    while True:
+        if isinstance(node, CommentedMap) and node:
+            key = next(reversed(node))
+            if isinstance(node[key], (CommentedMap, CommentedSeq)) and node[key]:
+                node = node[key]
+                continue
+            return node.ca.items, key, 2
+        if isinstance(node, CommentedSeq) and node:
+            index = len(node) - 1
+            if isinstance(node[index], (CommentedMap, CommentedSeq)) and node[index]:
+                node = node[index]
+                continue
+            return node.ca.items, index, 0
+        raise ValueError("Cannot attach a comment to an empty node")
+
+
+def _get_tail_comment(node: Any) -> Optional[CommentToken]:
+    items, key, slot = _tail(node)
+    entry = items.get(key)
+    return entry[slot] if entry else None
+
+
+def _set_tail_comment(node: Any, comment: Optional[CommentToken]) -> None:
+    items, key, slot = _tail(node)
+    entry = items.setdefault(key, [None, None, None, None])
+    entry[slot] = comment
+    if not any(entry):
+        del items[key]
+
+
+def _edit_keeping_tail(node: Any, edit) -> Any:
+    """Run edit, which changes node, keeping the comment that follows node after its new last scalar."""
+    comment = _get_tail_comment(node)
+    if comment is not None:
+        _set_tail_comment(node, None)
+    result = edit()
+    if comment is not None:
+        _set_tail_comment(node, comment)
+    return result
+
+
+def _set_fields(node: CommentedMap, fields: Dict) -> bool:
+    """Set the fields of node that differ, leaving the others as they are in the file. Mappings are
+    updated field by field, and a string that is replaced keeps the quote style of the old one.
+    Returns True if any field changed."""
+    changed = False
+    for key, value in fields.items():
+        current = node.get(key)
+        if _matches(current, value):
+            continue
+        if isinstance(value, dict) and isinstance(current, CommentedMap):
+            _set_fields(current, value)
+        elif isinstance(value, str) and isinstance(current, ScalarString):
+            node[key] = type(current)(value)
+        else:
+            node[key] = _commented(value)
+        changed = True
+    return changed
+
+
+def _update_fields(node: CommentedMap, fields: Dict) -> bool:
+    """Set the fields of node that differ. Returns True if any did."""
+    return _edit_keeping_tail(node, lambda: _set_fields(node, fields))
+
+
+def heading_comment(text: str, indent: int = 2) -> CommentToken:
+    """A "## text" heading, preceded by a blank line, as found between the services of kong.yml."""
+    return CommentToken(f"\n\n{' ' * indent}## {text}\n", CommentMark(indent), None)
+
+
+def _matches(current: Any, desired: Any) -> bool:
+    """True if current holds every key of desired with the same value (extra keys are allowed)."""
+    if isinstance(desired, dict):
+        return isinstance(current, dict) and all(
+            key in current and _matches(current[key], value) for key, value in desired.items()
+        )
+    return current == desired
+
+
+class KongConfig:
+    """kong.yml, loaded for round-trip editing."""
+
+    def __init__(self, path: Path = KONG_YML_PATH):
+        self.path = Path(path)
+        self.yaml = _yaml()
+        self.original = self.path.read_text()
+        self.data = self.yaml.load(self.original)
+
+    @property
+    def services(self) -> CommentedSeq:
+        if self.data.get("services") is None:
+            self.data["services"] = CommentedSeq()
+        return self.data["services"]
+
+    def _index(self, name: str) -> Optional[int]:
+        return next((i for i, service in enumerate(self.services) if service.get("name") == name), None)
+
+    def service(self, name: str) -> Optional[CommentedMap]:
+        index = self._index(name)
+        return None if index is None else self.services[index]
+
+    def set_service(
+        self,
+        service: Dict,
+        before: Optional[str] = None,
+        after: Optional[str] = None,
+        heading: Optional[str] = None,
+    ) -> bool:
+        """
+        Make sure a service exists with the given fields. An existing service keeps its place,
+        comments and other fields; only the given fields that differ are replaced.
+
+        A missing service is inserted before the service named before, or after the one named
+        after (at the end if neither exists). With a heading, it starts a new group under that
+        heading; without, it joins the group of the service it is inserted next to.
+
+        Returns:
+            bool: True if the configuration changed
+        """
+        existing = self.service(service["name"])
+        if existing is not None:
+            return _update_fields(existing, service)
+
+        new_service = _commented(service)
+        services = self.services
+        if before is not None and self._index(before) is not None:
+            index, joins_next = self._index(before), True
+        elif after is not None and self._index(after) is not None:
+            index, joins_next = self._index(after) + 1, False
+        else:
+            index, joins_next = len(services), False
+        if index > 0:
+            # The comment after the previous service leads the service at index (or ends the file).
+            previous = services[index - 1]
+            if heading:
+                _set_tail_comment(new_service, _get_tail_comment(previous))
+                _set_tail_comment(previous, heading_comment(heading))
+            elif not joins_next:
+                _set_tail_comment(new_service, _get_tail_comment(previous))
+                _set_tail_comment(previous, None)
+        services.insert(index, new_service)
+        return True
+
+    def set_service_group(self, services: List[Dict], before: Optional[str] = None, heading: Optional[str] = None) -> bool:
+        """
+        Make sure a group of services exists. Missing services are inserted next to the services of
+        the group that exist, or else, as a new group under heading, before the service named before.
+
+        Returns:
+            bool: True if the configuration changed
+        """
+        changed = False
+        names = [service["name"] for service in services]
+        for i, service in enumerate(services):
+            existing_before = [name for name in names[:i] if self.service(name) is not None]
+            existing_after = [name for name in names[i + 1:] if self.service(name) is not None]
+            if existing_before:
+                changed |= self.set_service(service, after=existing_before[-1])
+            elif existing_after:
+                changed |= self.set_service(service, before=existing_after[0])
+            else:
+                changed |= self.set_service(service, before=before, heading=heading)
+        return changed
+
+    def remove_service(self, name: str) -> bool:
+        """
+        Remove a service. If it was the only service under its heading, the heading goes too (except
+        for the heading of the first service, which then leads the next one).
+
+        Returns:
+            bool: True if the service existed
+        """
+        index = self._index(name)
+        if index is None:
+            return False
+        services = self.services
+        removed = services[index]
+        following = _get_tail_comment(removed)
+        if index > 0 and (following is not None or index == len(services) - 1):
+            # The next service has its own heading (or there is none): the removed service's
+            # heading would lead nothing, so the next heading takes its place.
+            _set_tail_comment(services[index - 1], following)
+        del services[index]
+        return True
+
+    def set_route(self, service_name: str, route: Dict) -> bool:
+        """
+        Make sure a service has a route with the given fields.
+
+        Returns:
+            bool: True if the configuration changed
+
+        Raises:
+            KeyError: If the service does not exist
+        """
+        service = self.service(service_name)
+        if service is None:
+            raise KeyError(f"Service {service_name} not found in {self.path}")
+        existing = next((r for r in service.get("routes") or [] if r.get("name") == route["name"]), None)
+        if existing is not None:
+            return _update_fields(existing, route)
+
+        def append() -> bool:
+            if not service.get("routes"):
+                service["routes"] = CommentedSeq()
+            service["routes"].append(_commented(route))
+            return True
+
+        return _edit_keeping_tail(service, append)
+
+    def remove_route(self, service_name: str, route_name: str) -> bool:
+        """
+        Remove a route from a service.
+
+        Returns:
+            bool: True if the route existed
+        """
+        service = self.service(service_name)
+        routes = service.get("routes") if service is not None else None
+        index = next((i for i, r in enumerate(routes or []) if r.get("name") == route_name), None)
+        if index is None:
+            return False
+
+        def remove() -> bool:
+            del routes[index]
+            if not routes:
+                del service["routes"]
+            return True
+
+        return _edit_keeping_tail(service, remove)
+
+    def render(self) -> str:
+        out = io.StringIO()
+        self.yaml.dump(self.data, out)
+        return out.getvalue()
+
+    def save(self) -> bool:
+        """
+        Write the configuration if it differs from the file.
+
+        Returns:
+            bool: True if the file was written
+        """
+        content = self.render()
+        if content == self.original:
+            return False
+        tmp_path = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(content)
+        os.chmod(tmp_path, self.path.stat().st_mode & 0o7777)
+        os.replace(tmp_path, self.path)
+        self.original = content
+        return True
+
+
+def config_hash(path: Path = KONG_YML_PATH) -> str:
+    return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+
+
+def applied_hash() -> Optional[str]:
+    try:
+        return APPLIED_HASH_PATH.read_text().strip() or None
+    except OSError:
+        return None
+
+
+def needs_reload(path: Path = KONG_YML_PATH) -> bool:
+    """True if kong.yml changed since it was last applied (or was never applied by reload_kong)."""
+    return config_hash(path) != applied_hash()
+
+
+def reload_kong(path: Path = KONG_YML_PATH, force: bool = False) -> bool:
+    """
+    Restart Kong if kong.yml changed since it was last applied, and record its hash.
+
+    Returns:
+        bool: True if Kong was restarted
+
+    Raises:
+        subprocess.CalledProcessError: If the restart failed (the hash is then not recorded)
+    """
+    current = config_hash(path)
+    if not force and current == applied_hash():
+        return False
+    subprocess.run(["docker", "compose", "restart", KONG_SERVICE], cwd=PROJECT_ROOT, check=True)
+    APPLIED_HASH_PATH.write_text(current + "\n")
+    return True
+
+
+def main():
+    """Main function to inspect, edit and apply the Kong configuration."""
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    parser = argparse.ArgumentParser(description='Edit and apply the Kong declarative configuration')
+    parser.add_argument('--file', default=KONG_YML_PATH, type=Path, help='kong.yml to edit')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('status', help='Show whether kong.yml changed since it was last applied')
+    reload_parser = subparsers.add_parser('reload', help='Restart Kong if kong.yml changed since it was last applied')
+    reload_parser.add_argument('--force', action='store_true', help='Restart Kong even if kong.yml did not change')
+    remove_service_parser = subparsers.add_parser('remove-service', help='Remove a service')
+    remove_service_parser.add_argument('service')
+    remove_route_parser = subparsers.add_parser('remove-route', help='Remove a route from a service')
+    remove_route_parser.add_argument('service')
+    remove_route_parser.add_argument('route')
+    args = parser.parse_args()
+
+    if args.command == 'status':
+        logger.info(f"kong.yml sha256: {config_hash(args.file)}")
+        logger.info(f"Last applied:    {applied_hash() or 'never'}")
+        logger.info("🔄 Kong needs a reload" if needs_reload(args.file) else "✅ Kong is up to date")
+        return
+
+    if args.command == 'reload':
+        try:
+            restarted = reload_kong(args.file, force=args.force)
+        except (OSError, subprocess.CalledProcessError) as e:
+            logger.error(f"❌ Failed to restart Kong: {e}")
+            sys.exit(1)
+        logger.info("✅ Kong restarted with the new configuration" if restarted else
+                    "✅ kong.yml is unchanged since it was last applied, Kong was not restarted")
+        return
+
+    config = KongConfig(args.file)
+    if args.command == 'remove-service':
+        removed = config.remove_service(args.service)
+    else:
+        removed = config.remove_route(args.service, args.route)
+    config.save()
+    logger.info(f"✅ Removed {' '.join([args.service] + ([args.route] if args.command == 'remove-route' else []))}"
+                if removed else "✅ Nothing to remove")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+#!/bin/bash
+
+# 0. Try to remove existing .venv (if it exists)
+rm -rf .venv
+
+# 1. Create virtual environment
+python3 -m venv .venv
+source .venv/bin/activate
+
+# 2. Install dependencies
+python3 -m pip install --upgrade pip > /dev/null 2>&1
+python3 -m pip install -r requirements.txt > /dev/null 2>&1
+
+# 3. Run the script
+python3 kong_config.py reload "$@"
+STATUS=$?
+
+# 4. Clean up
+deactivate
+rm -rf .venv
+
+exit $STATUS
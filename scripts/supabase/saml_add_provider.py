@@ -2,19 +2,18 @@
 """
 Script to add a SAML provider to Supabase.
 This script accepts a metadata_url and a list of domains (comma-separated).
+With --metadata-xml, the metadata is fetched and validated locally and submitted as XML.
 """
 
 import sys
+import asyncio
 import argparse
-import requests
 import json
 from pathlib import Path
 import logging
-import re
-import urllib3
 
-# Disable SSL warnings when verify=False is used
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+from saml_metadata import MetadataCache, MetadataError
+from sso_client import SSOError, SupabaseSSOClient, load_supabase_credentials
 
 # Configure logging
 logging.basicConfig(
@@ -24,25 +23,39 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-def parse_env_file(env_path: Path) -> dict:
-    """Parse .env file and return a dictionary of key-value pairs"""
-    env_vars = {}
-    with open(env_path, 'r') as file:
-        content = file.read()
-    
-    # Pattern to match KEY=VALUE or KEY="VALUE" (including multi-line quoted values)
-    pattern = r'^([A-Z_][A-Z0-9_]*)=(?:"([^"]*(?:\n[^"]*)*)"|([^\n]*))'
-    
-    for match in re.finditer(pattern, content, re.MULTILINE):
-        key = match.group(1)
-        # Use group 2 if quoted value, otherwise group 3
-        value = match.group(2) if match.group(2) is not None else match.group(3)
-        env_vars[key] = value
-    
-    return env_vars
+def fetch_metadata_xml(metadata_url: str) -> str | None:
+    """
+    Fetch the metadata of a URL through the local metadata cache and validate it.
+
+    Returns:
+        str: The metadata XML, or None if it could not be fetched or is not usable
+    """
+    async def fetch():
+        async with MetadataCache() as cache:
+            return await cache.fetch(metadata_url)
 
+    try:
+        entry = asyncio.run(fetch())
+    except MetadataError as e:
+        logger.error(f"❌ {e}")
+        return None
+    logger.info(f"📥 Metadata of {entry.entity_id} ({'not modified' if entry.revalidated else 'downloaded'})")
+    for warning in entry.warnings():
+        logger.warning(f"⚠️  {warning}")
+    problems = entry.problems()
+    for problem in problems:
+        logger.error(f"❌ {problem}")
+    logger.info("")
+    return None if problems else entry.xml
 
-def add_saml_provider(metadata_url: str, domains: list, service_role_key: str, api_url: str = "http://localhost:8443") -> dict:
+
+def add_saml_provider(
+    metadata_url: str,
+    domains: list,
+    service_role_key: str,
+    api_url: str = "http://localhost:8443",
+    metadata_xml: str | None = None,
+) -> dict:
     """
     Add a SAML provider to Supabase via the Admin API.
     
@@ -51,62 +64,39 @@ def add_saml_provider(metadata_url: str, domains: list, service_role_key: str, a
         domains: List of domains that can authenticate with this provider
         service_role_key: Supabase service role key for authentication
         api_url: Base URL for the Supabase API (default: http://localhost:8443)
+        metadata_xml: The metadata itself, submitted instead of metadata_url if given
     
     Returns:
         dict: Response from the API
     """
-    url = f"{api_url}/auth/v1/admin/sso/providers"
-    
-    headers = {
-        'APIKey': service_role_key,
-        'Authorization': f'Bearer {service_role_key}',
-        'Content-Type': 'application/json'
-    }
-    
-    payload = {
-        'type': 'saml',
-        'metadata_url': metadata_url,
-        'domains': domains
-    }
-    
     logger.info("🔄 Sending request to Supabase API...")
-    logger.info(f"   URL: {url}")
+    logger.info(f"   URL: {api_url}/auth/v1/admin/sso/providers")
     logger.info(f"   Metadata URL: {metadata_url}")
     logger.info(f"   Domains: {', '.join(domains)}")
     logger.info("")
-    
+
+    async def add() -> dict:
+        async with SupabaseSSOClient(api_url, service_role_key) as client:
+            if metadata_xml:
+                return await client.add_provider(domains, metadata_xml=metadata_xml)
+            return await client.add_provider(domains, metadata_url=metadata_url)
+
     try:
-        response = requests.post(url, headers=headers, json=payload, timeout=10, verify=False)
-        
-        # Log the response
-        logger.info("📥 Response from Supabase API:")
-        logger.info(f"   Status Code: {response.status_code}")
-        logger.info("")
-        
-        try:
-            response_json = response.json()
-            logger.info("Response Body:")
-            logger.info(json.dumps(response_json, indent=2))
-        except json.JSONDecodeError:
-            logger.info("Response Body (raw):")
-            logger.info(response.text)
-        
-        if response.status_code in [200, 201]:
-            logger.info("")
-            logger.info("✅ SAML provider added successfully!")
-            return response_json if 'response_json' in locals() else {'status': 'success'}
-        else:
+        response_json = asyncio.run(add())
+    except SSOError as e:
+        logger.error(f"❌ Failed to add SAML provider: {e}")
+        if e.status_code is None:
             logger.error("")
-            logger.error(f"❌ Failed to add SAML provider. Status code: {response.status_code}")
-            return {}
-            
-    except requests.exceptions.RequestException as e:
-        logger.error(f"❌ Error making request: {e}")
-        logger.error("")
-        logger.error("💡 Make sure Supabase is running:")
-        logger.error("   cd supabase && docker-compose up -d")
+            logger.error("💡 Make sure Supabase is running:")
+            logger.error("   cd supabase && docker-compose up -d")
         return {}
 
+    logger.info("📥 Response from Supabase API:")
+    logger.info(json.dumps(response_json, indent=2))
+    logger.info("")
+    logger.info("✅ SAML provider added successfully!")
+    return response_json or {'status': 'success'}
+
 
 def main():
     """Main function to add a SAML provider."""
@@ -135,6 +125,12 @@ Examples:
         help='Domain(s) that can use this provider (comma-separated for multiple)'
     )
     
+    parser.add_argument(
+        '--metadata-xml',
+        action='store_true',
+        help='Fetch and validate the metadata locally, and submit it as metadata_xml'
+    )
+    
     parser.add_argument(
         '--api-url',
         default='http://localhost:8443',
@@ -155,32 +151,29 @@ Examples:
         sys.exit(1)
     
     # Get the project root directory (go up two levels from scripts/supabase)
-    script_dir = Path(__file__).parent
-    project_root = script_dir.parent.parent
-    supabase_env_path = project_root / "supabase" / ".env"
-    
-    # Check if .env file exists
-    if not supabase_env_path.exists():
-        logger.error(f"❌ Supabase .env file not found at {supabase_env_path}")
+    project_root = Path(__file__).parent.parent.parent
+    try:
+        api_url, service_role_key = load_supabase_credentials(project_root)
+    except (FileNotFoundError, KeyError) as e:
+        logger.error(f"❌ {e.args[0]}")
         logger.error("")
         logger.error("💡 Please run the environment setup script first:")
         logger.error("   make install-environment-variables")
         sys.exit(1)
     
-    # Parse the .env file to get the SERVICE_ROLE_KEY
-    env_vars = parse_env_file(supabase_env_path)
-    service_role_key = env_vars.get('SERVICE_ROLE_KEY')
-    
-    if not service_role_key:
-        logger.error("❌ SERVICE_ROLE_KEY not found in the .env file")
-        sys.exit(1)
+    metadata_xml = None
+    if args.metadata_xml:
+        metadata_xml = fetch_metadata_xml(args.metadata_url)
+        if metadata_xml is None:
+            sys.exit(1)
     
     # Add the SAML provider
     result = add_saml_provider(
         metadata_url=args.metadata_url,
         domains=domains,
         service_role_key=service_role_key,
-        api_url=env_vars.get("API_EXTERNAL_URL")
+        api_url=api_url,
+        metadata_xml=metadata_xml
     )
     
     if result:
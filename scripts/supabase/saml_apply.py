@@ -0,0 +1,443 @@
+#!/usr/bin/env python3
+"""
+Script to reconcile the SAML providers of Supabase with a desired-state file.
+
+The file lists every provider that should exist:
+
+    providers:
+      - metadata_url: https://idp.example.com/metadata
+        domains: [example.com, test.com]
+      - metadata_url: https://login.other.org/saml/metadata
+        domains: [other.org]
+        attribute_mapping: {keys: {email: {name: mail}}}
+
+The existing providers are listed once and compared with the file, which gives a minimal plan:
+providers are matched on their metadata URL, or failing that on a shared domain (an IdP whose
+metadata URL moved); a matched provider is updated only if its domains or attribute mapping
+differ; unmatched entries of the file are added; and providers that the file does not list are
+deleted. The plan is then executed concurrently over one pooled connection. Applying a file that
+is already in effect makes no write request.
+
+With --metadata-xml, the metadata documents are fetched first, concurrently and through the local
+cache of saml_metadata.py, and validated: entries whose metadata cannot be fetched, or has expired,
+are skipped (and their provider kept). Providers are then added with their metadata_xml, so GoTrue
+does not fetch the documents again, matched on entity ID as well, and updated when the IdP
+published a new document.
+"""
+
+import sys
+import asyncio
+import argparse
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+import logging
+
+import yaml
+
+from saml_metadata import MetadataCache
+from sso_client import (
+    DEFAULT_CONCURRENCY,
+    SupabaseSSOClient,
+    SSOError,
+    load_supabase_credentials,
+    provider_domains,
+    provider_metadata_url,
+)
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Plan:
+    """The changes that bring the configured providers to the desired state."""
+    adds: list = field(default_factory=list)     # Specs of the providers to add
+    updates: list = field(default_factory=list)  # (provider, fields to change) pairs
+    deletes: list = field(default_factory=list)  # Providers to delete
+    unchanged: int = 0
+    skipped: int = 0  # Entries whose metadata could not be used
+
+    def __bool__(self) -> bool:
+        return bool(self.adds or self.updates or self.deletes)
+
+
+def load_providers_file(path: Path) -> list:
+    """
+    Load and validate the providers of a desired-state file.
+
+    Returns:
+        list: One dict per provider, with metadata_url, domains (lowercase) and, if the file
+        sets it, attribute_mapping
+
+    Raises:
+        ValueError: If the file is malformed, or lists a metadata URL or a domain twice
+    """
+    with open(path) as f:
+        data = yaml.safe_load(f) or {}
+    providers = data.get('providers') if isinstance(data, dict) else None
+    if not isinstance(providers, list):
+        raise ValueError(f"{path} must contain a 'providers' list")
+
+    specs = []
+    seen_urls = set()
+    seen_domains = {}
+    for i, provider in enumerate(providers, 1):
+        if not isinstance(provider, dict) or not provider.get('metadata_url'):
+            raise ValueError(f"Provider #{i} has no metadata_url")
+        metadata_url = provider['metadata_url']
+        domains = provider.get('domains')
+        if isinstance(domains, str):
+            domains = domains.split(',')
+        domains = sorted({d.strip().lower() for d in domains or [] if d.strip()})
+        if not domains:
+            raise ValueError(f"Provider #{i} ({metadata_url}) has no domains")
+        if metadata_url in seen_urls:
+            raise ValueError(f"Provider #{i} ({metadata_url}) is listed twice")
+        seen_urls.add(metadata_url)
+        for domain in domains:
+            if domain in seen_domains:
+                raise ValueError(f"Domain {domain} is used by both {seen_domains[domain]} and {metadata_url}")
+            seen_domains[domain] = metadata_url
+        spec = {'metadata_url': metadata_url, 'domains': domains}
+        if provider.get('attribute_mapping') is not None:
+            spec['attribute_mapping'] = provider['attribute_mapping']
+        specs.append(spec)
+    return specs
+
+
+def plan_changes(specs: list, existing: list) -> Plan:
+    """Compute the minimal plan that turns the existing providers into those of specs."""
+    plan = Plan()
+    by_url = {}
+    by_entity_id = {}
+    by_domain = {}
+    for provider in existing:
+        by_url.setdefault(provider_metadata_url(provider), provider)
+        by_entity_id.setdefault((provider.get('saml') or {}).get('entity_id'), provider)
+        for domain in provider_domains(provider):
+            by_domain.setdefault(domain.lower(), provider)
+
+    def matches(spec: dict, provider: dict) -> bool:
+        # GoTrue refuses to change the entity ID of a provider: such an entry replaces it instead.
+        entity_id = (provider.get('saml') or {}).get('entity_id')
+        return provider['id'] not in matched and not (spec.get('entity_id') and entity_id and spec['entity_id'] != entity_id)
+
+    matched = {}
+    unmatched = []
+    for spec in specs:
+        provider = by_url.get(spec['metadata_url'])
+        if provider is not None and matches(spec, provider):
+            matched[provider['id']] = (spec, provider)
+        else:
+            unmatched.append(spec)
+    # An entry whose metadata URL is not configured takes over the provider with its entity ID, or
+    # else one that serves one of its domains, if that provider is not matched already: updating
+    # it beats a delete and an add.
+    for spec in unmatched:
+        candidates = [by_entity_id.get(spec.get('entity_id'))] + [by_domain.get(domain) for domain in spec['domains']]
+        provider = next((p for p in candidates if p is not None and matches(spec, p)), None)
+        if provider is not None:
+            matched[provider['id']] = (spec, provider)
+        elif 'metadata_error' in spec:
+            plan.skipped += 1
+        else:
+            plan.adds.append(spec)
+
+    for spec, provider in matched.values():
+        if 'metadata_error' in spec:
+            plan.skipped += 1  # Keep the provider as it is
+            continue
+        changes = {}
+        if 'metadata_xml' in spec:
+            if (provider.get('saml') or {}).get('metadata_xml') != spec['metadata_xml']:
+                changes['metadata_xml'] = spec['metadata_xml']
+        elif provider_metadata_url(provider) != spec['metadata_url']:
+            changes['metadata_url'] = spec['metadata_url']
+        if sorted(d.lower() for d in provider_domains(provider)) != spec['domains']:
+            changes['domains'] = spec['domains']
+        if 'attribute_mapping' in spec:
+            current_mapping = (provider.get('saml') or {}).get('attribute_mapping') or {}
+            if current_mapping != spec['attribute_mapping']:
+                changes['attribute_mapping'] = spec['attribute_mapping']
+        if changes:
+            plan.updates.append((provider, changes))
+        else:
+            plan.unchanged += 1
+
+    plan.deletes = [provider for provider in existing if provider['id'] not in matched]
+    return plan
+
+
+def provider_fields(spec: dict) -> dict:
+    """The add_provider arguments of an entry: its metadata XML if it was fetched, else its URL."""
+    fields = {'domains': spec['domains']}
+    if 'metadata_xml' in spec:
+        fields['metadata_xml'] = spec['metadata_xml']
+    else:
+        fields['metadata_url'] = spec['metadata_url']
+    if 'attribute_mapping' in spec:
+        fields['attribute_mapping'] = spec['attribute_mapping']
+    return fields
+
+
+def attach_metadata(specs: list, results: list) -> list:
+    """
+    Add the fetched metadata_xml and entity_id to the entries, or a metadata_error if the
+    metadata could not be fetched or is not usable.
+    """
+    entries = {result.item: result for result in results}
+    downloaded = revalidated = failed = 0
+    attached = []
+    for spec in specs:
+        result = entries[spec['metadata_url']]
+        if not result.ok:
+            failed += 1
+            logger.error(f"❌ {result.error}")
+            attached.append({**spec, 'metadata_error': str(result.error)})
+            continue
+        entry = result.value
+        for warning in entry.warnings():
+            logger.warning(f"⚠️  {entry.url}: {warning}")
+        problems = entry.problems()
+        if problems:
+            failed += 1
+            logger.error(f"❌ {entry.url}: {'; '.join(problems)}")
+            attached.append({**spec, 'metadata_error': '; '.join(problems)})
+            continue
+        revalidated += entry.revalidated
+        downloaded += not entry.revalidated
+        attached.append({**spec, 'metadata_xml': entry.xml, 'entity_id': entry.entity_id})
+
+    logger.info(f"📥 Metadata: {downloaded} downloaded, {revalidated} not modified, {failed} unusable")
+    return attached
+
+
+def provider_label(provider: dict) -> str:
+    """The metadata URL of a provider, or its entity ID if it was added from metadata XML."""
+    return provider_metadata_url(provider) or (provider.get('saml') or {}).get('entity_id') or provider['id']
+
+
+def log_plan(plan: Plan) -> None:
+    for spec in plan.adds:
+        logger.info(f"   ➕ add     {spec['metadata_url']} ({', '.join(spec['domains'])})")
+    for provider, changes in plan.updates:
+        logger.info(f"   🔄 update  {provider_label(provider)} [{provider['id']}]: {', '.join(sorted(changes))}")
+    for provider in plan.deletes:
+        logger.info(f"   ➖ delete  {provider_label(provider)} [{provider['id']}]")
+
+
+def release_domains(plan: Plan) -> list:
+    """
+    The first step of the updates: each provider that gives up domains is left with only those of
+    its current domains that it keeps, so that the others are free before any provider claims them.
+
+    Returns:
+        list: (provider_id, {'domains': [...]}) pairs
+    """
+    releases = []
+    for provider, changes in plan.updates:
+        if 'domains' not in changes:
+            continue
+        current = {d.lower() for d in provider_domains(provider)}
+        kept = current & set(changes['domains'])
+        if kept != current:
+            releases.append((provider['id'], {'domains': sorted(kept)}))
+    return releases
+
+
+async def execute_plan(client: SupabaseSSOClient, plan: Plan) -> bool:
+    """
+    Execute a plan, each step concurrently: deletes, then the domains that updated providers give
+    up, then updates, then adds, so that domains released by a provider are free before another
+    one claims them. Two providers can therefore swap domains.
+
+    Returns:
+        bool: True if every change was applied
+    """
+    failures = 0
+
+    results = await client.delete_providers(provider['id'] for provider in plan.deletes)
+    for result in results:
+        if not result.ok:
+            failures += 1
+            logger.error(f"❌ Failed to delete {result.item}: {result.error}")
+        elif result.value:
+            logger.info(f"✅ Deleted {result.item}")
+        else:
+            logger.info(f"✅ Deleted {result.item} (it was already gone)")
+
+    released = {}
+    results = await client.update_providers(release_domains(plan))
+    for result in results:
+        if result.ok:
+            released[result.item[0]] = result.item[1]['domains']
+        else:
+            failures += 1
+            logger.error(f"❌ Failed to release the domains of {result.item[0]}: {result.error}")
+
+    updates = []
+    for provider, changes in plan.updates:
+        if released.get(provider['id']) == changes.get('domains'):
+            # The release already left the provider with its final domains.
+            logger.info(f"✅ Updated {provider['id']} (domains)")
+            changes = {name: value for name, value in changes.items() if name != 'domains'}
+        if changes:
+            updates.append((provider['id'], changes))
+    results = await client.update_providers(updates)
+    for result in results:
+        if result.ok:
+            logger.info(f"✅ Updated {result.item[0]} ({', '.join(sorted(result.item[1]))})")
+        else:
+            failures += 1
+            logger.error(f"❌ Failed to update {result.item[0]}: {result.error}")
+
+    results = await client.add_providers(provider_fields(spec) for spec in plan.adds)
+    for spec, result in zip(plan.adds, results):
+        if result.ok:
+            logger.info(f"✅ Added {spec['metadata_url']} ({', '.join(spec['domains'])})")
+        else:
+            failures += 1
+            logger.error(f"❌ Failed to add {spec['metadata_url']}: {result.error}")
+
+    return failures == 0
+
+
+async def reconcile(
+    client: SupabaseSSOClient,
+    specs: list,
+    dry_run: bool = False,
+    metadata_cache: Optional[MetadataCache] = None,
+) -> bool:
+    """
+    Bring the configured providers to the state described by specs. With a metadata_cache, the
+    providers are configured with their metadata XML, fetched while the providers are listed.
+
+    Returns:
+        bool: True if the providers are in the desired state (or, for a dry run, the plan was computed)
+    """
+    if metadata_cache is None:
+        existing = await client.list_providers()
+    else:
+        existing, metadata = await asyncio.gather(
+            client.list_providers(),
+            metadata_cache.fetch_all(spec['metadata_url'] for spec in specs),
+        )
+        specs = attach_metadata(specs, metadata)
+    plan = plan_changes(specs, existing)
+
+    logger.info(f"📋 {len(specs)} providers in the file, {len(existing)} configured")
+    logger.info(f"   Plan: {len(plan.adds)} to add, {len(plan.updates)} to update, "
+                f"{len(plan.deletes)} to delete, {plan.unchanged} unchanged"
+                + (f", {plan.skipped} skipped" if plan.skipped else ""))
+    logger.info("")
+    if not plan:
+        logger.info("✅ SAML providers are up to date" if not plan.skipped else
+                    "❌ Some providers were skipped, fix their metadata and run again")
+        return not plan.skipped
+
+    log_plan(plan)
+    logger.info("")
+    if dry_run:
+        logger.info("💡 Dry run: no changes were made")
+        return True
+
+    applied = await execute_plan(client, plan)
+    logger.info("")
+    if not applied:
+        logger.info("❌ Some changes failed, run again to retry them")
+    elif plan.skipped:
+        logger.info("❌ Some providers were skipped, fix their metadata and run again")
+    else:
+        logger.info("✅ SAML providers reconciled")
+    return applied and not plan.skipped
+
+
+def main():
+    """Main function to reconcile the SAML providers."""
+    parser = argparse.ArgumentParser(
+        description='Reconcile the SAML providers of Supabase with a desired-state file',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python saml_apply.py --file providers.yaml --dry-run
+  python saml_apply.py --file providers.yaml
+  python saml_apply.py --file providers.yaml --concurrency 16
+  python saml_apply.py --file providers.yaml --metadata-xml
+        """
+    )
+
+    parser.add_argument(
+        '--file',
+        required=True,
+        help='YAML file listing every SAML provider that should exist'
+    )
+
+    parser.add_argument(
+        '--dry-run',
+        action='store_true',
+        help='Show the plan without applying it'
+    )
+
+    parser.add_argument(
+        '--metadata-xml',
+        action='store_true',
+        help='Fetch and validate the metadata locally, and submit it as metadata_xml'
+    )
+
+    parser.add_argument(
+        '--concurrency',
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help=f'Maximum number of concurrent requests (default: {DEFAULT_CONCURRENCY})'
+    )
+
+    args = parser.parse_args()
+
+    logger.info("🔧 StackAI SAML Providers Apply")
+    logger.info("=" * 40)
+    logger.info("")
+
+    try:
+        specs = load_providers_file(Path(args.file))
+    except (OSError, ValueError, yaml.YAMLError) as e:
+        logger.error(f"❌ Invalid providers file: {e}")
+        sys.exit(1)
+
+    # Get the project root directory (go up two levels from scripts/supabase)
+    project_root = Path(__file__).parent.parent.parent
+    try:
+        api_url, service_role_key = load_supabase_credentials(project_root)
+    except (FileNotFoundError, KeyError) as e:
+        logger.error(f"❌ {e.args[0]}")
+        logger.error("")
+        logger.error("💡 Please run the environment setup script first:")
+        logger.error("   make install-environment-variables")
+        sys.exit(1)
+
+    async def apply() -> bool:
+        async with SupabaseSSOClient(api_url, service_role_key, concurrency=args.concurrency) as client:
+            if not args.metadata_xml:
+                return await reconcile(client, specs, dry_run=args.dry_run)
+            async with MetadataCache() as metadata_cache:
+                return await reconcile(client, specs, dry_run=args.dry_run, metadata_cache=metadata_cache)
+
+    try:
+        success = asyncio.run(apply())
+    except SSOError as e:
+        logger.error(f"❌ Failed to retrieve SSO providers: {e}")
+        logger.error("")
+        logger.error("💡 Make sure Supabase is running:")
+        logger.error("   cd supabase && docker-compose up -d")
+        sys.exit(1)
+
+    if not success:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+#!/bin/bash
+
+# Check if required argument is provided
+if [ "$#" -lt 1 ]; then
+    echo "Usage: $0 <providers_file> [dry_run] [metadata_xml]"
+    echo ""
+    echo "Examples:"
+    echo "  $0 /path/to/providers.yaml"
+    echo "  $0 /path/to/providers.yaml true"
+    echo "  $0 /path/to/providers.yaml false true"
+    exit 1
+fi
+
+PROVIDERS_FILE="$1"
+FLAGS=""
+if [ "${2:-false}" = "true" ]; then
+    FLAGS="$FLAGS --dry-run"
+fi
+if [ "${3:-false}" = "true" ]; then
+    FLAGS="$FLAGS --metadata-xml"
+fi
+
+# 0. Try to remove existing .venv (if it exists)
+rm -rf .venv
+
+# 1. Create virtual environment
+python3 -m venv .venv
+source .venv/bin/activate
+
+# 2. Install dependencies
+python3 -m pip install --upgrade pip > /dev/null 2>&1
+python3 -m pip install -r requirements.txt > /dev/null 2>&1
+
+# 3. Run the script
+python3 saml_apply.py --file "$PROVIDERS_FILE" $FLAGS
+STATUS=$?
+
+# 4. Clean up
+deactivate
+rm -rf .venv
+
+exit $STATUS
@@ -1,20 +1,16 @@
 #!/usr/bin/env python3
 """
-Script to delete a SAML provider from Supabase by its UUID.
-This script accepts a provider_id (UUID) and removes the provider.
+Script to delete SAML providers from Supabase by their UUID.
+This script accepts one or more provider_ids (UUIDs, comma-separated) and removes the providers.
 """
 
 import sys
+import asyncio
 import argparse
-import requests
-import json
 from pathlib import Path
 import logging
-import re
-import urllib3
 
-# Disable SSL warnings when verify=False is used
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+from sso_client import SupabaseSSOClient, load_supabase_credentials
 
 # Configure logging
 logging.basicConfig(
@@ -24,22 +20,42 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-def parse_env_file(env_path: Path) -> dict:
-    """Parse .env file and return a dictionary of key-value pairs"""
-    env_vars = {}
-    with open(env_path, 'r') as file:
-        content = file.read()
-    
-    # Pattern to match KEY=VALUE or KEY="VALUE" (including multi-line quoted values)
-    pattern = r'^([A-Z_][A-Z0-9_]*)=(?:"([^"]*(?:\n[^"]*)*)"|([^\n]*))'
+def delete_sso_providers(provider_ids: list, service_role_key: str, api_url: str) -> bool:
+    """
+    Delete SSO providers from Supabase via the Admin API, concurrently over one connection pool.
     
-    for match in re.finditer(pattern, content, re.MULTILINE):
-        key = match.group(1)
-        # Use group 2 if quoted value, otherwise group 3
-        value = match.group(2) if match.group(2) is not None else match.group(3)
-        env_vars[key] = value
+    Args:
+        provider_ids: UUIDs of the providers to delete
+        service_role_key: Supabase service role key for authentication
+        api_url: Base URL for the Supabase API
     
-    return env_vars
+    Returns:
+        bool: True if every provider was deleted, False otherwise
+    """
+    logger.info("🔄 Deleting SSO providers from Supabase API...")
+    logger.info(f"   URL: {api_url}/auth/v1/admin/sso/providers")
+    logger.info(f"   Provider IDs: {', '.join(provider_ids)}")
+    logger.info("")
+
+    async def delete_all() -> list:
+        async with SupabaseSSOClient(api_url, service_role_key) as client:
+            return await client.delete_providers(provider_ids)
+
+    success = True
+    for result in asyncio.run(delete_all()):
+        if not result.ok:
+            logger.error(f"❌ {result.item}: {result.error}")
+            success = False
+        elif not result.value:
+            logger.error(f"❌ {result.item}: Provider not found!")
+            success = False
+        else:
+            logger.info(f"✅ {result.item}: SSO provider deleted successfully!")
+
+    if not success:
+        logger.error("")
+        logger.error("💡 Use 'make saml-list-providers' to see available providers")
+    return success
 
 
 def delete_sso_provider(provider_id: str, service_role_key: str, api_url: str) -> bool:
@@ -54,64 +70,7 @@ def delete_sso_provider(provider_id: str, service_role_key: str, api_url: str) -
     Returns:
         bool: True if successful, False otherwise
     """
-    url = f"{api_url}/auth/v1/admin/sso/providers/{provider_id}"
-    
-    headers = {
-        'APIKey': service_role_key,
-        'Authorization': f'Bearer {service_role_key}',
-        'Content-Type': 'application/json'
-    }
-    
-    logger.info("🔄 Deleting SSO provider from Supabase API...")
-    logger.info(f"   URL: {url}")
-    logger.info(f"   Provider ID: {provider_id}")
-    logger.info("")
-    
-    try:
-        response = requests.delete(url, headers=headers, timeout=10, verify=False)
-        
-        # Log the response
-        logger.info("📥 Response from Supabase API:")
-        logger.info(f"   Status Code: {response.status_code}")
-        logger.info("")
-        
-        if response.status_code == 204:
-            # 204 No Content is the typical success response for DELETE
-            logger.info("✅ SSO provider deleted successfully!")
-            return True
-        elif response.status_code == 200:
-            # Some APIs return 200 with content
-            try:
-                response_json = response.json()
-                logger.info("Response Body:")
-                logger.info(json.dumps(response_json, indent=2))
-                logger.info("")
-                logger.info("✅ SSO provider deleted successfully!")
-                return True
-            except json.JSONDecodeError:
-                logger.info("✅ SSO provider deleted successfully!")
-                return True
-        elif response.status_code == 404:
-            logger.error("❌ Provider not found!")
-            logger.error("💡 Use 'make saml-list-providers' to see available providers")
-            return False
-        else:
-            logger.error(f"❌ Failed to delete SSO provider. Status code: {response.status_code}")
-            try:
-                error_response = response.json()
-                logger.error("Error details:")
-                logger.error(json.dumps(error_response, indent=2))
-            except json.JSONDecodeError:
-                logger.error("Error response (raw):")
-                logger.error(response.text)
-            return False
-            
-    except requests.exceptions.RequestException as e:
-        logger.error(f"❌ Error making request: {e}")
-        logger.error("")
-        logger.error("💡 Make sure Supabase is running:")
-        logger.error("   cd supabase && docker-compose up -d")
-        return False
+    return delete_sso_providers([provider_id], service_role_key, api_url)
 
 
 def validate_uuid(uuid_string: str) -> bool:
@@ -141,13 +100,16 @@ def main():
 Examples:
   # Delete a provider by UUID
   python saml_delete_provider.py --provider-id "12345678-1234-1234-1234-123456789abc"
+
+  # Delete several providers (comma-separated)
+  python saml_delete_provider.py --provider-id "12345678-1234-1234-1234-123456789abc,87654321-4321-4321-4321-cba987654321"
         """
     )
     
     parser.add_argument(
         '--provider-id',
         required=True,
-        help='UUID of the SSO provider to delete'
+        help='UUID of the SSO provider to delete (comma-separated for multiple)'
     )
     
     args = parser.parse_args()
@@ -156,8 +118,11 @@ Examples:
     logger.info("=" * 45)
     logger.info("")
     
+    # Parse provider IDs (split by comma and strip whitespace)
+    provider_ids = [p.strip() for p in args.provider_id.split(',') if p.strip()]
+    
     # Validate UUID format
-    if not validate_uuid(args.provider_id):
+    if not provider_ids or not all(validate_uuid(provider_id) for provider_id in provider_ids):
         logger.error("❌ Invalid provider ID format!")
         logger.error("   Provider ID must be a valid UUID")
         logger.error("")
@@ -165,34 +130,19 @@ Examples:
         sys.exit(1)
     
     # Get the project root directory (go up two levels from scripts/supabase)
-    script_dir = Path(__file__).parent
-    project_root = script_dir.parent.parent
-    supabase_env_path = project_root / "supabase" / ".env"
-    
-    # Check if .env file exists
-    if not supabase_env_path.exists():
-        logger.error(f"❌ Supabase .env file not found at {supabase_env_path}")
+    project_root = Path(__file__).parent.parent.parent
+    try:
+        api_url, service_role_key = load_supabase_credentials(project_root)
+    except (FileNotFoundError, KeyError) as e:
+        logger.error(f"❌ {e.args[0]}")
         logger.error("")
         logger.error("💡 Please run the environment setup script first:")
         logger.error("   make install-environment-variables")
         sys.exit(1)
     
-    # Parse the .env file to get the SERVICE_ROLE_KEY and API_EXTERNAL_URL
-    env_vars = parse_env_file(supabase_env_path)
-    service_role_key = env_vars.get('SERVICE_ROLE_KEY')
-    api_url = env_vars.get('API_EXTERNAL_URL')
-    
-    if not service_role_key:
-        logger.error("❌ SERVICE_ROLE_KEY not found in the .env file")
-        sys.exit(1)
-    
-    if not api_url:
-        logger.error("❌ API_EXTERNAL_URL not found in the .env file")
-        sys.exit(1)
-    
     # Confirm deletion
     logger.info("⚠️  WARNING: This action cannot be undone!")
-    logger.info(f"   You are about to delete provider: {args.provider_id}")
+    logger.info(f"   You are about to delete provider(s): {', '.join(provider_ids)}")
     logger.info("")
     
     # In a script context, we'll proceed without interactive confirmation
@@ -200,9 +150,9 @@ Examples:
     logger.info("🗑️  Proceeding with deletion...")
     logger.info("")
     
-    # Delete the SSO provider
-    success = delete_sso_provider(
-        provider_id=args.provider_id,
+    # Delete the SSO provider(s)
+    success = delete_sso_providers(
+        provider_ids=provider_ids,
         service_role_key=service_role_key,
         api_url=api_url
     )
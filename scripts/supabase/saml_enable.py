@@ -9,14 +9,50 @@ import sys
 from pathlib import Path
 import logging
 from cryptography.hazmat.primitives import serialization
-from cryptography.hazmat.primitives.asymmetric import rsa
 import base64
+from ruamel.yaml import YAMLError
+
+from kong_config import KongConfig, needs_reload
 
 logger = logging.getLogger(__name__)
 
+# The .env parser and the key pool are shared with scripts/environment_variables.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "environment_variables"))
+from env_file import update_env_file  # noqa: E402
+from secret_pool import refill_key_pool, take_rsa_private_key  # noqa: E402
+
+# The Kong services that expose the GoTrue SAML endpoints
+SAML_KONG_SERVICES = [
+    {
+        "name": "auth-v1-open-sso-acs",
+        "url": "http://auth:9999/sso/saml/acs",
+        "routes": [
+            {
+                "name": "auth-v1-open-sso-acs",
+                "strip_path": True,
+                "paths": ["/auth/v1/sso/saml/acs", "/sso/saml/acs"],
+            }
+        ],
+        "plugins": [{"name": "cors"}],
+    },
+    {
+        "name": "auth-v1-open-sso-metadata",
+        "url": "http://auth:9999/sso/saml/metadata",
+        "routes": [
+            {
+                "name": "auth-v1-open-sso-metadata",
+                "strip_path": True,
+                "paths": ["/auth/v1/sso/saml/metadata", "/sso/saml/metadata"],
+            }
+        ],
+        "plugins": [{"name": "cors"}],
+    },
+]
+
 
 def generate_saml_private_key() -> str:
-    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    # Taken from the shared key pool when it has one, generated on the spot otherwise
+    private_key = take_rsa_private_key()
 
     # Export in DER (binary) format using PKCS#1
     der_bytes = private_key.private_bytes(
@@ -33,128 +69,31 @@ def generate_saml_private_key() -> str:
     
     return formatted_b64
 
-def update_env_file(env_file_path: Path, key: str, new_value: str) -> bool:
-    """
-    Update a specific key in an environment file.
-    Handles multi-line values properly.
-    
-    Args:
-        env_file_path: Path to the .env file
-        key: Environment variable key to update
-        new_value: New value to set
-     
-    Returns:
-        bool: True if file was updated, False if key wasn't found
-    """
-    if not env_file_path.exists():
-        logger.error(f"Environment file not found: {env_file_path}")
-        return False
-    
-    # Read all content
-    with open(env_file_path, 'r') as f:
-        content = f.read()
-    
-    import re
-    
-    # Format new value - if it contains newlines, wrap in quotes
-    if '\n' in new_value:
-        formatted_value = f'{key}="{new_value}"'
-    else:
-        formatted_value = f'{key}={new_value}'
-    
-    # Pattern to match the key and its complete value (including multi-line quoted values)
-    # This matches: KEY="multi\nline\nvalue" or KEY=singlevalue
-    pattern = rf'^{re.escape(key)}=(?:"[^"]*(?:\n[^"]*)*"|[^\n]*)'
-    
-    # Check if key exists
-    if re.search(rf'^{re.escape(key)}=', content, re.MULTILINE):
-        # Key exists, replace it
-        new_content = re.sub(pattern, formatted_value, content, flags=re.MULTILINE)
-        logger.info(f"✅ Updated {key}")
-    else:
-        # Key not found, add it to the end
-        # Add newline before if content doesn't end with one
-        if content and not content.endswith('\n'):
-            new_content = content + f'\n{formatted_value}\n'
-        else:
-            new_content = content + f'{formatted_value}\n'
-        logger.info(f"✅ Added {key}")
-    
-    # Write the updated content back to the file
-    with open(env_file_path, 'w') as f:
-        f.write(new_content)
-    
-    return True
-
 def update_kong_yml(kong_file_path: Path) -> bool:
     """
-    Add SAML endpoints to kong.yml if they don't already exist.
+    Add the SAML endpoints to kong.yml, before the secure auth routes, unless they already exist.
     
     Args:
         kong_file_path: Path to the kong.yml file
      
     Returns:
-        bool: True if file was updated, False otherwise
+        bool: True if the endpoints are configured, False otherwise
     """
     if not kong_file_path.exists():
         logger.error(f"Kong configuration file not found: {kong_file_path}")
         return False
-    
-    # Read the current kong.yml content
-    with open(kong_file_path, 'r') as f:
-        content = f.read()
-    
-    # Check if SAML endpoints already exist
-    if 'auth-v1-open-sso-acs' in content:
-        logger.info("✅ SAML endpoints already exist in kong.yml")
-        return True
-    
-    # SAML endpoints configuration to insert (no leading newline)
-    saml_config = """  ## Open SSO routes
-  - name: auth-v1-open-sso-acs
-    url: "http://auth:9999/sso/saml/acs"
-    routes:
-      - name: auth-v1-open-sso-acs
-        strip_path: true
-        paths:
-        - /auth/v1/sso/saml/acs
-        - /sso/saml/acs
-    plugins:
-      - name: cors
-  - name: auth-v1-open-sso-metadata
-    url: "http://auth:9999/sso/saml/metadata"
-    routes:
-      - name: auth-v1-open-sso-metadata
-        strip_path: true
-        paths:
-        - /auth/v1/sso/saml/metadata
-    plugins:
-      - name: cors
 
-"""
-    
-    # Find the insertion point - look for the end of the authorize route and before secure auth
-    # This is more specific and reliable
-    insertion_point = content.find("  ## Secure Auth routes")
-    
-    if insertion_point != -1:
-        # Insert SAML config before the "Secure Auth routes" section
-        new_content = content[:insertion_point] + saml_config + "\n" + content[insertion_point:]
-        
-        # Use the content as-is without YAML formatting to avoid issues
-        # The SAML config is already properly formatted
-        formatted_content = new_content
-        
-        # Write the updated content back to the file
-        with open(kong_file_path, 'w') as f:
-            f.write(formatted_content)
-        
-        logger.info("✅ Added SAML endpoints to kong.yml")
-        return True
-    else:
-        logger.error("❌ Could not find '## Secure Auth routes' section in kong.yml")
+    try:
+        config = KongConfig(kong_file_path)
+        config.set_service_group(SAML_KONG_SERVICES, before="auth-v1", heading="Open SSO routes")
+        updated = config.save()
+    except (OSError, YAMLError) as e:
+        logger.error(f"❌ Could not update {kong_file_path}: {e}")
         return False
 
+    logger.info("✅ Added SAML endpoints to kong.yml" if updated else "✅ SAML endpoints already exist in kong.yml")
+    return True
+
 def main():
     """Main function to enable SAML authentication."""
     logger.info("🔧 StackAI SAML Enabler Script")
@@ -194,17 +133,17 @@ def main():
         shutil.copy2(kong_yml_path, kong_backup_path)
         logger.info(f"Created backup at: {kong_backup_path}")
     
-    # Update SAML_ENABLED to true
-    updated_saml_enabled = update_env_file(supabase_env_path, "SAML_ENABLED", "true")
-    if not updated_saml_enabled:
-        logger.error("Failed to update SAML_ENABLED")
-        sys.exit(1)
-
-    # Generate a new SAML private key
-    updated_saml_private_key = update_env_file(supabase_env_path, "SAML_PRIVATE_KEY", generate_saml_private_key())
-    if not updated_saml_private_key:
-        logger.error("Failed to update SAML_PRIVATE_KEY")
+    # Set SAML_ENABLED to true and generate a new SAML private key, in a single write
+    try:
+        updated_keys = update_env_file(supabase_env_path, {
+            "SAML_ENABLED": "true",
+            "SAML_PRIVATE_KEY": generate_saml_private_key(),
+        })
+    except OSError as e:
+        logger.error(f"Failed to update {supabase_env_path}: {e}")
         sys.exit(1)
+    for key in updated_keys:
+        logger.info(f"✅ Updated {key}")
 
     # Update Kong configuration
     updated_kong = update_kong_yml(kong_yml_path)
@@ -216,12 +155,20 @@ def main():
     logger.info("\n📋 Next steps:")
     logger.info("1. Configure your SAML Identity Provider (IdP)")
     logger.info("2. Update SAML_PRIVATE_KEY if needed (already generated)")
-    logger.info("3. Restart your Supabase services:")
-    logger.info("   cd supabase && docker-compose down && docker-compose up -d")
+    logger.info("3. Restart the auth service to apply the .env changes:")
+    logger.info("   docker compose up -d auth")
+    if needs_reload(kong_yml_path):
+        logger.info("4. Restart Kong to apply kong.yml (it is only restarted if kong.yml changed):")
+        logger.info("   make kong-reload")
+    else:
+        logger.info("4. Kong already runs this kong.yml, it does not need a restart")
     logger.info("\n⚠️  Note: You'll need to configure your SAML IdP settings in the Supabase Auth dashboard")
     logger.info("\n🔗 SAML endpoints will be available at:")
     logger.info("   - /auth/v1/sso/saml/acs (Assertion Consumer Service)")
     logger.info("   - /auth/v1/sso/saml/metadata (SAML Metadata)")
 
+    # Once SAML is enabled, so the next run can take a pregenerated key
+    refill_key_pool()
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
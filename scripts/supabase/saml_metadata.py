@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+Local cache of SAML IdP metadata.
+
+Metadata documents are fetched concurrently and stored in .metadata-cache/, one JSON file per URL,
+with the ETag and Last-Modified validators of the response. Later fetches revalidate with a
+conditional GET, so an unchanged document costs a 304 and no download. A document is parsed when
+it is downloaded: its entity ID, validUntil and certificates (with their expiry dates) are stored
+with it and reused as long as the IdP answers 304.
+
+The cached XML can be submitted to Supabase as metadata_xml instead of the metadata_url, so that
+GoTrue does not fetch every document again (see `saml_apply.py --metadata-xml`).
+
+Usage:
+    python saml_metadata.py https://idp.example.com/metadata [...]
+    python saml_metadata.py --file providers.yaml
+"""
+
+import sys
+import asyncio
+import argparse
+import base64
+import hashlib
+import json
+import logging
+import os
+import re
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import httpx
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes
+from defusedxml import DefusedXmlException
+from defusedxml import ElementTree
+
+from sso_client import RETRYABLE_STATUS_CODES, BulkResult, backoff_delay
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = Path(__file__).parent / ".metadata-cache"
+DEFAULT_CONCURRENCY = 16
+DEFAULT_RETRIES = 2
+DEFAULT_TIMEOUT = httpx.Timeout(15.0, connect=5.0)
+MAX_METADATA_BYTES = 5 * 1024 * 1024
+EXPIRY_WARNING_DAYS = 30
+
+MD_NS = "urn:oasis:names:tc:SAML:2.0:metadata"
+DS_NS = "http://www.w3.org/2000/09/xmldsig#"
+
+
+class MetadataError(Exception):
+    """A metadata document could not be fetched, or is not valid IdP metadata."""
+
+
+@dataclass
+class Certificate:
+    use: str  # "signing" or "encryption"
+    subject: str
+    not_after: str  # ISO 8601, UTC
+    sha256: str
+
+
+@dataclass
+class MetadataEntry:
+    """A cached metadata document and what was parsed from it."""
+    url: str
+    xml: str
+    entity_id: str
+    valid_until: Optional[str] = None
+    certificates: List[Certificate] = field(default_factory=list)
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    fetched_at: Optional[str] = None
+    revalidated: bool = False  # True if the last fetch was answered with 304 Not Modified
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "MetadataEntry":
+        certificates = [Certificate(**certificate) for certificate in data.pop("certificates", [])]
+        data.pop("revalidated", None)
+        return cls(certificates=certificates, **data)
+
+    def to_dict(self) -> Dict:
+        data = asdict(self)
+        data.pop("revalidated")
+        return data
+
+    def problems(self, now: Optional[datetime] = None) -> List[str]:
+        """Errors that make the metadata unusable: it is past validUntil, or has no signing
+        certificate that is still valid."""
+        now = now or datetime.now(timezone.utc)
+        problems = []
+        if self.valid_until and datetime.fromisoformat(self.valid_until) <= now:
+            problems.append(f"metadata expired on {self.valid_until} (validUntil)")
+        signing = [c for c in self.certificates if c.use == "signing"]
+        if not signing:
+            problems.append("no signing certificate")
+        elif all(datetime.fromisoformat(c.not_after) <= now for c in signing):
+            problems.append(f"every signing certificate has expired (last on {max(c.not_after for c in signing)})")
+        return problems
+
+    def warnings(self, now: Optional[datetime] = None) -> List[str]:
+        """Certificates that have expired, or expire within EXPIRY_WARNING_DAYS days."""
+        now = now or datetime.now(timezone.utc)
+        warnings = []
+        for certificate in self.certificates:
+            not_after = datetime.fromisoformat(certificate.not_after)
+            if not_after <= now:
+                warnings.append(f"{certificate.use} certificate {certificate.subject} expired on {certificate.not_after}")
+            elif not_after <= now + timedelta(days=EXPIRY_WARNING_DAYS):
+                days = (not_after - now).days
+                warnings.append(f"{certificate.use} certificate {certificate.subject} expires in {days} days")
+        return warnings
+
+
+def _parse_datetime(value: str) -> str:
+    """Normalise an xs:dateTime to ISO 8601 UTC. Fractions of seconds are dropped: some IdPs send
+    seven digits, which fromisoformat does not accept."""
+    value = re.sub(r"\.\d+", "", value.strip()).replace("Z", "+00:00")
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc).isoformat()
+
+
+def parse_metadata(url: str, xml: str) -> MetadataEntry:
+    """Parse an IdP EntityDescriptor. Raises MetadataError if it is not one.
+
+    The document comes from the network, so it is parsed with defusedxml and refused if it has a
+    DTD: SAML metadata never needs one, and entity declarations are what XML bombs are made of.
+    """
+    try:
+        root = ElementTree.fromstring(xml, forbid_dtd=True)
+    except ElementTree.ParseError as e:
+        raise MetadataError(f"{url} is not valid XML: {e}") from e
+    except DefusedXmlException as e:
+        raise MetadataError(f"{url} has a DTD or entity declarations, which are not allowed: {e!r}") from e
+    if root.tag != f"{{{MD_NS}}}EntityDescriptor" or not root.get("entityID"):
+        raise MetadataError(f"{url} is not a SAML EntityDescriptor")
+    idp = root.find(f"{{{MD_NS}}}IDPSSODescriptor")
+    if idp is None:
+        raise MetadataError(f"{url} does not describe an identity provider (no IDPSSODescriptor)")
+
+    certificates = {}
+    for key_descriptor in idp.iter(f"{{{MD_NS}}}KeyDescriptor"):
+        # A KeyDescriptor without a use attribute holds a key used for both.
+        uses = [key_descriptor.get("use")] if key_descriptor.get("use") else ["signing", "encryption"]
+        for element in key_descriptor.iter(f"{{{DS_NS}}}X509Certificate"):
+            try:
+                certificate = x509.load_der_x509_certificate(base64.b64decode("".join((element.text or "").split())))
+            except ValueError as e:
+                raise MetadataError(f"{url} holds an invalid certificate: {e}") from e
+            fingerprint = certificate.fingerprint(hashes.SHA256()).hex()
+            for use in uses:
+                certificates[(use, fingerprint)] = Certificate(
+                    use=use,
+                    subject=certificate.subject.rfc4514_string(),
+                    not_after=certificate.not_valid_after_utc.isoformat(),
+                    sha256=fingerprint,
+                )
+
+    valid_until = root.get("validUntil")
+    try:
+        valid_until = _parse_datetime(valid_until) if valid_until else None
+    except ValueError as e:
+        raise MetadataError(f"{url} has an invalid validUntil: {e}") from e
+    return MetadataEntry(url=url, xml=xml, entity_id=root.get("entityID"), valid_until=valid_until,
+                         certificates=list(certificates.values()))
+
+
+class MetadataCache:
+    """Fetches IdP metadata through a directory cache, revalidating entries with conditional GETs."""
+
+    def __init__(
+        self,
+        path: Path = DEFAULT_CACHE_PATH,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        retries: int = DEFAULT_RETRIES,
+        timeout: httpx.Timeout = DEFAULT_TIMEOUT,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.path = Path(path)
+        self.retries = retries
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.client = httpx.AsyncClient(
+            timeout=timeout,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=concurrency),
+            transport=transport,
+        )
+
+    async def __aenter__(self) -> "MetadataCache":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+    def _entry_path(self, url: str) -> Path:
+        return self.path / f"{hashlib.sha256(url.encode()).hexdigest()[:32]}.json"
+
+    def get(self, url: str) -> Optional[MetadataEntry]:
+        """The cached entry of a URL, without revalidating it."""
+        try:
+            data = json.loads(self._entry_path(url).read_text())
+        except (OSError, ValueError):
+            return None
+        return MetadataEntry.from_dict(data) if data.get("url") == url else None
+
+    def _store(self, entry: MetadataEntry) -> None:
+        self.path.mkdir(parents=True, exist_ok=True)
+        entry_path = self._entry_path(entry.url)
+        tmp_path = entry_path.with_name(f"{entry_path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps(entry.to_dict()))
+        os.replace(tmp_path, entry_path)
+
+    @staticmethod
+    async def _read_body(url: str, response: httpx.Response) -> bytes:
+        """Read a streamed response, refusing it as soon as it exceeds MAX_METADATA_BYTES."""
+        content_length = response.headers.get("Content-Length")
+        if content_length and content_length.isdigit() and int(content_length) > MAX_METADATA_BYTES:
+            raise MetadataError(f"{url} is larger than {MAX_METADATA_BYTES} bytes")
+        chunks = []
+        size = 0
+        async for chunk in response.aiter_bytes():
+            size += len(chunk)
+            if size > MAX_METADATA_BYTES:
+                raise MetadataError(f"{url} is larger than {MAX_METADATA_BYTES} bytes")
+            chunks.append(chunk)
+        return b"".join(chunks)
+
+    async def _get(self, url: str, headers: Dict[str, str]) -> Tuple[httpx.Response, bytes]:
+        """Send a GET, retrying transport errors, 429 and 5xx responses. Returns the response and,
+        for a 200, its body."""
+        for attempt in range(self.retries + 1):
+            try:
+                async with self.semaphore:
+                    async with self.client.stream("GET", url, headers=headers) as response:
+                        if response.status_code not in RETRYABLE_STATUS_CODES:
+                            body = await self._read_body(url, response) if response.status_code == 200 else b""
+                            return response, body
+                        error = f"HTTP {response.status_code}"
+                        retry_after = response.headers.get("Retry-After")
+            except (httpx.InvalidURL, httpx.UnsupportedProtocol) as e:
+                # Not worth retrying; InvalidURL is not even an httpx.HTTPError
+                raise MetadataError(f"{url} is not a valid metadata URL: {e}") from e
+            except httpx.TransportError as e:
+                error = f"{type(e).__name__}: {e}"
+                retry_after = None
+            if attempt < self.retries:
+                await asyncio.sleep(backoff_delay(attempt, retry_after))
+        raise MetadataError(f"Could not fetch {url}: {error}")
+
+    async def fetch(self, url: str) -> MetadataEntry:
+        """Return the metadata of a URL, downloading it only if it changed since it was cached."""
+        cached = self.get(url)
+        headers = {"Accept": "application/samlmetadata+xml, application/xml, text/xml"}
+        if cached is not None:
+            if cached.etag:
+                headers["If-None-Match"] = cached.etag
+            if cached.last_modified:
+                headers["If-Modified-Since"] = cached.last_modified
+
+        response, body = await self._get(url, headers)
+        now = datetime.now(timezone.utc).isoformat()
+        if response.status_code == 304 and cached is not None:
+            cached.fetched_at = now
+            cached.revalidated = True
+            self._store(cached)
+            return cached
+        if response.status_code != 200:
+            raise MetadataError(f"Could not fetch {url}: HTTP {response.status_code}")
+
+        try:
+            xml = body.decode("utf-8")
+        except UnicodeDecodeError:
+            xml = body.decode(response.charset_encoding or "latin-1", errors="replace")
+        entry = parse_metadata(url, xml)
+        entry.etag = response.headers.get("ETag")
+        entry.last_modified = response.headers.get("Last-Modified")
+        entry.fetched_at = now
+        self._store(entry)
+        return entry
+
+    async def fetch_all(self, urls: Iterable[str]) -> List[BulkResult]:
+        """Fetch metadata documents concurrently. A result's value is the MetadataEntry."""
+        async def run(url: str) -> BulkResult:
+            try:
+                return BulkResult(url, value=await self.fetch(url))
+            except MetadataError as e:
+                return BulkResult(url, error=e)
+
+        return list(await asyncio.gather(*(run(url) for url in urls)))
+
+
+def main():
+    """Fetch metadata documents and show what they contain."""
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    parser = argparse.ArgumentParser(description='Fetch, cache and validate SAML IdP metadata')
+    parser.add_argument('urls', nargs='*', help='Metadata URLs')
+    parser.add_argument('--file', help='Providers file (as used by saml_apply.py) whose metadata to fetch')
+    args = parser.parse_args()
+
+    urls = list(args.urls)
+    if args.file:
+        from saml_apply import load_providers_file
+        urls += [spec['metadata_url'] for spec in load_providers_file(Path(args.file))]
+    if not urls:
+        parser.error("no metadata URL given")
+
+    async def fetch_all() -> List[BulkResult]:
+        async with MetadataCache() as cache:
+            return await cache.fetch_all(urls)
+
+    failed = False
+    for result in asyncio.run(fetch_all()):
+        if not result.ok:
+            logger.error(f"❌ {result.error}")
+            failed = True
+            continue
+        entry = result.value
+        problems = entry.problems()
+        failed = failed or bool(problems)
+        logger.info(f"{'❌' if problems else '✅'} {entry.url} ({'not modified' if entry.revalidated else 'downloaded'})")
+        logger.info(f"   Entity ID: {entry.entity_id}")
+        if entry.valid_until:
+            logger.info(f"   Valid until: {entry.valid_until}")
+        for certificate in entry.certificates:
+            logger.info(f"   Certificate ({certificate.use}): {certificate.subject}, expires {certificate.not_after}")
+        for problem in problems:
+            logger.error(f"   ❌ {problem}")
+        for warning in entry.warnings():
+            logger.warning(f"   ⚠️  {warning}")
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,7 +6,6 @@
 # - If false, it should return a message saying that SAML is not enabled
 
 import sys
-import re
 from pathlib import Path
 import logging
 
@@ -17,22 +16,9 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def parse_env_file(env_path: Path) -> dict:
-    """Parse .env file and return a dictionary of key-value pairs"""
-    env_vars = {}
-    with open(env_path, 'r') as file:
-        content = file.read()
-    
-    # Pattern to match KEY=VALUE or KEY="VALUE" (including multi-line quoted values)
-    pattern = r'^([A-Z_][A-Z0-9_]*)=(?:"([^"]*(?:\n[^"]*)*)"|([^\n]*))'
-    
-    for match in re.finditer(pattern, content, re.MULTILINE):
-        key = match.group(1)
-        # Use group 2 if quoted value, otherwise group 3
-        value = match.group(2) if match.group(2) is not None else match.group(3)
-        env_vars[key] = value
-    
-    return env_vars
+# The .env parser is shared with scripts/environment_variables.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "environment_variables"))
+from env_file import load_env_variables  # noqa: E402
 
 def main():
     """Main function to show the status of the SAML authentication in the instance"""
@@ -47,7 +33,7 @@ def main():
         sys.exit(1)
 
     # Parse the .env file
-    env_vars = parse_env_file(supabase_env_path)
+    env_vars = load_env_variables(supabase_env_path)
 
     # Get the API_EXTERNAL_URL
     api_external_url = env_vars.get("API_EXTERNAL_URL")
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Async client for the Supabase (GoTrue) SSO admin API.
+
+All requests of a SupabaseSSOClient share one pooled, keep-alive HTTP connection pool, and at most
+`concurrency` of them are in flight at once. Timeouts, connection errors, 429 and 5xx responses
+are retried with exponential backoff (honouring Retry-After). The bulk helpers run many operations
+concurrently and report the outcome of each one instead of stopping at the first failure.
+
+Usage:
+    async with SupabaseSSOClient(api_url, service_role_key) as client:
+        providers = await client.list_providers()
+        results = await client.add_providers([{"metadata_url": "...", "domains": ["example.com"]}])
+"""
+
+import sys
+import asyncio
+import logging
+import random
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+import httpx
+
+# The .env parser is shared with scripts/environment_variables.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "environment_variables"))
+from env_file import load_env_variables  # noqa: E402
+
+logger = logging.getLogger(__name__)
+# httpx logs every request at INFO, which would drown the scripts' output in bulk runs.
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+DEFAULT_CONCURRENCY = 8
+DEFAULT_RETRIES = 4
+DEFAULT_TIMEOUT = httpx.Timeout(10.0, connect=5.0)
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 8.0
+PAGE_SIZE = 100
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class SSOError(Exception):
+    """A request to the SSO admin API failed (after retries, for retryable failures)."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None, body: Any = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.body = body
+
+
+@dataclass
+class BulkResult:
+    """The outcome of one operation of a bulk call: its input, and either a value or an error."""
+    item: Any
+    value: Any = None
+    error: Optional[Exception] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def backoff_delay(attempt: int, retry_after: Optional[str] = None) -> float:
+    """Delay before retry number attempt + 1: Retry-After if the server sent one, else exponential
+    backoff with full jitter."""
+    if retry_after:
+        try:
+            return min(float(retry_after), BACKOFF_MAX_SECONDS)
+        except ValueError:
+            pass
+    return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+
+def provider_metadata_url(provider: Dict) -> Optional[str]:
+    """The metadata URL of a provider as returned by GoTrue, which nests it under "saml"."""
+    return (provider.get("saml") or {}).get("metadata_url") or provider.get("metadata_url")
+
+
+def provider_domains(provider: Dict) -> List[str]:
+    """The domains of a provider as returned by GoTrue, as plain strings."""
+    return [d.get("domain", "") if isinstance(d, dict) else d for d in provider.get("domains") or []]
+
+
+def _response_body(response: httpx.Response) -> Any:
+    try:
+        return response.json()
+    except ValueError:
+        return response.text
+
+
+class SupabaseSSOClient:
+    """Client for /auth/v1/admin/sso, authenticated with the service role key."""
+
+    def __init__(
+        self,
+        api_url: str,
+        service_role_key: str,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        retries: int = DEFAULT_RETRIES,
+        timeout: httpx.Timeout = DEFAULT_TIMEOUT,
+        verify: Union[bool, str] = False,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.retries = retries
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.client = httpx.AsyncClient(
+            base_url=f"{api_url.rstrip('/')}/auth/v1/admin/sso",
+            headers={
+                "APIKey": service_role_key,
+                "Authorization": f"Bearer {service_role_key}",
+                "Content-Type": "application/json",
+            },
+            timeout=timeout,
+            verify=verify,
+            limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+            transport=transport,
+        )
+
+    async def __aenter__(self) -> "SupabaseSSOClient":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+    async def _request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        """Send a request, retrying timeouts, connection errors, 429 and 5xx responses.
+
+        Note that a POST that timed out may have been applied; retrying it can then fail with a
+        conflict (GoTrue refuses a second provider for the same domain) rather than duplicate it.
+        """
+        error: Exception = SSOError(f"{method} {path} was not sent")
+        for attempt in range(self.retries + 1):
+            retry_after = None
+            try:
+                async with self.semaphore:
+                    response = await self.client.request(method, path, **kwargs)
+            except httpx.TransportError as e:
+                error = e
+            else:
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    return response
+                retry_after = response.headers.get("Retry-After")
+                error = SSOError(
+                    f"{method} {path} returned {response.status_code}",
+                    response.status_code,
+                    _response_body(response),
+                )
+            if attempt < self.retries:
+                delay = backoff_delay(attempt, retry_after)
+                logger.debug(f"Retrying {method} {path} in {delay:.2f}s after: {error!r}")
+                await asyncio.sleep(delay)
+        raise SSOError(
+            f"{method} {path} failed after {self.retries + 1} attempts: {error}",
+            getattr(error, "status_code", None),
+            getattr(error, "body", None),
+        ) from error
+
+    async def _json(self, method: str, path: str, expected: Tuple[int, ...] = (200, 201), **kwargs) -> Any:
+        response = await self._request(method, path, **kwargs)
+        if response.status_code not in expected:
+            body = _response_body(response)
+            raise SSOError(f"{method} {path} returned {response.status_code}: {body}", response.status_code, body)
+        return _response_body(response) if response.content else None
+
+    async def list_providers(self) -> List[Dict]:
+        """Return every SSO provider, following pages when the server paginates.
+
+        GoTrue returns {"items": [...]} (older versions a bare list). Pages are requested until one
+        is short or brings no provider that was not seen already, so a server that ignores the
+        paging parameters is read exactly once.
+        """
+        providers: List[Dict] = []
+        seen = set()
+        page = 1
+        while True:
+            body = await self._json("GET", "/providers", params={"page": page, "per_page": PAGE_SIZE})
+            items = body.get("items", []) if isinstance(body, dict) else body or []
+            new_items = [item for item in items if item.get("id") not in seen]
+            providers.extend(new_items)
+            seen.update(item.get("id") for item in new_items)
+            if len(items) < PAGE_SIZE or not new_items:
+                return providers
+            page += 1
+
+    async def get_provider(self, provider_id: str) -> Dict:
+        return await self._json("GET", f"/providers/{provider_id}")
+
+    async def add_provider(
+        self,
+        domains: List[str],
+        metadata_url: Optional[str] = None,
+        metadata_xml: Optional[str] = None,
+        attribute_mapping: Optional[Dict] = None,
+    ) -> Dict:
+        """Add a SAML provider, from its metadata URL or its metadata XML."""
+        if not (metadata_url or metadata_xml):
+            raise ValueError("A SAML provider needs a metadata_url or a metadata_xml")
+        payload: Dict[str, Any] = {"type": "saml", "domains": domains}
+        if metadata_url:
+            payload["metadata_url"] = metadata_url
+        else:
+            payload["metadata_xml"] = metadata_xml
+        if attribute_mapping:
+            payload["attribute_mapping"] = attribute_mapping
+        return await self._json("POST", "/providers", json=payload)
+
+    async def update_provider(self, provider_id: str, **fields: Any) -> Dict:
+        """Update a provider's domains, metadata_url, metadata_xml or attribute_mapping."""
+        return await self._json("PUT", f"/providers/{provider_id}", json=fields)
+
+    async def delete_provider(self, provider_id: str) -> bool:
+        """Delete a provider. Returns False if it did not exist."""
+        response = await self._request("DELETE", f"/providers/{provider_id}")
+        if response.status_code == 404:
+            return False
+        if response.status_code not in (200, 204):
+            body = _response_body(response)
+            raise SSOError(
+                f"DELETE /providers/{provider_id} returned {response.status_code}: {body}", response.status_code, body
+            )
+        return True
+
+    async def _bulk(self, items: Iterable[Any], operation) -> List[BulkResult]:
+        async def run(item: Any) -> BulkResult:
+            try:
+                return BulkResult(item, value=await operation(item))
+            except (SSOError, ValueError) as e:
+                return BulkResult(item, error=e)
+
+        return list(await asyncio.gather(*(run(item) for item in items)))
+
+    async def add_providers(self, specs: Iterable[Dict]) -> List[BulkResult]:
+        """Add providers concurrently. Each spec holds the arguments of add_provider."""
+        return await self._bulk(specs, lambda spec: self.add_provider(**spec))
+
+    async def update_providers(self, updates: Iterable[Tuple[str, Dict]]) -> List[BulkResult]:
+        """Update providers concurrently. Each update is a (provider_id, fields) pair."""
+        return await self._bulk(updates, lambda update: self.update_provider(update[0], **update[1]))
+
+    async def delete_providers(self, provider_ids: Iterable[str]) -> List[BulkResult]:
+        """Delete providers concurrently. A result's value is False if the provider did not exist."""
+        return await self._bulk(provider_ids, self.delete_provider)
+
+
+def load_supabase_credentials(project_root: Path) -> Tuple[str, str]:
+    """Return (API_EXTERNAL_URL, SERVICE_ROLE_KEY) from supabase/.env.
+
+    Raises FileNotFoundError if the file does not exist and KeyError if a variable is missing.
+    """
+    supabase_env_path = project_root / "supabase" / ".env"
+    if not supabase_env_path.exists():
+        raise FileNotFoundError(f"Supabase .env file not found at {supabase_env_path}")
+    env_vars = load_env_variables(supabase_env_path)
+    for key in ("API_EXTERNAL_URL", "SERVICE_ROLE_KEY"):
+        if not env_vars.get(key):
+            raise KeyError(f"{key} not found in {supabase_env_path}")
+    return env_vars["API_EXTERNAL_URL"], env_vars["SERVICE_ROLE_KEY"]
@@ -0,0 +1,45 @@
+"""Tests for kong_config.py, run with: python -m pytest scripts/supabase"""
+
+import copy
+import shutil
+from pathlib import Path
+
+import pytest
+
+from kong_config import KONG_YML_PATH, KongConfig
+from saml_enable import SAML_KONG_SERVICES, update_kong_yml
+
+
+@pytest.fixture
+def kong_yml(tmp_path: Path) -> Path:
+    path = tmp_path / "kong.yml"
+    shutil.copyfile(KONG_YML_PATH, path)
+    return path
+
+
+def test_stock_file_round_trips(kong_yml: Path):
+    config = KongConfig(kong_yml)
+    assert config.render() == KONG_YML_PATH.read_text()
+    assert not config.save()
+
+
+def test_saml_services_on_stock_file_change_nothing(kong_yml: Path):
+    config = KongConfig(kong_yml)
+    assert not config.set_service_group(SAML_KONG_SERVICES, before="auth-v1", heading="Open SSO routes")
+    assert not config.save()
+
+    assert update_kong_yml(kong_yml)
+    assert kong_yml.read_bytes() == KONG_YML_PATH.read_bytes()
+
+
+def test_changed_url_keeps_its_quote_style(kong_yml: Path):
+    services = copy.deepcopy(SAML_KONG_SERVICES)
+    services[0]["url"] = "http://auth:9999/sso/saml/acs/v2"
+    config = KongConfig(kong_yml)
+    assert config.set_service_group(services, before="auth-v1", heading="Open SSO routes")
+    assert config.save()
+
+    expected = KONG_YML_PATH.read_text().replace(
+        'url: "http://auth:9999/sso/saml/acs"', 'url: "http://auth:9999/sso/saml/acs/v2"'
+    )
+    assert kong_yml.read_text() == expected
@@ -0,0 +1,64 @@
+"""Tests for saml_apply.py, run with: python -m pytest scripts/supabase"""
+
+import asyncio
+
+from saml_apply import Plan, plan_changes, reconcile
+
+
+def apply(sso_client, specs, dry_run: bool = False) -> bool:
+    async def run() -> bool:
+        async with sso_client() as client:
+            return await reconcile(client, specs, dry_run=dry_run)
+    return asyncio.run(run())
+
+
+def test_plan_changes(gotrue):
+    kept = gotrue.add("https://kept.test/metadata", ["kept.com"])
+    moved = gotrue.add("https://old.test/metadata", ["moved.com"])
+    gone = gotrue.add("https://gone.test/metadata", ["gone.com"])
+    specs = [
+        {"metadata_url": "https://kept.test/metadata", "domains": ["kept.com"]},
+        {"metadata_url": "https://new.test/metadata", "domains": ["more.com", "moved.com"]},
+        {"metadata_url": "https://added.test/metadata", "domains": ["added.com"]},
+    ]
+
+    plan = plan_changes(specs, [kept, moved, gone])
+    assert plan.unchanged == 1
+    assert plan.adds == [specs[2]]
+    assert plan.updates == [
+        (moved, {"metadata_url": "https://new.test/metadata", "domains": ["more.com", "moved.com"]})
+    ]
+    assert plan.deletes == [gone]
+    assert not plan_changes(specs[:1], [kept])
+    assert plan_changes([], []) == Plan()
+
+
+def test_apply_converges_without_writes_on_rerun(gotrue, sso_client):
+    gotrue.add("https://a.test/metadata", ["a.com"])
+    gotrue.add("https://b.test/metadata", ["b.com"])
+    specs = [
+        {"metadata_url": "https://a.test/metadata", "domains": ["a.com", "c.com"]},
+        {"metadata_url": "https://d.test/metadata", "domains": ["d.com"]},
+    ]
+
+    assert apply(sso_client, specs, dry_run=True)
+    assert all(request.method == "GET" for request in gotrue.requests)
+
+    assert apply(sso_client, specs)
+    assert gotrue.domains() == {"https://a.test/metadata": ["a.com", "c.com"], "https://d.test/metadata": ["d.com"]}
+
+    gotrue.requests.clear()
+    assert apply(sso_client, specs)
+    assert all(request.method == "GET" for request in gotrue.requests)
+
+
+def test_providers_swap_domains(gotrue, sso_client):
+    gotrue.add("https://a.test/metadata", ["a.com", "shared.com"])
+    gotrue.add("https://b.test/metadata", ["b.com"])
+    specs = [
+        {"metadata_url": "https://a.test/metadata", "domains": ["b.com", "shared.com"]},
+        {"metadata_url": "https://b.test/metadata", "domains": ["a.com"]},
+    ]
+
+    assert apply(sso_client, specs)
+    assert gotrue.domains() == {"https://a.test/metadata": ["b.com", "shared.com"], "https://b.test/metadata": ["a.com"]}
@@ -0,0 +1,113 @@
+"""Tests for saml_metadata.py, run with: python -m pytest scripts/supabase"""
+
+import asyncio
+import base64
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import httpx
+import pytest
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+
+import saml_metadata
+from saml_metadata import MetadataCache, MetadataError
+
+METADATA_URL = "https://idp.test/metadata"
+
+
+def make_metadata(entity_id: str = "https://idp.test/entity") -> bytes:
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "idp.test")])
+    now = datetime.now(timezone.utc)
+    certificate = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - timedelta(days=1))
+        .not_valid_after(now + timedelta(days=365))
+        .sign(key, hashes.SHA256())
+    )
+    der = base64.b64encode(certificate.public_bytes(serialization.Encoding.DER)).decode()
+    return f"""<?xml version="1.0"?>
+<md:EntityDescriptor xmlns:md="urn:oasis:names:tc:SAML:2.0:metadata" entityID="{entity_id}">
+  <md:IDPSSODescriptor protocolSupportEnumeration="urn:oasis:names:tc:SAML:2.0:protocol">
+    <md:KeyDescriptor use="signing">
+      <ds:KeyInfo xmlns:ds="http://www.w3.org/2000/09/xmldsig#">
+        <ds:X509Data><ds:X509Certificate>{der}</ds:X509Certificate></ds:X509Data>
+      </ds:KeyInfo>
+    </md:KeyDescriptor>
+  </md:IDPSSODescriptor>
+</md:EntityDescriptor>
+""".encode()
+
+
+class MetadataServer:
+    """Serve one metadata document, answering 304 to a matching If-None-Match."""
+
+    def __init__(self, body: bytes, etag: str = '"v1"'):
+        self.body = body
+        self.etag = etag
+        self.requests = []
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        if request.headers.get("If-None-Match") == self.etag:
+            return httpx.Response(304, headers={"ETag": self.etag})
+        return httpx.Response(200, headers={"ETag": self.etag}, content=self.body)
+
+
+def fetch(server, path: Path, url: str = METADATA_URL):
+    async def run():
+        async with MetadataCache(path, transport=httpx.MockTransport(server.handler)) as cache:
+            return await cache.fetch(url)
+    return asyncio.run(run())
+
+
+def test_fetch_then_revalidate(tmp_path: Path):
+    server = MetadataServer(make_metadata())
+
+    entry = fetch(server, tmp_path)
+    assert not entry.revalidated
+    assert entry.entity_id == "https://idp.test/entity"
+    assert entry.etag == '"v1"'
+    assert entry.problems() == []
+
+    entry = fetch(server, tmp_path)
+    assert entry.revalidated
+    assert entry.entity_id == "https://idp.test/entity"
+    assert server.requests[1].headers["If-None-Match"] == '"v1"'
+
+    server.body = make_metadata("https://idp.test/other")
+    server.etag = '"v2"'
+    entry = fetch(server, tmp_path)
+    assert not entry.revalidated
+    assert entry.entity_id == "https://idp.test/other"
+
+
+def test_oversized_document_is_refused(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(saml_metadata, "MAX_METADATA_BYTES", 1024)
+    body = make_metadata() + b" " * 2048
+    with pytest.raises(MetadataError, match="larger than"):
+        fetch(MetadataServer(body), tmp_path)
+
+    chunks_sent = []
+
+    class Chunks(httpx.AsyncByteStream):
+        # No Content-Length: the limit has to be enforced while reading.
+        async def __aiter__(self):
+            for start in range(0, len(body), 256):
+                chunks_sent.append(start)
+                yield body[start:start + 256]
+
+    class StreamingServer:
+        def handler(self, request: httpx.Request) -> httpx.Response:
+            return httpx.Response(200, stream=Chunks())
+
+    with pytest.raises(MetadataError, match="larger than"):
+        fetch(StreamingServer(), tmp_path)
+    assert len(chunks_sent) < len(body) // 256
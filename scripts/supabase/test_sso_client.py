@@ -0,0 +1,69 @@
+"""Tests for sso_client.py, run with: python -m pytest scripts/supabase"""
+
+import asyncio
+
+import pytest
+
+from conftest import FakeGoTrue
+from sso_client import SSOError
+
+
+def run(sso_client, operation):
+    async def main():
+        async with sso_client() as client:
+            return await operation(client)
+    return asyncio.run(main())
+
+
+def test_retries_unavailable_responses(gotrue: FakeGoTrue, sso_client):
+    gotrue.add("https://a.test/metadata", ["a.com"])
+    gotrue.failures = [503, 429]
+
+    providers = run(sso_client, lambda client: client.list_providers())
+    assert [p["saml"]["metadata_url"] for p in providers] == ["https://a.test/metadata"]
+    assert len(gotrue.requests) == 3
+
+
+def test_gives_up_after_retries(gotrue: FakeGoTrue, sso_client):
+    gotrue.failures = [502] * 10
+
+    with pytest.raises(SSOError) as error:
+        run(sso_client, lambda client: client.list_providers())
+    assert error.value.status_code == 502
+    assert len(gotrue.requests) == 5
+
+
+def test_list_follows_pages(gotrue: FakeGoTrue, sso_client, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr("sso_client.PAGE_SIZE", 2)
+    gotrue.page_size = 2
+    for index in range(5):
+        gotrue.add(f"https://{index}.test/metadata", [f"{index}.com"])
+
+    providers = run(sso_client, lambda client: client.list_providers())
+    assert len(providers) == 5
+    assert [request.url.params["page"] for request in gotrue.requests] == ["1", "2", "3"]
+
+
+def test_list_reads_unpaginated_server_once(gotrue: FakeGoTrue, sso_client, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr("sso_client.PAGE_SIZE", 2)
+    for index in range(3):
+        gotrue.add(f"https://{index}.test/metadata", [f"{index}.com"])
+
+    providers = run(sso_client, lambda client: client.list_providers())
+    assert len(providers) == 3
+    assert len(gotrue.requests) == 2
+
+
+def test_bulk_operations_report_each_outcome(gotrue: FakeGoTrue, sso_client):
+    existing = gotrue.add("https://a.test/metadata", ["a.com"])
+    specs = [
+        {"metadata_url": "https://b.test/metadata", "domains": ["b.com"]},
+        {"metadata_url": "https://c.test/metadata", "domains": ["a.com"]},
+    ]
+
+    results = run(sso_client, lambda client: client.add_providers(specs))
+    assert [result.ok for result in results] == [True, False]
+    assert results[1].error.status_code == 400
+
+    results = run(sso_client, lambda client: client.delete_providers([existing["id"], "missing"]))
+    assert [(result.ok, result.value) for result in results] == [(True, True), (True, False)]
@@ -1,8 +1,8 @@
 import os
 import pathlib
 import pickle
-import tempfile
 import zipfile
+from typing import Iterable, Iterator
 
 import toml
 from dotenv import load_dotenv
@@ -23,37 +23,33 @@ def remove_existing_templates(mongodb_client: MongoClient):
     mongodb_client["__models__"]["__templates__"].drop()
 
 
-def load_templates_from_zip_file(file_path: pathlib.Path) -> list:
-    """Load templates from a zip file
+def load_templates_from_zip_file(file_path: pathlib.Path) -> Iterator[dict]:
+    """Lazily load templates from a zip file
+
+    Each member is streamed with ZipFile.open, so nothing is extracted to disk and only one
+    template is held in memory at a time.
 
     Args:
         file_path (str): The path to the zip file containing the templates.
 
-    Returns:
-        list: A list of all templates in the zip file.
+    Yields:
+        dict: The templates in the zip file, one at a time.
     """
 
     with zipfile.ZipFile(file_path, "r") as zip_ref:
-        # extract the zip file to a temporary directory
-        with tempfile.TemporaryDirectory() as temp_dir:
-            zip_ref.extractall(temp_dir)
-
-            # load the templates from the temporary directory
-            templates = []
-            for root, dirs, files in os.walk(temp_dir):
-                for file in files:
-                    with open(os.path.join(root, file), "rb") as f:
-                        templates.append(pickle.load(f))
-
-    return templates
+        for info in zip_ref.infolist():
+            if info.is_dir():
+                continue
+            with zip_ref.open(info) as f:
+                yield pickle.load(f)
 
 
-def upload_templates_from_list(mongo_local_client: MongoClient, templates: list):
+def upload_templates_from_list(mongo_local_client: MongoClient, templates: Iterable[dict]):
     """Upload all templates to the new database
 
     Args:
         mongo_local_client (MongoClient): A MongoClient object connected to the new database.
-        templates (list): A list of all templates to upload to the new database.
+        templates (Iterable[dict]): The templates to upload to the new database, as a list or a generator.
     """
     print("\tUploading templates...")
     mongo_local_client["__models__"]["__templates__"].insert_many(templates)